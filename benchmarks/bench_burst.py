@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import wait
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "science_tutor"))
+APP = os.path.join(ROOT, "science_tutor", "scibot_tutor.py")
+
+from mock_anthropic import CHAT_ANSWER, add_mock_arguments, mock_options, serve  # noqa: E402
+
+# A whole class pressing the same button at once: how many API calls go out, and how long
+# everyone waits, with and without sharing identical requests (science_tutor/scibot_coalesce.py).
+#
+#   python benchmarks/bench_burst.py --students 25
+#   python benchmarks/bench_burst.py --students 25 --latency 2 --tokens-per-second 60
+#
+# Starts the mock API (benchmarks/mock_anthropic.py) in this process, then:
+#   quiz - every student submits the same quiz job to one generation engine
+#   chat - runs the app (streamlit run) and every student types the same question into the
+#          chat box of their own browser tab (a websocket, like the real page uses)
+# Each is run with sharing on and off (off is SCIBOT_DIVERSIFY_MODES for that mode).
+
+SYSTEM = "You are SciBot, creating a quiz. Return ONLY valid JSON."
+PROMPT = "Create a 3-question quiz about the Solar System for Middle School (6th-8th Grade) level"
+QUESTION = "Why is Mars red?"
+MODEL = "claude-sonnet-4-20250514"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+def quiz_burst(students, share):
+    from scibot_engine import GenerationEngine
+    from scibot_ratelimit import LocalTokenBucket
+    from scibot_scheduler import RequestScheduler
+
+    engine = GenerationEngine(
+        RequestScheduler(LocalTokenBucket(6000, 1000), LocalTokenBucket(10 ** 7, 10 ** 7)),
+        diversify_modes=set() if share else {"quiz"}
+    )
+    start = time.perf_counter()
+    job_ids = [engine.submit("mock-key", MODEL, 1000, SYSTEM, PROMPT, f"student-{n}", "quiz") for n in range(students)]
+    futures = [engine.get(job_id) for job_id in job_ids]
+    waits = []
+    for future in futures:
+        future.add_done_callback(lambda _: waits.append(time.perf_counter() - start))
+    wait(futures)
+    failed = sum(1 for future in futures if future.exception())
+    return waits, failed
+
+
+# The app's settings for one run: a fresh temp dir for every store, so neither run starts
+# with answers saved by the other (or by anyone using science_tutor/ for real)
+def app_env(mock_port, share):
+    stores = tempfile.mkdtemp(prefix="scibot-burst-")
+    return dict(
+        os.environ,
+        ANTHROPIC_API_KEY="mock-key",
+        ANTHROPIC_BASE_URL=f"http://127.0.0.1:{mock_port}",
+        SCIBOT_DIVERSIFY_MODES="" if share else "chat",
+        SCIBOT_PREFETCH_BUDGET="0",
+        SCIBOT_REQUESTS_PER_MINUTE="6000",
+        SCIBOT_RATE_LIMIT_BURST="100",
+        SCIBOT_METRICS_LOG="",
+        **{name: os.path.join(stores, f"{name.lower()}.db") for name in (
+            "SCIBOT_CACHE_DB", "SCIBOT_RATE_LIMIT_DB", "SCIBOT_BANK_DB", "SCIBOT_PROGRESS_DB", "SCIBOT_DECK_DB",
+            "SCIBOT_LIBRARY_DB", "SCIBOT_FALLBACK_DB", "SCIBOT_SESSION_DB")},
+    )
+
+
+# One browser tab talking to the app over Streamlit's websocket
+class Tab:
+    def __init__(self, ws, student):
+        self.ws = ws
+        self.query = f"student=burst-{student}"
+
+    async def run(self, widgets=()):
+        message = BackMsg()
+        message.rerun_script.query_string = self.query
+        message.rerun_script.widget_states.widgets.extend(widgets)
+        await self.ws.send(message.SerializeToString())
+
+    # Elements the app sends until its script finishes, as (kind, element, seconds since `start`)
+    async def elements(self, start):
+        while True:
+            raw = await self.ws.recv()
+            message = ForwardMsg()
+            message.ParseFromString(raw)
+            if message.WhichOneof("type") == "script_finished":
+                return
+            if message.WhichOneof("type") == "delta" and message.delta.WhichOneof("type") == "new_element":
+                element = message.delta.new_element
+                kind = element.WhichOneof("type")
+                yield kind, getattr(element, kind), time.perf_counter() - start
+
+
+# Open the chat page; returns the tab and its chat box
+async def open_tab(app_port, n):
+    ws = await websockets.connect(f"ws://127.0.0.1:{app_port}/_stcore/stream", origin=f"http://127.0.0.1:{app_port}", max_size=None)
+    tab = Tab(ws, n)
+    await tab.run()
+    chat_input = None
+    async for kind, element, _ in tab.elements(time.perf_counter()):
+        if kind == "chat_input":
+            chat_input = element.id
+    return tab, chat_input
+
+
+# Type the question and wait for the whole answer; returns (wait, first words), first words
+# being None if no answer came
+async def ask(tab, chat_input):
+    widget = WidgetState(id=chat_input)
+    widget.chat_input_value.data = QUESTION
+    start = time.perf_counter()
+    await tab.run([widget])
+    first = None
+    async for kind, element, seconds in tab.elements(start):
+        if kind == "markdown" and element.body and CHAT_ANSWER.startswith(element.body[:20]):
+            first = first or seconds
+    await tab.ws.close()
+    return time.perf_counter() - start, first
+
+
+async def class_burst(app_port, students):
+    # Everyone has the chat page open before anyone asks
+    tabs = await asyncio.gather(*(open_tab(app_port, n) for n in range(students)))
+    return await asyncio.gather(*(ask(tab, chat_input) for tab, chat_input in tabs), return_exceptions=True)
+
+
+def chat_burst(students, share, mock_port, app_port):
+    # Started like the workers in deploy/run_workers.py, minus the file watcher
+    app = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.port", str(app_port), "--server.address", "127.0.0.1",
+         "--server.headless", "true", "--server.fileWatcherType", "none"],
+        env=app_env(mock_port, share), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{app_port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        results = asyncio.run(class_burst(app_port, students))
+    finally:
+        app.terminate()
+        app.wait()
+    answered = [result for result in results if not isinstance(result, BaseException) and result[1] is not None]
+    return [wait_s for wait_s, _ in answered], [first for _, first in answered], students - len(answered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Identical requests from a whole class, with and without sharing.")
+    parser.add_argument("--students", type=int, default=25)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--app-port", type=int, default=8769, help="where the chat burst runs the app")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, 0, **mock_options(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.students} students asking for the same thing at once\n")
+    print(f"{'mode':<6} {'sharing':<8} {'API calls':>9} {'p50 wait s':>11} {'p95 wait s':>11} {'first words p50 s':>18} {'failed':>7}")
+    for share in (False, True):
+        before = server.state.stats["requests"]
+        waits, failed = quiz_burst(args.students, share)
+        calls = server.state.stats["requests"] - before
+        print(f"{'quiz':<6} {'on' if share else 'off':<8} {calls:>9} {percentile(waits, 50):>11.2f} "
+              f"{percentile(waits, 95):>11.2f} {'':>18} {failed:>7}")
+    for share in (False, True):
+        before = server.state.stats["requests"]
+        waits, first_words, failed = chat_burst(args.students, share, args.port, args.app_port)
+        calls = server.state.stats["requests"] - before
+        print(f"{'chat':<6} {'on' if share else 'off':<8} {calls:>9} {percentile(waits, 50):>11.2f} "
+              f"{percentile(waits, 95):>11.2f} {percentile(first_words, 50):>18.2f} {failed:>7}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
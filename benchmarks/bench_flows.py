@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from mock_anthropic import add_mock_arguments, mock_options, serve
+
+# Benchmark of what students actually wait for: chat answers, quizzes and flashcards.
+#
+#   python benchmarks/bench_flows.py --students 4
+#   python benchmarks/bench_flows.py --students 8 --latency-dist lognormal --error-529 0.05 --save baseline.json
+#   python benchmarks/bench_flows.py --compare baseline.json
+#
+# Starts the mock API (benchmarks/mock_anthropic.py) in this process, then runs every
+# simulated student in its own process with Streamlit's AppTest (AppTest can't run two
+# scripts at once in one process). Each student asks a few chat questions, makes a quiz and
+# makes a deck of flashcards. Students share the response cache and rate limiter through
+# SQLite files, like the workers in deploy/.
+#
+# Reported per mode:
+#   latency     - from pressing the button to the whole answer on screen
+#   rerun       - redrawing the page afterwards, with nothing new to fetch
+#   session KB  - size of the student's st.session_state at the end
+#
+# Save a run with --save and compare later changes against it with --compare.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "science_tutor", "scibot_tutor.py")
+MODES = {"chat": "💬 Chat with SciBot", "quiz": "📝 Generate Quiz", "flashcards": "🎴 Flashcards"}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+def find(widgets, label):
+    return next(widget for widget in widgets if widget.label.startswith(label))
+
+
+def session_size(at):
+    state = {key: at.session_state[key] for key in at.session_state}
+    return len(pickle.dumps(state))
+
+
+def timed(results, name, run):
+    start = time.perf_counter()
+    at = run()
+    results.setdefault(name, []).append(time.perf_counter() - start)
+    if at.exception or at.error:
+        results.setdefault("errors", []).append(name)
+    return at
+
+
+# One simulated student, in its own process. Prints its timings as JSON.
+def run_student(student, args):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.query_params["student"] = f"bench-{student}"
+    at.run()
+
+    for mode in args.modes:
+        find(at.selectbox, "Choose Mode").set_value(MODES[mode]).run()
+
+        if mode == "chat":
+            for i in range(args.questions):
+                question = "How do plants breathe?" if args.repeat else f"Question {i} from student {student}?"
+                at = timed(results, "chat", lambda: at.chat_input[0].set_value(question).run())
+                if at.session_state["messages"][-1].content.startswith("Oops!"):
+                    results.setdefault("errors", []).append("chat")
+        elif mode == "quiz":
+            find(at.text_input, "What topic do you want to be quizzed on").set_value(f"Topic {student}")
+            find(at.slider, "Number of Questions").set_value(args.quiz_questions)
+            at = timed(results, "quiz", lambda: find(at.button, "🎲 Generate Quiz").click().run())
+            if not at.session_state["current_quiz"] or len(at.session_state["current_quiz"]["questions"]) < args.quiz_questions:
+                results.setdefault("errors", []).append("quiz")
+        elif mode == "flashcards":
+            find(at.text_input, "What topic do you want flashcards for").set_value(f"Topic {student}")
+            find(at.slider, "Number of Cards").set_value(args.cards)
+            at = timed(results, "flashcards", lambda: find(at.button, "🎴 Study Flashcards").click().run())
+            if len(at.session_state["deck"] or []) < args.cards:
+                results.setdefault("errors", []).append("flashcards")
+
+        for _ in range(args.reruns):
+            at = timed(results, f"{mode}_rerun", at.run)
+
+    results["session_bytes"] = session_size(at)
+    results["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps(results))
+
+
+def run_benchmark(args):
+    server = serve(args.port, args.latency, 0, **mock_options(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    shared = tempfile.mkdtemp(prefix="scibot-bench-")
+    env = dict(
+        os.environ,
+        ANTHROPIC_API_KEY="mock-key",
+        ANTHROPIC_BASE_URL=f"http://127.0.0.1:{args.port}",
+        SCIBOT_CACHE_DB=os.path.join(shared, "cache.db"),
+        SCIBOT_RATE_LIMIT_DB=os.path.join(shared, "ratelimit.db"),
+        # Every store in the temp dir, so a run never writes into science_tutor/
+        SCIBOT_BANK_DB=os.path.join(shared, "bank.db"),
+        SCIBOT_LIBRARY_DB=os.path.join(shared, "library.db"),
+        SCIBOT_PROGRESS_DB=os.path.join(shared, "progress.db"),
+        SCIBOT_DECK_DB=os.path.join(shared, "decks.db"),
+        SCIBOT_FALLBACK_DB=os.path.join(shared, "fallback.db"),
+        SCIBOT_SESSION_DB=os.path.join(shared, "sessions.db"),
+        SCIBOT_REQUESTS_PER_MINUTE=str(args.rpm),
+        SCIBOT_RATE_LIMIT_BURST=str(max(1, args.rpm // 60)),
+        SCIBOT_TOKENS_PER_MINUTE=str(args.rpm * 5000),
+        SCIBOT_PROGRESS_STORE="memory",
+        SCIBOT_METRICS_LOG="",
+    )
+    # The mock sometimes says "slow down" on purpose, so keep the retries quick
+    env.setdefault("SCIBOT_BACKOFF_BASE", "0.2")
+
+    command = [sys.executable, __file__, "--modes", *args.modes, "--questions", str(args.questions),
+               "--quiz-questions", str(args.quiz_questions), "--cards", str(args.cards), "--reruns", str(args.reruns)]
+    if args.repeat:
+        command.append("--repeat")
+    processes = [
+        subprocess.Popen(command + ["--student", str(n)], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for n in range(args.students)
+    ]
+
+    combined = {}
+    for process in processes:
+        output, _ = process.communicate()
+        lines = output.strip().splitlines()
+        if not lines:
+            combined.setdefault("errors", []).append("crashed")
+            continue
+        for name, values in json.loads(lines[-1]).items():
+            combined.setdefault(name, []).extend(values if isinstance(values, list) else [values])
+    server.shutdown()
+    return {"settings": {name: value for name, value in vars(args).items() if name not in ("save", "compare")},
+            "results": combined, "mock": dict(server.state.stats)}
+
+
+def report(run, baseline=None):
+    results = run["results"]
+    print(f"{'mode':<12} {'n':>4} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'rerun p50 ms':>13} {'rerun p95 ms':>13}")
+    for mode in MODES:
+        latencies = results.get(mode, [])
+        reruns = results.get(f"{mode}_rerun", [])
+        if not latencies:
+            continue
+        line = (f"{mode:<12} {len(latencies):>4} {percentile(latencies, 50):>7.2f} {percentile(latencies, 95):>7.2f} "
+                f"{percentile(latencies, 99):>7.2f} {percentile(reruns, 50) * 1000:>13.0f} {percentile(reruns, 95) * 1000:>13.0f}")
+        if baseline and baseline["results"].get(mode):
+            before = percentile(baseline["results"][mode], 50)
+            line += f"   p50 {percentile(latencies, 50) - before:+.2f}s vs baseline"
+        print(line)
+
+    sizes = results.get("session_bytes", [])
+    rss = results.get("max_rss_kb", [])
+    print(f"\nsession state: {sum(sizes) / max(len(sizes), 1) / 1024:.1f} KB per student "
+          f"(largest {max(sizes, default=0) / 1024:.1f} KB)")
+    print(f"student process peak memory: {max(rss, default=0) / 1024:.0f} MB")
+    print(f"errors: {len(results.get('errors', []))} • mock API: {run['mock']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SciBot chat / quiz / flashcard benchmark against a mock API.")
+    parser.add_argument("--students", type=int, default=4, help="simulated students running at the same time")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--questions", type=int, default=5, help="chat questions per student")
+    parser.add_argument("--quiz-questions", type=int, default=10)
+    parser.add_argument("--cards", type=int, default=10)
+    parser.add_argument("--reruns", type=int, default=3, help="plain reruns timed after each mode")
+    parser.add_argument("--repeat", action="store_true", help="everyone asks the same chat questions (tests the cache)")
+    parser.add_argument("--rpm", type=int, default=3000, help="SciBot's requests-per-minute limit")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with results saved earlier with --save")
+    parser.add_argument("--student", type=int, help=argparse.SUPPRESS)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.student is not None:
+        run_student(args.student, args)
+        return
+
+    run = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(run, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(run, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "science_tutor"))
+
+from scibot_decks import Deck  # noqa: E402
+from scibot_json import Question  # noqa: E402
+from scibot_memory import Message  # noqa: E402
+from scibot_session import pack  # noqa: E402
+
+# How much server memory one open tab costs, before and after the session diet
+# (science_tutor/scibot_session.py).
+#
+#   python benchmarks/bench_memory.py
+#   python benchmarks/bench_memory.py --sessions 500 --messages 40
+#
+# Builds the chat, quiz and flashcard deck of a student who used every page, many times
+# over, and measures them with tracemalloc:
+#   dicts          - the old layout: a dict per message, question and card, everything in memory
+#   slots          - the same state as __slots__ objects, everything in memory
+#   page open      - slots, with only the open page's state in memory (the rest parked)
+#   idle (reaped)  - nothing left in memory after SCIBOT_IDLE_MINUTES
+# "parked" is what the parked state of one tab takes in the session store (compressed).
+
+WORDS = ("plants leaves sunlight energy water carbon dioxide oxygen cells roots stem flower seed grow "
+         "light heat sound wave magnet force gravity planet star moon earth rock volcano ocean cloud "
+         "rain atom molecule electron energy battery circuit animal habitat food chain science "
+         "because when which makes tiny really great question happens through inside around").split()
+GRADE = "Middle School (6th-8th Grade)"
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+# The state of one student who chatted, took a quiz and studied a deck, in the old dict layout
+def dict_session(rng, args):
+    messages = []
+    for _ in range(args.messages // 2):
+        messages.append({"role": "user", "content": text(rng, 8) + "?"})
+        messages.append({"role": "assistant", "content": text(rng, 180)})
+    quiz = {"title": "Photosynthesis Quiz", "questions": [
+        {"question": text(rng, 12) + "?", "options": [f"{letter}) {text(rng, 5)}" for letter in "ABCD"],
+         "correct": rng.choice("ABCD"), "explanation": text(rng, 35)}
+        for _ in range(args.questions)
+    ]}
+    cards = [
+        {"front": text(rng, 8) + "?", "back": text(rng, 30), "due": time.time(),
+         "ease": 2.5, "interval": 0.0, "reps": 0, "lapses": 0}
+        for _ in range(args.cards)
+    ]
+    return {"messages": messages, "chat_summary": text(rng, 60), "current_quiz": quiz,
+            "quiz_result": {"answers": [q["correct"] for q in quiz["questions"]], "correct": 10, "total": 10},
+            "deck": {"grade_level": GRADE, "topic": "photosynthesis", "cards": cards}}
+
+
+# The same state with the compact classes the app uses now
+def slots_session(state):
+    quiz = state["current_quiz"]
+    deck = Deck(GRADE, "photosynthesis")
+    deck.add(state["deck"]["cards"])
+    return {
+        "messages": [Message(m["role"], m["content"]) for m in state["messages"]],
+        "chat_summary": state["chat_summary"],
+        "current_quiz": {"title": quiz["title"], "questions": [
+            Question(q["question"], tuple(q["options"]), q["correct"], q["explanation"]) for q in quiz["questions"]
+        ]},
+        "quiz_result": state["quiz_result"],
+        "deck": deck,
+    }
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(n) for n in range(count)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per open SciBot tab, before and after the session diet.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20, help="chat messages per student")
+    parser.add_argument("--questions", type=int, default=10, help="quiz questions per student")
+    parser.add_argument("--cards", type=int, default=15, help="flashcards per student")
+    args = parser.parse_args()
+
+    def build(n):
+        return dict_session(random.Random(n), args)
+
+    def keep(keys):
+        return lambda n: {key: value for key, value in slots_session(build(n)).items() if key in keys}
+
+    results = {
+        "dicts": measure(build, args.sessions),
+        "slots": measure(lambda n: slots_session(build(n)), args.sessions),
+        "page open (chat)": measure(keep(("messages", "chat_summary")), args.sessions),
+        "page open (quiz)": measure(keep(("current_quiz", "quiz_result")), args.sessions),
+        "idle (reaped)": measure(lambda n: {}, args.sessions),
+    }
+    parked = sum(len(pack(value)) for value in slots_session(build(0)).values())
+
+    print(f"{args.sessions} tabs, each with {args.messages} chat messages, a {args.questions}-question quiz "
+          f"and {args.cards} flashcards\n")
+    print(f"{'layout':<18} {'KB per tab':>10} {'vs dicts':>9}")
+    for name, used in results.items():
+        print(f"{name:<18} {used / 1024:>10.1f} {used / results['dicts'] - 1:>+9.0%}")
+    print(f"\nparked in the session store: {parked / 1024:.1f} KB per tab (compressed)")
+
+
+if __name__ == "__main__":
+    main()
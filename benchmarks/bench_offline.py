@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "science_tutor"))
+
+import scibot_fallback  # noqa: E402
+from scibot_fallback import FallbackIndex  # noqa: E402
+
+# How good and how fast the offline answers are (science_tutor/scibot_fallback.py): when the
+# API is down, does a student's question find the saved answer to the same question?
+#
+#   python benchmarks/bench_offline.py
+#   python benchmarks/bench_offline.py --sizes 1000 10000 50000 --overlaps 0.4 0.5 0.6
+#
+# Uses the same corpus as bench_semantic.py: the first phrasing of each group is saved with
+# its answer, then every other phrasing and every "different" question is looked up.
+#   right     - rephrased questions that got the saved answer to their question
+#   wrong     - questions that got an answer to a different question
+#   no answer - rephrased questions that found nothing (the student sees the error instead)
+
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "student_questions.json")
+GRADE = "6th - 8th Grade (Middle School)"
+TOPIC = "General Science"
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return json.load(f)
+
+
+def accuracy(corpus, overlaps):
+    index = FallbackIndex(":memory:")
+    for group, phrasings in enumerate(corpus["groups"]):
+        index.add_answer(GRADE, TOPIC, phrasings[0], f"answer {group}")
+    lookups = [(f"answer {group}", question) for group, phrasings in enumerate(corpus["groups"]) for question in phrasings[1:]]
+    lookups += [(None, question) for question in corpus["different"]]
+    rephrased = sum(1 for expected, _ in lookups if expected)
+
+    print(f"{'min overlap':>11} {'right':>6} {'wrong':>6} {'no answer':>10}")
+    for min_overlap in overlaps:
+        scibot_fallback.MIN_OVERLAP = min_overlap
+        right = wrong = 0
+        for expected, question in lookups:
+            found = index.answer(GRADE, TOPIC, question)
+            if found is not None:
+                right += found[1] == expected
+                wrong += found[1] != expected
+        print(f"{min_overlap:>11.2f} {right / rephrased:>6.1%} {wrong:>6} {(rephrased - right) / rephrased:>10.1%}")
+
+
+def lookup_speed(corpus, sizes, lookups):
+    words = " ".join(" ".join(group) for group in corpus["groups"]).split()
+    random.seed(0)
+    print(f"\n{'saved answers':>13} {'lookup ms (mean)':>17} {'p95 ms':>7}")
+    for size in sizes:
+        index = FallbackIndex(":memory:")
+        questions = [" ".join(random.sample(words, 6)) for _ in range(size)]
+        index._add([("chat", GRADE, TOPIC, question, " ".join(random.sample(words, 60)), "") for question in questions])
+        times = []
+        for question in random.sample(questions, min(lookups, size)):
+            start = time.perf_counter()
+            index.answer(GRADE, TOPIC, question)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        print(f"{size:>13} {sum(times) / len(times):>17.2f} {times[int(0.95 * (len(times) - 1))]:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match quality and speed of SciBot's offline answers.")
+    parser.add_argument("--overlaps", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.8])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    accuracy(corpus, args.overlaps)
+    lookup_speed(corpus, args.sizes, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "science_tutor"))
+
+from scibot_bank import ContentBank  # noqa: E402
+from scibot_fallback import FallbackIndex  # noqa: E402
+from scibot_library import QuizLibrary  # noqa: E402
+from scibot_packs import ContentPack, import_pack, write_pack  # noqa: E402
+
+# How big quiz packs are and how fast they open (science_tutor/scibot_packs.py), compared
+# with keeping the same quizzes in one JSON file.
+#
+#   python benchmarks/bench_packs.py
+#   python benchmarks/bench_packs.py --quizzes 100 1000 5000 --questions 10
+#
+# The quizzes are made up from the words in the student question corpus, so they compress
+# about as well as real ones (they're a little less repetitive).
+#   open ms       - reading the file until the first quiz can be listed (the pack's index,
+#                   or the whole JSON file)
+#   one quiz ms   - opening one quiz after that (mean)
+#   import s      - adding the whole pack to an empty library, content bank and offline index
+
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "student_questions.json")
+GRADES = ["3rd - 5th Grade", "6th - 8th Grade (Middle School)", "9th - 10th Grade (High School)"]
+
+
+def sentence(words, length):
+    return " ".join(random.sample(words, length)).capitalize()
+
+
+def make_entries(words, quizzes, questions):
+    entries = []
+    for n in range(quizzes):
+        topic = f"{random.choice(words)} {n % 50}"
+        grade_level = random.choice(GRADES)
+        quiz = []
+        for _ in range(questions):
+            options = [f"{letter}) {sentence(words, 4)}" for letter in "ABCD"]
+            quiz.append({"question": sentence(words, 10) + "?", "options": options,
+                         "correct": random.choice("ABCD"), "explanation": sentence(words, 25) + "."})
+        entries.append(("quiz", grade_level, topic, f"{topic.title()} Quiz", {"title": f"{topic.title()} Quiz", "questions": quiz}))
+    return entries
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size and load time of SciBot quiz packs.")
+    parser.add_argument("--quizzes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    words = sorted({word.strip("?.,!'\"").lower() for group in corpus["groups"] for question in group for word in question.split()} - {""})
+    random.seed(0)
+
+    print(f"{'quizzes':>7} {'JSON KB':>8} {'pack KB':>8} {'JSON open ms':>13} {'pack open ms':>13} {'one quiz ms':>12} {'import s':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for quizzes in args.quizzes:
+            entries = make_entries(words, quizzes, args.questions)
+            json_path = os.path.join(folder, f"{quizzes}.json")
+            pack_path = os.path.join(folder, f"{quizzes}.scibotpack")
+            with open(json_path, "w") as f:
+                json.dump([{"kind": kind, "grade_level": grade_level, "topic": topic, "title": title, **content}
+                           for kind, grade_level, topic, title, content in entries], f)
+            write_pack(pack_path, entries)
+
+            def load_json():
+                with open(json_path) as f:
+                    return json.load(f)
+
+            _, json_ms = timed(load_json, 5)
+            pack, pack_ms = timed(lambda: ContentPack(pack_path), 5)
+            picks = [random.randrange(len(pack)) for _ in range(args.lookups)]
+            start = time.perf_counter()
+            for n in picks:
+                pack.open(n)
+            quiz_ms = (time.perf_counter() - start) * 1000 / len(picks)
+            _, import_ms = timed(lambda: import_pack(pack, QuizLibrary(":memory:"), ContentBank(":memory:"), FallbackIndex(":memory:")))
+            print(f"{quizzes:>7} {os.path.getsize(json_path) / 1024:>8.0f} {os.path.getsize(pack_path) / 1024:>8.0f} "
+                  f"{json_ms:>13.1f} {pack_ms:>13.2f} {quiz_ms:>12.3f} {import_ms / 1000:>9.2f}")
+            pack.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "science_tutor"))
+
+from scibot_semantic import VectorIndex, make_vectorizer, question_kind  # noqa: E402
+
+# How well the semantic cache (science_tutor/scibot_semantic.py) spots the same question
+# asked a different way, and how fast a lookup is.
+#
+#   python benchmarks/bench_semantic.py
+#   python benchmarks/bench_semantic.py --sizes 100 1000 5000
+#
+# The corpus (benchmarks/data/student_questions.json) has groups of phrasings of one
+# question, plus "different" questions that look alike but ask something else (many are the
+# same words as a group's question with another question word: "Is the sky blue?"). The
+# first phrasing of each group goes in the index, split by question kind like the cache
+# does; every other phrasing and every "different" question is looked up.
+#   precision - of the answers the cache gave, how many were for the right question
+#   recall    - of the rephrased questions, how many got the right answer from the cache
+
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "student_questions.json")
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return json.load(f)
+
+
+def build_index(vectorizer, questions):
+    index = VectorIndex(vectorizer, capacity=max(len(questions), 1))
+    for group, question in enumerate(questions):
+        index.add(vectorizer.vectorize(question), {"group": group, "question": question})
+    return index
+
+
+def accuracy(vectorizer, corpus, thresholds):
+    first = [group[0] for group in corpus["groups"]]
+    indexes = {}
+    for group, question in enumerate(first):
+        index = indexes.setdefault(question_kind(question), VectorIndex(vectorizer, capacity=len(first)))
+        index.add(vectorizer.vectorize(question), {"group": group, "question": question})
+    lookups = [(group, question) for group, phrasings in enumerate(corpus["groups"]) for question in phrasings[1:]]
+    lookups += [(None, question) for question in corpus["different"]]
+    scored = []
+    for group, question in lookups:
+        index = indexes.get(question_kind(question))
+        score, entry = index.search(vectorizer.vectorize(question)) if index else (0.0, None)
+        entry = entry or {"group": None, "question": ""}
+        scored.append((group, score, entry["group"], question, entry["question"]))
+
+    print(f"{'threshold':>9} {'precision':>10} {'recall':>7} {'wrong answers':>14}")
+    for threshold in thresholds:
+        hits = [row for row in scored if row[1] >= threshold]
+        right = sum(1 for group, _, found, _, _ in hits if group == found)
+        rephrased = sum(1 for row in scored if row[0] is not None)
+        precision = right / len(hits) if hits else 1.0
+        print(f"{threshold:>9.2f} {precision:>10.1%} {right / rephrased:>7.1%} {len(hits) - right:>14}")
+    return scored
+
+
+def lookup_speed(vectorizer, corpus, sizes, lookups):
+    words = " ".join(" ".join(group) for group in corpus["groups"]).split()
+    random.seed(0)
+    print(f"\n{'index size':>10} {'lookup ms (mean)':>17} {'p95 ms':>7}")
+    for size in sizes:
+        questions = [" ".join(random.sample(words, 6)) for _ in range(size)]
+        index = build_index(vectorizer, questions)
+        index.search(vectorizer.vectorize("warm up"))
+        times = []
+        for question in random.sample(questions, min(lookups, size)):
+            start = time.perf_counter()
+            index.search(vectorizer.vectorize(question))
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        print(f"{size:>10} {sum(times) / len(times):>17.2f} {times[int(0.95 * (len(times) - 1))]:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precision/recall and speed of SciBot's semantic cache.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--show-misses", type=float, help="list wrong answers and misses at this threshold")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    vectorizer = make_vectorizer()
+    scored = accuracy(vectorizer, corpus, args.thresholds)
+    if args.show_misses is not None:
+        print()
+        for group, score, found, question, matched in scored:
+            wrong = score >= args.show_misses and group != found
+            missed = score < args.show_misses and group is not None
+            if wrong or missed:
+                print(f"{'WRONG' if wrong else 'MISS ':<5} {score:.2f}  {question!r} -> {matched!r}")
+    lookup_speed(vectorizer, corpus, args.sizes, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Load test for multi-worker SciBot: does throughput grow with the number of worker processes?
+#
+#   python benchmarks/load_test.py --workers 1 2 4 --students 12 --duration 30
+#
+# Starts the mock API (benchmarks/mock_anthropic.py), then for each worker count runs that many
+# processes. Each process plays its share of the students with Streamlit's AppTest, asking chat
+# questions in a loop. All workers share the response cache and the rate limiter through SQLite
+# files, like the real deployment in deploy/.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "science_tutor", "scibot_tutor.py")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+# One worker process: `students` threads, each a student asking questions until time runs out
+def run_worker(students, duration, worker_id, repeat_questions):
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    errors = []
+    run_lock = threading.Lock()
+    results_lock = threading.Lock()
+
+    # AppTest swaps a global Streamlit runtime in and out for every run, so runs in one process
+    # can't overlap. Each worker runs one script at a time and its students take turns; that
+    # also serializes the API wait, so single-worker numbers are a lower bound.
+    def new_session(n):
+        at = AppTest.from_file(APP, default_timeout=120)
+        at.query_params["student"] = f"load-{worker_id}-{n}"
+        with run_lock:
+            at.run()
+        return at
+
+    def student(n, at):
+        asked = 0
+        while time.time() < stop_at:
+            question = "How do plants breathe?" if repeat_questions else f"Question {asked} from student {worker_id}-{n}?"
+            start = time.perf_counter()
+            try:
+                with run_lock:
+                    at.chat_input[0].set_value(question).run()
+                failed = bool(at.exception) or at.session_state["messages"][-1].content.startswith("Oops!")
+            except Exception:
+                failed = True
+            with results_lock:
+                (errors if failed else latencies).append(time.perf_counter() - start)
+            asked += 1
+            # Fresh session now and then so the chat history doesn't keep growing
+            if asked % 10 == 0:
+                at = new_session(n)
+
+    # Open every session first so startup doesn't eat into the measured time
+    sessions = [new_session(n) for n in range(students)]
+    stop_at = time.time() + duration
+    threads = [threading.Thread(target=student, args=(n, at)) for n, at in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({"latencies": latencies, "errors": len(errors)}))
+
+
+def mock_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.loads(response.read())
+
+
+def run_round(workers, args, port):
+    shared = tempfile.mkdtemp(prefix="scibot-load-")
+    env = dict(
+        os.environ,
+        ANTHROPIC_API_KEY="mock-key",
+        ANTHROPIC_BASE_URL=f"http://127.0.0.1:{port}",
+        SCIBOT_CACHE_DB=os.path.join(shared, "cache.db"),
+        SCIBOT_RATE_LIMIT_DB=os.path.join(shared, "ratelimit.db"),
+        # Every store in the temp dir, so a run never writes into science_tutor/
+        SCIBOT_BANK_DB=os.path.join(shared, "bank.db"),
+        SCIBOT_LIBRARY_DB=os.path.join(shared, "library.db"),
+        SCIBOT_PROGRESS_DB=os.path.join(shared, "progress.db"),
+        SCIBOT_DECK_DB=os.path.join(shared, "decks.db"),
+        SCIBOT_FALLBACK_DB=os.path.join(shared, "fallback.db"),
+        SCIBOT_SESSION_DB=os.path.join(shared, "sessions.db"),
+        SCIBOT_REQUESTS_PER_MINUTE=str(args.rpm),
+        SCIBOT_RATE_LIMIT_BURST=str(max(1, args.rpm // 60)),
+        # Every call reserves its max_tokens up front, so leave plenty of room for the requests limit
+        SCIBOT_TOKENS_PER_MINUTE=str(args.rpm * 5000),
+        SCIBOT_PROGRESS_STORE="memory",
+        SCIBOT_METRICS_LOG="",
+    )
+
+    # Split the students as evenly as possible between the workers
+    shares = [args.students // workers + (1 if i < args.students % workers else 0) for i in range(workers)]
+    before = mock_stats(port)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--worker", str(i), "--students", str(share), "--duration", str(args.duration)]
+            + (["--repeat-questions"] if args.repeat_questions else []),
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        for i, share in enumerate(shares) if share
+    ]
+
+    latencies = []
+    errors = 0
+    for process in processes:
+        output, _ = process.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        latencies += result["latencies"]
+        errors += result["errors"]
+    after = mock_stats(port)
+
+    return {
+        "workers": workers,
+        "answers": len(latencies),
+        # Each worker asks questions for exactly `duration` seconds once it has started up
+        "per_second": len(latencies) / args.duration,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "errors": errors,
+        "api_calls": after["requests"] - before["requests"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SciBot multi-worker load test against a mock API.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to try")
+    parser.add_argument("--students", type=int, default=12, help="simulated students (split between the workers)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per round")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock API seconds per answer")
+    parser.add_argument("--rpm", type=int, default=3000, help="SciBot's shared requests-per-minute limit")
+    parser.add_argument("--mock-rpm-limit", type=int, default=0, help="the mock API's own limit (0 = none)")
+    parser.add_argument("--repeat-questions", action="store_true", help="everyone asks the same question (tests the shared cache)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.students, args.duration, args.worker, args.repeat_questions)
+        return
+
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "mock_anthropic.py"), "--port", str(args.port),
+         "--latency", str(args.latency), "--rpm-limit", str(args.mock_rpm_limit)],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(1)
+        print(f"{'workers':>7} {'answers':>8} {'per sec':>8} {'p50 s':>7} {'p95 s':>7} {'errors':>7} {'API calls':>10} {'429s':>6}")
+        for workers in args.workers:
+            result = run_round(workers, args, args.port)
+            print(f"{result['workers']:>7} {result['answers']:>8} {result['per_second']:>8.2f} {result['p50']:>7.2f} "
+                  f"{result['p95']:>7.2f} {result['errors']:>7} {result['api_calls']:>10} {result['rate_limited']:>6}")
+    finally:
+        mock.terminate()
+
+
+if __name__ == "__main__":
+    main()
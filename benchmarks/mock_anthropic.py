@@ -0,0 +1,307 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A pretend Anthropic API for load tests and benchmarks, so we don't spend real credits.
+#
+#   python benchmarks/mock_anthropic.py --port 8765 --latency 0.5 --rpm-limit 300
+#   python benchmarks/mock_anthropic.py --latency-dist lognormal --tokens-per-second 60 --error-529 0.05
+#
+# Point SciBot at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8765 (any API key works).
+# --latency is the time before the first word (the median, for the random distributions),
+# and the answer then comes out at --tokens-per-second (0 = all at once).
+# GET /stats shows how many requests came in and how many got an error instead.
+# Message Batches work too: a batch ends --batch-seconds after it was created.
+
+CHAT_ANSWER = (
+    "Great question! Plants take in carbon dioxide through tiny holes in their leaves called stomata, "
+    "and they let out oxygen. At night they breathe in oxygen too, just like us! - SciBot 🤖"
+)
+
+
+LATENCY_DISTRIBUTIONS = {
+    "fixed": lambda median: median,
+    "uniform": lambda median: random.uniform(0, 2 * median),
+    "exponential": lambda median: random.expovariate(0.693 / median) if median else 0,
+    # Long tail like the real API: most answers start quickly, a few take several times longer
+    "lognormal": lambda median: random.lognormvariate(0, 0.6) * median,
+}
+
+
+class MockState:
+    def __init__(self, latency, rpm_limit, latency_dist="fixed", tokens_per_second=0, error_429=0, error_529=0,
+                 reject_models=(), batch_seconds=2):
+        self.latency = latency
+        self.rpm_limit = rpm_limit
+        self.latency_dist = LATENCY_DISTRIBUTIONS[latency_dist]
+        self.tokens_per_second = tokens_per_second
+        self.error_429 = error_429
+        self.error_529 = error_529
+        self.reject_models = set(reject_models)
+        self.batch_seconds = batch_seconds
+        # batch id -> (created, requests)
+        self.batches = {}
+        self.recent = deque()
+        self.stats = {"requests": 0, "rate_limited": 0, "overloaded": 0, "streamed": 0, "batched": 0}
+        self.lock = threading.Lock()
+
+    def first_token_delay(self):
+        return self.latency_dist(self.latency)
+
+    # Seconds to write out `text` at the configured token rate
+    def output_time(self, text):
+        return len(text) / 4 / self.tokens_per_second if self.tokens_per_second else 0
+
+    # True if this request is over the per-minute limit
+    def over_limit(self):
+        with self.lock:
+            now = time.time()
+            self.stats["requests"] += 1
+            while self.recent and self.recent[0] < now - 60:
+                self.recent.popleft()
+            if (self.rpm_limit and len(self.recent) >= self.rpm_limit) or random.random() < self.error_429:
+                self.stats["rate_limited"] += 1
+                return True
+            self.recent.append(now)
+            return False
+
+    # True if this request should get a 529 "overloaded" error
+    def overloaded(self):
+        if random.random() >= self.error_529:
+            return False
+        with self.lock:
+            self.stats["overloaded"] += 1
+        return True
+
+
+# Fake but valid answers: quiz and flashcard JSON when asked for them, a chat answer otherwise
+def answer_for(body):
+    system = body.get("system", "")
+    if not isinstance(system, str):
+        system = " ".join(block.get("text", "") for block in system)
+    last = body["messages"][-1]["content"]
+    if not isinstance(last, str):
+        last = json.dumps(last)
+    count = int((re.search(r"(\d+)", last) or [None, "3"])[1])
+
+    if "creating a science quiz" in system:
+        return json.dumps({"title": "Practice Quiz", "questions": [
+            {
+                "question": f"Question {i + 1} ({time.time():.6f})?",
+                "options": ["A) first", "B) second", "C) third", "D) fourth"],
+                "correct": "ABCD"[i % 4],
+                "explanation": "Because that's how science works!"
+            }
+            for i in range(count)
+        ]})
+    if "creating educational flashcards" in system:
+        return json.dumps({"cards": [
+            {"front": f"Term {i + 1} ({time.time():.6f})", "back": "A short, friendly definition."}
+            for i in range(count)
+        ]})
+    return CHAT_ANSWER
+
+
+def message_for(body, text):
+    usage = {
+        "input_tokens": len(json.dumps(body)) // 4,
+        "output_tokens": len(text) // 4,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 0
+    }
+    return {
+        "id": "msg_mock", "type": "message", "role": "assistant", "model": body["model"],
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn", "stop_sequence": None, "usage": usage
+    }
+
+
+def iso_time(seconds):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            match = re.match(r"/v1/messages/batches/(\w+)(/results)?$", self.path.split("?")[0])
+            if match:
+                self.batch(match[1], bool(match[2]))
+                return
+            if self.path != "/stats":
+                self.send_error(404)
+                return
+            with state.lock:
+                self.send_json(200, dict(state.stats))
+
+        def batch(self, batch_id, results):
+            with state.lock:
+                created, requests = state.batches.get(batch_id, (None, None))
+            if created is None:
+                self.send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+                return
+            ended = time.time() >= created + state.batch_seconds
+            if results:
+                lines = [
+                    json.dumps({"custom_id": request["custom_id"], "result": {
+                        "type": "succeeded", "message": message_for(request["params"], answer_for(request["params"]))
+                    }})
+                    for request in requests
+                ]
+                payload = "\n".join(lines).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/binary")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            self.send_json(200, {
+                "id": batch_id, "type": "message_batch",
+                "processing_status": "ended" if ended else "in_progress",
+                "request_counts": {"processing": 0 if ended else len(requests), "succeeded": len(requests) if ended else 0,
+                                   "errored": 0, "canceled": 0, "expired": 0},
+                "created_at": iso_time(created), "expires_at": iso_time(created + 24 * 3600),
+                "ended_at": iso_time(created + state.batch_seconds) if ended else None,
+                "archived_at": None, "cancel_initiated_at": None,
+                "results_url": f"http://{self.headers['host']}/v1/messages/batches/{batch_id}/results" if ended else None,
+            })
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+            if not self.path.startswith("/v1/messages"):
+                self.send_error(404)
+                return
+            if self.path.startswith("/v1/messages/batches"):
+                batch_id = f"msgbatch_mock{len(state.batches)}"
+                with state.lock:
+                    state.batches[batch_id] = (time.time(), body["requests"])
+                    state.stats["batched"] += len(body["requests"])
+                self.batch(batch_id, False)
+                return
+
+            if body["model"] in state.reject_models:
+                self.send_json(404, {
+                    "type": "error",
+                    "error": {"type": "not_found_error", "message": f"model: {body['model']}"}
+                })
+                return
+
+            if state.over_limit():
+                self.send_json(429, {
+                    "type": "error",
+                    "error": {"type": "rate_limit_error", "message": "Mock rate limit exceeded"}
+                }, {"retry-after": "1"})
+                return
+            if state.overloaded():
+                self.send_json(529, {
+                    "type": "error",
+                    "error": {"type": "overloaded_error", "message": "Mock API is overloaded"}
+                })
+                return
+
+            text = answer_for(body)
+            message = message_for(body, text)
+
+            if body.get("stream"):
+                with state.lock:
+                    state.stats["streamed"] += 1
+                self.stream(message, text)
+            else:
+                time.sleep(state.first_token_delay() + state.output_time(text))
+                self.send_json(200, message)
+
+        def send_json(self, status, data, headers=None):
+            payload = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def stream(self, message, text):
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+
+            def event(name, data):
+                chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            start = dict(message, content=[])
+            time.sleep(state.first_token_delay())
+            event("message_start", {"type": "message_start", "message": start})
+            event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+            pieces = [text[i:i + 20] for i in range(0, len(text), 20)]
+            for piece in pieces:
+                time.sleep(state.output_time(piece))
+                event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}})
+            event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+            event("message_stop", {"type": "message_stop"})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+# The default listen queue holds 5 connections, and a class arriving at once needs more
+class MockServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def serve(port, latency, rpm_limit, **options):
+    state = MockState(latency, rpm_limit, **options)
+    server = MockServer(("127.0.0.1", port), make_handler(state))
+    server.state = state
+    return server
+
+
+def add_mock_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first word")
+    parser.add_argument("--latency-dist", choices=sorted(LATENCY_DISTRIBUTIONS), default="fixed",
+                        help="how --latency varies between requests")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="output speed (0 = instant)")
+    parser.add_argument("--error-429", type=float, default=0, help="share of requests that get a random 429")
+    parser.add_argument("--error-529", type=float, default=0, help="share of requests that get a 529 overloaded error")
+    parser.add_argument("--reject-models", nargs="*", default=[], help="models to answer with 404 (tests model escalation)")
+    parser.add_argument("--batch-seconds", type=float, default=2, help="how long a message batch takes to finish")
+
+
+def mock_options(args):
+    return {
+        "latency_dist": args.latency_dist,
+        "tokens_per_second": args.tokens_per_second,
+        "error_429": args.error_429,
+        "error_529": args.error_529,
+        "reject_models": args.reject_models,
+        "batch_seconds": args.batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Anthropic Messages API for SciBot load tests.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="requests per minute before answering 429 (0 = no limit)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Mock Anthropic API on http://127.0.0.1:{args.port}")
+    serve(args.port, args.latency, args.rpm_limit, **mock_options(args)).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
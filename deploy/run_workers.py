@@ -0,0 +1,157 @@
+import argparse
+import os
+import secrets
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+# Run several SciBot workers behind nginx, for a whole classroom at once.
+#
+#   python deploy/run_workers.py --workers 4
+#
+# One Streamlit process can only use one CPU core (the GIL), so a busy room is better
+# served by a few processes side by side. This starts `--workers` Streamlit servers on
+# ports 8601, 8602, ... and an nginx in front of them on port 8501. A cookie keeps each
+# student on the same worker, because their chat lives in that worker's memory.
+# Streamlit's CORS and XSRF protection stay on; deploy/README.md lists the headers a proxy
+# has to pass on for them to work.
+#
+# The workers share everything that has to be shared through SQLite files in --shared-dir:
+# the response cache, the rate limiter (so together they stay under the API limit),
+# student progress, the content bank, flashcard decks, class quizzes, saved answers and
+# parked sessions. If nginx isn't installed, the config is still written so you can use it
+# with your own proxy.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "science_tutor", "scibot_tutor.py")
+
+NGINX_CONFIG = """\
+worker_processes 1;
+pid {run_dir}/nginx.pid;
+error_log {run_dir}/nginx-error.log;
+events {{ worker_connections 1024; }}
+
+http {{
+    access_log off;
+    client_body_temp_path {run_dir}/client_body;
+    proxy_temp_path {run_dir}/proxy;
+    fastcgi_temp_path {run_dir}/fastcgi;
+    uwsgi_temp_path {run_dir}/uwsgi;
+    scgi_temp_path {run_dir}/scgi;
+
+    # New visitors get a random affinity id; after that their cookie picks the worker
+    map $cookie_scibot_affinity $scibot_affinity {{
+        "" $request_id;
+        default $cookie_scibot_affinity;
+    }}
+
+    map $http_upgrade $connection_upgrade {{
+        default upgrade;
+        "" close;
+    }}
+
+    upstream scibot {{
+        hash $scibot_affinity consistent;
+{servers}
+    }}
+
+    server {{
+        listen {port};
+
+        location / {{
+            proxy_pass http://scibot;
+            proxy_http_version 1.1;
+            # Streamlit only accepts a WebSocket whose Origin matches its Host (port included),
+            # so pass both on exactly as the browser sent them (see deploy/README.md)
+            proxy_set_header Host $http_host;
+            proxy_set_header Origin $http_origin;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header X-Forwarded-Proto $scheme;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection $connection_upgrade;
+            proxy_read_timeout 86400;
+            add_header Set-Cookie "scibot_affinity=$scibot_affinity; Path=/; HttpOnly; SameSite=Lax";
+        }}
+    }}
+}}
+"""
+
+
+def worker_env(shared_dir):
+    env = dict(os.environ)
+    env.setdefault("SCIBOT_CACHE_DB", os.path.join(shared_dir, "scibot_cache.db"))
+    env.setdefault("SCIBOT_RATE_LIMIT_DB", os.path.join(shared_dir, "scibot_ratelimit.db"))
+    env.setdefault("SCIBOT_PROGRESS_DB", os.path.join(shared_dir, "scibot_progress.db"))
+    env.setdefault("SCIBOT_BANK_DB", os.path.join(shared_dir, "scibot_bank.db"))
+    env.setdefault("SCIBOT_DECK_DB", os.path.join(shared_dir, "scibot_decks.db"))
+    env.setdefault("SCIBOT_LIBRARY_DB", os.path.join(shared_dir, "scibot_library.db"))
+    env.setdefault("SCIBOT_FALLBACK_DB", os.path.join(shared_dir, "scibot_fallback.db"))
+    env.setdefault("SCIBOT_SESSION_DB", os.path.join(shared_dir, "scibot_sessions.db"))
+    # Streamlit signs its XSRF cookie with this, so every worker has to use the same one
+    env.setdefault("STREAMLIT_SERVER_COOKIE_SECRET", secrets.token_hex(32))
+    return env
+
+
+def write_nginx_config(run_dir, port, worker_ports):
+    servers = "\n".join(f"        server 127.0.0.1:{worker_port};" for worker_port in worker_ports)
+    path = os.path.join(run_dir, "nginx.conf")
+    with open(path, "w") as f:
+        f.write(NGINX_CONFIG.format(run_dir=run_dir, port=port, servers=servers))
+    return path
+
+
+def start_worker(worker_port, env):
+    return subprocess.Popen([
+        sys.executable, "-m", "streamlit", "run", APP,
+        "--server.port", str(worker_port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+    ], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several SciBot workers behind nginx.")
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1), help="how many Streamlit processes")
+    parser.add_argument("--port", type=int, default=8501, help="port students connect to")
+    parser.add_argument("--worker-port", type=int, default=8601, help="first worker's port")
+    parser.add_argument("--shared-dir", default=os.path.join(ROOT, "science_tutor"), help="where the shared SQLite files live")
+    parser.add_argument("--run-dir", default=os.path.join(ROOT, "deploy", "run"), help="nginx config, pid and logs")
+    args = parser.parse_args()
+
+    os.makedirs(args.shared_dir, exist_ok=True)
+    os.makedirs(args.run_dir, exist_ok=True)
+    worker_ports = [args.worker_port + i for i in range(args.workers)]
+    config = write_nginx_config(os.path.abspath(args.run_dir), args.port, worker_ports)
+
+    env = worker_env(os.path.abspath(args.shared_dir))
+    processes = [start_worker(worker_port, env) for worker_port in worker_ports]
+
+    nginx = shutil.which("nginx")
+    if nginx:
+        processes.append(subprocess.Popen([nginx, "-c", config, "-g", "daemon off;"]))
+        print(f"🔬 SciBot: {args.workers} workers behind http://localhost:{args.port}")
+    else:
+        print(f"nginx isn't installed, so the workers are on ports {worker_ports[0]}-{worker_ports[-1]} without a proxy.")
+        print(f"Install nginx and run: nginx -c {config}")
+
+    def stop(*_):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # If any worker dies, stop everything rather than send students to a dead port
+    while all(process.poll() is None for process in processes):
+        time.sleep(1)
+    print("A SciBot worker stopped, shutting down the rest.")
+    stop()
+
+
+if __name__ == "__main__":
+    main()
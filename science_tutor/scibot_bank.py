@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import asdict
+
+import streamlit as st
+
+from scibot_json import Question
+
+# Content bank: quiz questions and flashcards made ahead of time (see scibot_warmup.py),
+# so popular topics can be served instantly instead of waiting for the API.
+BANK_PATH = os.environ.get(
+    "SCIBOT_BANK_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_bank.db")
+)
+
+
+# "  Solar  system " and "solar system" are the same topic
+def normalize_topic(topic):
+    return " ".join(topic.casefold().split())
+
+
+class ContentBank:
+    def __init__(self, path=BANK_PATH):
+        # WAL and a busy timeout, so several server workers can share one bank
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    grade_level TEXT,
+                    topic TEXT,
+                    question TEXT,
+                    data TEXT,
+                    UNIQUE (grade_level, topic, question)
+                );
+                CREATE TABLE IF NOT EXISTS cards (
+                    grade_level TEXT,
+                    topic TEXT,
+                    front TEXT,
+                    data TEXT,
+                    UNIQUE (grade_level, topic, front)
+                );
+            """)
+            self.db.commit()
+
+    # Returns how many of the questions weren't in the bank yet
+    def add_questions(self, grade_level, topic, questions):
+        rows = [
+            (grade_level, normalize_topic(topic), " ".join(q.question.casefold().split()), json.dumps(asdict(q)))
+            for q in questions
+        ]
+        with self.lock:
+            added = self.db.executemany("INSERT OR IGNORE INTO questions VALUES (?, ?, ?, ?)", rows).rowcount
+            self.db.commit()
+        return added
+
+    def add_cards(self, grade_level, topic, cards):
+        rows = [
+            (grade_level, normalize_topic(topic), " ".join(card["front"].casefold().split()), json.dumps(card))
+            for card in cards
+        ]
+        with self.lock:
+            added = self.db.executemany("INSERT OR IGNORE INTO cards VALUES (?, ?, ?, ?)", rows).rowcount
+            self.db.commit()
+        return added
+
+    # Random questions for a topic, or an empty list if the bank doesn't have enough
+    def sample_questions(self, grade_level, topic, count):
+        return [
+            Question(q["question"], tuple(q["options"]), q["correct"], q["explanation"])
+            for q in self._sample("questions", grade_level, topic, count)
+        ]
+
+    def sample_cards(self, grade_level, topic, count):
+        return self._sample("cards", grade_level, topic, count)
+
+    # Every (grade_level, topic, item) in "questions" or "cards"
+    def items(self, table):
+        with self.lock:
+            rows = self.db.execute(f"SELECT grade_level, topic, data FROM {table}").fetchall()
+        return [(grade_level, topic, json.loads(data)) for grade_level, topic, data in rows]
+
+    def counts(self):
+        with self.lock:
+            return {
+                "questions": self.db.execute("SELECT COUNT(*) FROM questions").fetchone()[0],
+                "cards": self.db.execute("SELECT COUNT(*) FROM cards").fetchone()[0],
+            }
+
+    def _sample(self, table, grade_level, topic, count):
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT data FROM {table} WHERE grade_level = ? AND topic = ? ORDER BY RANDOM() LIMIT ?",
+                (grade_level, normalize_topic(topic), count)
+            ).fetchall()
+        if len(rows) < count:
+            return []
+        return [json.loads(row[0]) for row in rows]
+
+
+@st.cache_resource(show_spinner=False)
+def get_content_bank():
+    return ContentBank()
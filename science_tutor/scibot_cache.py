@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# How long a saved answer stays fresh (seconds) for each mode.
+# Chat answers rarely change, quizzes are refreshed more often so classes get variety.
+MODE_TTLS = {
+    "chat": int(os.environ.get("SCIBOT_CACHE_TTL_CHAT", str(24 * 3600))),
+    "quiz": int(os.environ.get("SCIBOT_CACHE_TTL_QUIZ", str(3600))),
+    "flashcards": int(os.environ.get("SCIBOT_CACHE_TTL_FLASHCARDS", str(6 * 3600))),
+}
+DEFAULT_TTL = 3600
+
+MEMORY_ENTRIES = int(os.environ.get("SCIBOT_CACHE_SIZE", "500"))
+# Leave SCIBOT_CACHE_DB empty to keep the cache in memory only
+DISK_PATH = os.environ.get("SCIBOT_CACHE_DB", "")
+DISK_ENTRIES = int(os.environ.get("SCIBOT_CACHE_DISK_SIZE", "20000"))
+
+
+# Questions that only differ in capitals or spaces should share an answer
+def normalize_text(text):
+    return " ".join(text.casefold().split())
+
+
+def make_key(system_prompt, prompt, model, max_tokens):
+    if not isinstance(system_prompt, str):
+        system_prompt = json.dumps(system_prompt, sort_keys=True)
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True)
+    raw = json.dumps([normalize_text(system_prompt), normalize_text(prompt), model, max_tokens])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MEMORY_ENTRIES, disk_path=DISK_PATH, disk_entries=DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db = None
+        if disk_path:
+            # WAL lets several server workers share one cache file
+            self.db = sqlite3.connect(disk_path, timeout=10, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    mode TEXT,
+                    value TEXT,
+                    expires_at REAL,
+                    last_used REAL
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self.db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self.db.commit()
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    # True if there's a fresh answer for `key` (without counting it as a hit or a miss)
+    def has(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[1] > now:
+                return True
+            if self.db is not None:
+                row = self.db.execute("SELECT expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                return bool(row and row[0] > now)
+        return False
+
+    def set(self, key, value, mode="chat"):
+        now = time.time()
+        expires_at = now + MODE_TTLS.get(mode, DEFAULT_TTL)
+        with self.lock:
+            self._remember(key, value, expires_at)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, mode, value, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, mode, value, expires_at, now)
+                )
+                # Drop expired rows, then the least recently used ones if the file is too big
+                self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self.db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,)
+                )
+                self.db.commit()
+
+    def delete(self, key):
+        with self.lock:
+            self.memory.pop(key, None)
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self.memory[key] = (value, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+
+# One cache for the whole server so every student benefits from everyone's questions
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache()
@@ -0,0 +1,57 @@
+import os
+
+import anthropic
+import httpx
+import streamlit as st
+
+MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 2000
+
+# Connection settings for the shared Anthropic client.
+# Can be changed with environment variables when lots of students use one server.
+POOL_SIZE = int(os.environ.get("SCIBOT_POOL_SIZE", "20"))
+KEEPALIVE_SECONDS = float(os.environ.get("SCIBOT_KEEPALIVE_SECONDS", "60"))
+CONNECT_TIMEOUT = float(os.environ.get("SCIBOT_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.environ.get("SCIBOT_REQUEST_TIMEOUT", "60"))
+# The SDK doesn't retry on its own: retries go back through the request scheduler
+# (scibot_scheduler) so they wait their turn like every other call
+MAX_RETRIES = 0
+
+
+# One client per API key for the whole server, reused across reruns and sessions
+# so every question doesn't pay for a new connection and TLS handshake.
+@st.cache_resource(show_spinner=False)
+def get_client(api_key):
+    http_client = anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_SECONDS
+        )
+    )
+
+    return anthropic.Anthropic(
+        api_key=api_key,
+        http_client=http_client,
+        max_retries=MAX_RETRIES,
+        timeout=anthropic.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+
+# Async version with the same connection settings, used by the background generation engine.
+# Each engine keeps its own, since an async client belongs to the event loop that uses it.
+def make_async_client(api_key):
+    http_client = anthropic.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_SECONDS
+        )
+    )
+
+    return anthropic.AsyncAnthropic(
+        api_key=api_key,
+        http_client=http_client,
+        max_retries=MAX_RETRIES,
+        timeout=anthropic.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
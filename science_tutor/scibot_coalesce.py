@@ -0,0 +1,90 @@
+import os
+import threading
+
+import streamlit as st
+
+# Classroom bursts: when the teacher says "everyone make a quiz on the Solar System", 25
+# identical requests arrive before the first answer is in the cache. Only the first one
+# (the "leader") calls the API. The others wait for it and get the same answer; chat
+# answers are passed on piece by piece as they stream in, so everyone sees them appear.
+#
+# Modes in SCIBOT_DIVERSIFY_MODES (comma separated, e.g. "quiz") are never shared: every
+# student gets an answer of their own, and saved answers aren't reused for them either.
+DIVERSIFY_MODES = {mode.strip() for mode in os.environ.get("SCIBOT_DIVERSIFY_MODES", "").split(",") if mode.strip()}
+# How long a follower waits for the next piece of the leader's answer before giving up
+FOLLOW_SECONDS = float(os.environ.get("SCIBOT_FOLLOW_SECONDS", "120"))
+
+
+def shared(mode, diversify_modes=DIVERSIFY_MODES):
+    return mode not in diversify_modes
+
+
+class FlightFailed(Exception):
+    pass
+
+
+# One call in progress, and everything it has streamed so far
+class Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def publish(self, text):
+        with self.condition:
+            self.chunks.append(text)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    # Everything streamed so far, then the rest as it arrives. Raises FlightFailed if the
+    # leader's call failed (or the leader went away) before finishing.
+    def follow(self, timeout=FOLLOW_SECONDS):
+        sent = 0
+        while True:
+            with self.condition:
+                if not self.condition.wait_for(lambda: len(self.chunks) > sent or self.done, timeout):
+                    raise FlightFailed("the answer took too long")
+                chunks = self.chunks[sent:]
+                done, error = self.done, self.error
+            yield from chunks
+            sent += len(chunks)
+            if done:
+                if error is not None:
+                    raise FlightFailed(str(error))
+                return
+
+
+class SingleFlight:
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {"leaders": 0, "followers": 0}
+
+    # (flight, True) for the first caller with this key, who makes the call and then land()s it.
+    # (flight, False) for everyone who asks while it's running; they follow() it.
+    def join(self, key):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.stats["followers"] += 1
+                return flight, False
+            flight = self.flights[key] = Flight()
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def land(self, key, flight, error=None):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.finish(error)
+
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    return SingleFlight()
@@ -0,0 +1,96 @@
+# Map grade level to difficulty description for AI
+GRADE_MAPPING = {
+    "Not Sure / Basic": {
+        "level": "Basic",
+        "description": "Very simple explanations using everyday language. Like explaining to someone learning science for the first time.",
+        "vocab": "Use only basic vocabulary. Avoid technical terms unless you explain them in very simple words."
+    },
+    "Kindergarten - 2nd Grade": {
+        "level": "Kindergarten - 2nd Grade",
+        "description": "Very simple concepts with fun examples. Use short sentences and relate to things kids see every day.",
+        "vocab": "Use only simple words a young child would know. Compare to toys, animals, playground, food."
+    },
+    "3rd - 5th Grade": {
+        "level": "Elementary (3rd-5th Grade)",
+        "description": "Clear explanations with relatable examples. Introduce basic scientific terms but explain them.",
+        "vocab": "Use elementary-level vocabulary. You can use some science words but always explain what they mean."
+    },
+    "6th - 8th Grade (Middle School)": {
+        "level": "Middle School (6th-8th Grade)",
+        "description": "More detailed explanations with scientific vocabulary. Students can handle more complex concepts.",
+        "vocab": "Use middle school level vocabulary and standard scientific terms. Give examples from everyday life."
+    },
+    "9th - 10th Grade (High School)": {
+        "level": "High School (9th-10th Grade)",
+        "description": "Detailed scientific explanations with proper terminology. Include more complex concepts and relationships.",
+        "vocab": "Use high school level vocabulary. Include chemical formulas, equations, and scientific processes."
+    },
+    "11th - 12th Grade (Advanced)": {
+        "level": "Advanced High School (11th-12th Grade)",
+        "description": "In-depth scientific explanations. Can include advanced concepts, formulas, and theoretical understanding.",
+        "vocab": "Use advanced vocabulary. Include complex theories, mathematical relationships, and detailed mechanisms."
+    }
+}
+
+# Science topics students can pick in the sidebar
+TOPICS = ["General Science", "Biology", "Chemistry", "Physics", "Earth Science", "Space & Astronomy", "Human Body"]
+
+MODES = ["💬 Chat with SciBot", "📝 Generate Quiz", "🎴 Flashcards", "📊 My Progress", "👩‍🏫 Class Quizzes", "📚 Quiz Packs", "🛠️ SciBot Metrics"]
+
+STYLES = ["Normal", "Extra Simple", "Very Detailed"]
+
+# Example questions on an empty chat: a column per subject, each button as (label, question asked)
+EXAMPLE_QUESTIONS = {
+    "**🧬 Biology**": [("How do plants breathe?", "How do plants breathe?"), ("Why do we need sleep?", "Why do we need sleep?")],
+    "**⚗️ Chemistry**": [("What makes fireworks colorful?", "What makes fireworks colorful?"), ("Why does ice float?", "Why does ice float on water?")],
+    "**🌍 Physics**": [("How do planes fly?", "How do airplanes fly?"), ("What is electricity?", "What is electricity?")],
+}
+
+# Custom CSS for better styling
+PAGE_CSS = """
+    <style>
+    .main-header {
+        font-size: 3rem;
+        color: #1E88E5;
+        text-align: center;
+        margin-bottom: 0;
+    }
+    .sub-header {
+        text-align: center;
+        color: #666;
+        margin-top: 0;
+    }
+    .stButton>button {
+        width: 100%;
+    }
+    .quiz-card {
+        background-color: #f0f8ff;
+        padding: 20px;
+        border-radius: 10px;
+        border: 2px solid #1E88E5;
+        margin: 10px 0;
+    }
+    .flashcard {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        padding: 30px;
+        border-radius: 15px;
+        text-align: center;
+        min-height: 200px;
+        cursor: pointer;
+        margin: 20px 0;
+    }
+    .correct-answer {
+        background-color: #d4edda;
+        border: 2px solid #28a745;
+        padding: 10px;
+        border-radius: 5px;
+    }
+    .wrong-answer {
+        background-color: #f8d7da;
+        border: 2px solid #dc3545;
+        padding: 10px;
+        border-radius: 5px;
+    }
+    </style>
+"""
@@ -0,0 +1,273 @@
+import heapq
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import streamlit as st
+
+from scibot_bank import normalize_topic
+from scibot_progress import PROGRESS_STORE
+
+# Flashcard decks that stay with the student, with spaced repetition (SM-2) deciding which
+# card comes next.
+#
+# Each card remembers how well the student knows it. Cards they got right come back after
+# 1 day, then 6 days, then longer and longer; cards they forgot come back in a minute.
+# A deck belongs to one student, grade and topic, so coming back to "Planets" tomorrow
+# picks up the same cards instead of asking SciBot to write new ones. SciBot is only asked
+# for cards when a deck has fewer than the student wants.
+DECK_STORE = os.environ.get("SCIBOT_DECK_STORE", PROGRESS_STORE)
+DECK_PATH = os.environ.get(
+    "SCIBOT_DECK_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_decks.db")
+)
+
+# The buttons a student grades themselves with after flipping a card (SM-2 quality 0-5)
+GRADES = {"again": 1, "hard": 3, "good": 4, "easy": 5}
+RELEARN_SECONDS = 60
+DAY = 24 * 60 * 60
+
+
+# One flashcard and how well the student knows it. A deck keeps all of its cards in memory
+# while it's open, so they use __slots__ (no dict per card).
+@dataclass(slots=True)
+class Card:
+    front: str
+    back: str
+    due: float
+    ease: float = 2.5
+    interval: float = 0.0
+    reps: int = 0
+    lapses: int = 0
+
+
+# "  What is a CELL?" and "what is a cell?" are the same card
+def card_key(front):
+    return " ".join(front.casefold().split())
+
+
+# "in 5 minutes", "tomorrow", "in 6 days"
+def due_in(due, now=None):
+    seconds = due - (time.time() if now is None else now)
+    if seconds < 60 * 60:
+        minutes = max(1, round(seconds / 60))
+        return f"in {minutes} minute{'s' if minutes != 1 else ''}"
+    if seconds < DAY:
+        hours = round(seconds / 3600)
+        return f"in {hours} hour{'s' if hours != 1 else ''}"
+    if seconds < 2 * DAY:
+        return "tomorrow"
+    return f"in {round(seconds / DAY)} days"
+
+
+# SM-2: the card's next ease, interval (days) and due time after a grade
+def schedule(card, grade, now):
+    quality = GRADES[grade]
+    card = replace(card)
+    if quality < 3:
+        card.reps = 0
+        card.lapses += 1
+        card.interval = 0.0
+        card.due = now + RELEARN_SECONDS
+    else:
+        card.reps += 1
+        if card.reps == 1:
+            card.interval = 1.0
+        elif card.reps == 2:
+            card.interval = 6.0
+        else:
+            card.interval = round(card.interval * card.ease, 1)
+        if grade == "easy":
+            card.interval *= 1.3
+        card.due = now + card.interval * DAY
+    card.ease = max(1.3, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return card
+
+
+# One student's deck for one grade and topic while they study it. The cards are kept in a
+# heap by due time, so the next card is always on top.
+class Deck:
+    def __init__(self, grade_level, topic, cards=()):
+        # Lots of decks have the same grade and topic, so they share one copy of each string
+        self.grade_level = sys.intern(grade_level)
+        self.topic = sys.intern(topic)
+        self.cards = {}
+        self.heap = []
+        # Breaks ties between cards due at the same moment (first added comes first)
+        self.pushes = 0
+        for card in cards:
+            self._push(card_key(card.front), card)
+
+    def __len__(self):
+        return len(self.cards)
+
+    # Adds new cards ({"front": ..., "back": ...}) it doesn't have yet. Returns the Cards that were added.
+    def add(self, cards, now=None):
+        now = time.time() if now is None else now
+        added = []
+        for card in cards:
+            key = card_key(card["front"])
+            if key not in self.cards:
+                added.append(self._push(key, Card(card["front"], card["back"], now)))
+        return added
+
+    def _push(self, key, card):
+        self.cards[key] = card
+        heapq.heappush(self.heap, (card.due, self.pushes, key))
+        self.pushes += 1
+        return card
+
+    # The card to study now, or None if nothing is due
+    def current(self, now=None):
+        now = time.time() if now is None else now
+        if self.heap and self.heap[0][0] <= now:
+            return self.cards[self.heap[0][2]]
+        return None
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+
+    def due_count(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for due, _, _ in self.heap if due <= now)
+
+    # Grade the current card and move it to its next due time. Returns the updated card.
+    def review(self, grade, now=None):
+        now = time.time() if now is None else now
+        key = self.heap[0][2]
+        card = self.cards[key] = schedule(self.cards[key], grade, now)
+        heapq.heapreplace(self.heap, (card.due, self.pushes, key))
+        self.pushes += 1
+        return card
+
+
+class SQLiteDeckStore:
+    def __init__(self, path=DECK_PATH):
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS deck_cards (
+                    student_id TEXT NOT NULL,
+                    grade_level TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    card_key TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    ease REAL NOT NULL,
+                    interval REAL NOT NULL,
+                    reps INTEGER NOT NULL,
+                    lapses INTEGER NOT NULL,
+                    due REAL NOT NULL,
+                    PRIMARY KEY (student_id, grade_level, topic, card_key)
+                );
+                CREATE TABLE IF NOT EXISTS reviews (
+                    student_id TEXT NOT NULL,
+                    grade_level TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    card_key TEXT NOT NULL,
+                    reviewed_at REAL NOT NULL,
+                    grade TEXT NOT NULL,
+                    answer_seconds REAL
+                );
+                CREATE INDEX IF NOT EXISTS reviews_student ON reviews (student_id, reviewed_at);
+            """)
+            self.db.commit()
+
+    def load(self, student_id, grade_level, topic):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT data, ease, interval, reps, lapses, due FROM deck_cards "
+                "WHERE student_id = ? AND grade_level = ? AND topic = ?",
+                (student_id, grade_level, normalize_topic(topic))
+            ).fetchall()
+        cards = []
+        for data, ease, interval, reps, lapses, due in rows:
+            data = json.loads(data)
+            cards.append(Card(data["front"], data["back"], due, ease, interval, reps, lapses))
+        return Deck(grade_level, topic, cards)
+
+    # Every deck the student has, as (grade_level, topic, cards, due now)
+    def decks(self, student_id):
+        with self.lock:
+            return self.db.execute(
+                "SELECT grade_level, topic, COUNT(*), SUM(due <= ?) FROM deck_cards WHERE student_id = ? "
+                "GROUP BY grade_level, topic ORDER BY MIN(due)",
+                (time.time(), student_id)
+            ).fetchall()
+
+    def add_cards(self, student_id, deck, cards):
+        rows = [
+            (student_id, deck.grade_level, normalize_topic(deck.topic), card_key(card.front),
+             json.dumps({"front": card.front, "back": card.back}),
+             card.ease, card.interval, card.reps, card.lapses, card.due)
+            for card in cards
+        ]
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO deck_cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def record_review(self, student_id, deck, card, grade, answer_seconds=None):
+        topic = normalize_topic(deck.topic)
+        key = card_key(card.front)
+        with self.lock:
+            self.db.execute(
+                "UPDATE deck_cards SET ease = ?, interval = ?, reps = ?, lapses = ?, due = ? "
+                "WHERE student_id = ? AND grade_level = ? AND topic = ? AND card_key = ?",
+                (card.ease, card.interval, card.reps, card.lapses, card.due,
+                 student_id, deck.grade_level, topic, key)
+            )
+            self.db.execute(
+                "INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (student_id, deck.grade_level, topic, key, time.time(), grade, answer_seconds)
+            )
+            self.db.commit()
+
+
+# Keeps decks only while the server runs
+class MemoryDeckStore:
+    def __init__(self):
+        self.cards = {}
+        self.reviews = []
+        self.lock = threading.Lock()
+
+    def load(self, student_id, grade_level, topic):
+        with self.lock:
+            cards = [replace(card) for card in self.cards.get((student_id, grade_level, normalize_topic(topic)), {}).values()]
+        return Deck(grade_level, topic, cards)
+
+    def decks(self, student_id):
+        now = time.time()
+        with self.lock:
+            found = [
+                (min(card.due for card in cards.values()), grade_level, topic, len(cards),
+                 sum(card.due <= now for card in cards.values()))
+                for (student, grade_level, topic), cards in self.cards.items() if student == student_id and cards
+            ]
+        return [deck[1:] for deck in sorted(found)]
+
+    def add_cards(self, student_id, deck, cards):
+        with self.lock:
+            stored = self.cards.setdefault((student_id, deck.grade_level, normalize_topic(deck.topic)), {})
+            for card in cards:
+                stored.setdefault(card_key(card.front), replace(card))
+
+    def record_review(self, student_id, deck, card, grade, answer_seconds=None):
+        with self.lock:
+            self.cards[(student_id, deck.grade_level, normalize_topic(deck.topic))][card_key(card.front)] = replace(card)
+            self.reviews.append((student_id, deck.grade_level, deck.topic, card_key(card.front), time.time(), grade, answer_seconds))
+
+
+DECK_STORES = {
+    "sqlite": SQLiteDeckStore,
+    "memory": MemoryDeckStore,
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_deck_store():
+    return DECK_STORES[DECK_STORE]()
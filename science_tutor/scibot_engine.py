@@ -0,0 +1,158 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from scibot_cache import make_key
+from scibot_client import make_async_client
+from scibot_coalesce import DIVERSIFY_MODES, shared
+from scibot_fallback import CircuitOpen, get_circuit_breaker, is_outage
+from scibot_scheduler import get_scheduler, request_tokens
+
+# How many API calls the whole server may have running at the same time
+MAX_IN_FLIGHT = int(os.environ.get("SCIBOT_MAX_IN_FLIGHT", "8"))
+# Finished jobs nobody came back for are thrown away after this many seconds
+JOB_TTL = int(os.environ.get("SCIBOT_JOB_TTL", "600"))
+
+
+# Runs quiz and flashcard generation on one background event loop shared by all sessions.
+# Jobs keep going when the page reruns, and the script just checks on them each rerun.
+# Identical jobs submitted while one is running share its call (see scibot_coalesce.py).
+class GenerationEngine:
+    # `breaker` (a CircuitBreaker, optional) makes jobs fail right away while the API is down
+    def __init__(self, scheduler, max_in_flight=MAX_IN_FLIGHT, diversify_modes=DIVERSIFY_MODES, breaker=None):
+        self.scheduler = scheduler
+        self.breaker = breaker
+        self.diversify_modes = diversify_modes
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="scibot-engine", daemon=True)
+        self.thread.start()
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.clients = {}
+        # job id -> (future, created, call key, joined someone else's call). Jobs sharing a call share its future.
+        self.jobs = {}
+        # call key -> future and scheduler ticket of the calls still running
+        self.flights = {}
+        self.tickets = {}
+        self.stats = {"calls": 0, "shared": 0}
+        # Reentrant, since a call that's already finished runs _landed() right away
+        self.lock = threading.RLock()
+
+    # `session` and `mode` decide the job's place in the scheduler's line
+    def submit(self, api_key, model, max_tokens, system, prompt, session, mode):
+        job_id = uuid.uuid4().hex
+        key = make_key(system, prompt, model, max_tokens) if shared(mode, self.diversify_modes) else job_id
+        with self.lock:
+            self._drop_old_jobs()
+            future = self.flights.get(key)
+            joined = future is not None
+            if not joined:
+                future = self.flights[key] = asyncio.run_coroutine_threadsafe(
+                    self._generate(key, api_key, model, max_tokens, system, prompt, session, mode), self.loop
+                )
+                future.add_done_callback(lambda _: self._landed(key))
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+            self.jobs[job_id] = (future, time.time(), key, joined)
+        return job_id
+
+    # Returns the job's concurrent.futures.Future, or None if it's unknown or expired
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return job[0] if job else None
+
+    # True if the job is riding along on a call another job started
+    def joined(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return bool(job and job[3])
+
+    def forget(self, job_id):
+        with self.lock:
+            self.jobs.pop(job_id, None)
+
+    # Stop a job nobody needs anymore. Its call is only cancelled if no other job shares it.
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is not None and not any(other[2] == job[2] for other in self.jobs.values()):
+                job[0].cancel()
+
+    # Where the job is in the scheduler's line (0 once it's running)
+    def position(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            ticket = self.tickets.get(job[2]) if job else None
+        return self.scheduler.position(ticket) if ticket else 0
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.flights)
+
+    def _landed(self, key):
+        with self.lock:
+            self.flights.pop(key, None)
+            self.tickets.pop(key, None)
+
+    async def _generate(self, key, api_key, model, max_tokens, system, prompt, session, mode):
+        client = self.clients.get(api_key)
+        if client is None:
+            client = self.clients[api_key] = make_async_client(api_key)
+
+        messages = [{"role": "user", "content": prompt}]
+        start = time.perf_counter()
+        for attempt in itertools.count():
+            if self.breaker and not self.breaker.allow():
+                raise CircuitOpen("SciBot can't reach the API right now")
+            ticket = self.scheduler.enqueue(session, mode, request_tokens(system, messages, max_tokens))
+            with self.lock:
+                self.tickets[key] = ticket
+            try:
+                await asyncio.wrap_future(ticket.granted)
+            except asyncio.CancelledError:
+                # Leave the line, or give back the tokens if its turn came just as it was cancelled
+                self.scheduler.release(ticket)
+                raise
+
+            try:
+                async with self.semaphore:
+                    message = await client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        system=system,
+                        messages=messages
+                    )
+            except asyncio.CancelledError:
+                self.scheduler.settle(ticket)
+                raise
+            except Exception as e:
+                self.scheduler.settle(ticket)
+                if self.breaker and is_outage(e):
+                    self.breaker.failure()
+                delay = self.scheduler.retry_after_error(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            self.scheduler.settle(ticket, message.usage)
+            if self.breaker:
+                self.breaker.success()
+            return {"text": message.content[0].text, "usage": message.usage, "latency": time.perf_counter() - start}
+
+    def _drop_old_jobs(self):
+        cutoff = time.time() - JOB_TTL
+        for job_id, (future, created, _, _) in list(self.jobs.items()):
+            if future.done() and created < cutoff:
+                del self.jobs[job_id]
+
+
+@st.cache_resource(show_spinner=False)
+def get_engine():
+    return GenerationEngine(get_scheduler(), breaker=get_circuit_breaker())
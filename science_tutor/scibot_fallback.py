@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+
+import anthropic
+import streamlit as st
+
+from scibot_bank import get_content_bank, normalize_topic
+from scibot_json import Question
+from scibot_progress import PROGRESS_STORE
+from scibot_semantic import STOPWORDS, question_kind
+
+# When the API is down (or science-fair Wi-Fi makes it crawl), SciBot answers from what it
+# has written before instead of showing an error.
+#
+# Every chat answer, quiz question and flashcard SciBot writes goes into a full-text index
+# (SQLite FTS5, ranked with BM25), along with everything in the content bank. If the API
+# fails, or hasn't said a word after SCIBOT_FALLBACK_SECONDS, the best matching saved
+# answer for the student's grade (and topic, if there is one) is shown instead.
+#
+# A circuit breaker stops asking an API that keeps failing: after SCIBOT_BREAKER_FAILURES
+# failures in a row every call goes straight to the saved answers, and one call is let
+# through every SCIBOT_BREAKER_COOLDOWN seconds to see if the API is back.
+FALLBACK_STORE = os.environ.get("SCIBOT_FALLBACK_STORE", PROGRESS_STORE)
+FALLBACK_PATH = os.environ.get(
+    "SCIBOT_FALLBACK_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_fallback.db")
+)
+FALLBACK_SECONDS = float(os.environ.get("SCIBOT_FALLBACK_SECONDS", "8"))
+BREAKER_FAILURES = int(os.environ.get("SCIBOT_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("SCIBOT_BREAKER_COOLDOWN", "30"))
+# A saved chat answer is only used if its question and the student's have at least this much
+# in common (see overlap(); benchmarks/bench_offline.py compares settings)
+MIN_OVERLAP = float(os.environ.get("SCIBOT_FALLBACK_OVERLAP", "0.6"))
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# Failures that mean the API (or the way to it) is in trouble. Rate limits and bad requests don't count.
+def is_outage(error):
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, (anthropic.APIConnectionError, CircuitOpen))
+
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        # When the breaker opened (or last let a test call through), None while it's closed
+        self.opened_at = None
+        self.lock = threading.Lock()
+        self.stats = {"opened": 0, "skipped": 0}
+
+    # False if calls shouldn't go to the API right now
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.cooldown:
+                # Let one call through to see if the API is back
+                self.opened_at = time.time()
+                return True
+            self.stats["skipped"] += 1
+            return False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.max_failures:
+                if self.opened_at is None:
+                    self.stats["opened"] += 1
+                self.opened_at = time.time()
+
+
+# The words that carry meaning, for the search and for checking a match
+def content_words(text):
+    text = text.casefold().replace("n't", " not").replace("'", "")
+    return [word for word in WORD.findall(text) if word not in STOPWORDS]
+
+
+# Any of the words may match (in `column`, or anywhere); BM25 ranks the rows with more (and rarer) ones first
+def match_query(text, column=None):
+    words = " OR ".join(f'"{word}"' for word in dict.fromkeys(content_words(text)))
+    return f"{column} : ({words})" if column and words else words
+
+
+# How much two questions have in common: the words in both, out of the words in the longer
+# one. Words count as the same if they start the same ("planet" and "planets", "float" and "floating").
+def overlap(question, found):
+    words = {word[:5] for word in content_words(question)}
+    stems = {word[:5] for word in content_words(found)}
+    return len(words & stems) / max(len(words), len(stems)) if words else 0
+
+
+class FallbackIndex:
+    def __init__(self, path=FALLBACK_PATH):
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS saved USING fts5(
+                    kind UNINDEXED,
+                    grade_level UNINDEXED,
+                    topic,
+                    question,
+                    answer,
+                    data UNINDEXED,
+                    tokenize = 'porter unicode61'
+                );
+                CREATE TABLE IF NOT EXISTS saved_keys (key TEXT PRIMARY KEY);
+            """)
+            self.db.commit()
+
+    # rows are (kind, grade_level, topic, question, answer, data). Rows already in the index are skipped.
+    def _add(self, rows):
+        with self.lock:
+            for kind, grade_level, topic, question, answer, data in rows:
+                key = hashlib.sha256(json.dumps([kind, grade_level, normalize_topic(topic), " ".join(question.casefold().split())]).encode()).hexdigest()
+                if self.db.execute("INSERT OR IGNORE INTO saved_keys VALUES (?)", (key,)).rowcount:
+                    self.db.execute("INSERT INTO saved VALUES (?, ?, ?, ?, ?, ?)", (kind, grade_level, normalize_topic(topic), question, answer, data))
+            self.db.commit()
+
+    def add_answer(self, grade_level, topic, question, answer):
+        self._add([("chat", grade_level, topic, question, answer, "")])
+
+    def add_questions(self, grade_level, topic, questions):
+        self._add([
+            ("quiz", grade_level, topic, q.question, " ".join((*q.options, q.explanation)), json.dumps(asdict(q)))
+            for q in questions
+        ])
+
+    def add_cards(self, grade_level, topic, cards):
+        self._add([("card", grade_level, topic, card["front"], card["back"], json.dumps(card)) for card in cards])
+
+    # Everything in the content bank (made ahead of time, or imported from class quizzes)
+    def add_bank(self, bank):
+        self._add([
+            ("quiz", grade_level, topic, q["question"], " ".join((*q["options"], q["explanation"])), json.dumps(q))
+            for grade_level, topic, q in bank.items("questions")
+        ])
+        self._add([
+            ("card", grade_level, topic, card["front"], card["back"], json.dumps(card))
+            for grade_level, topic, card in bank.items("cards")
+        ])
+
+    # Every saved (grade_level, topic, item) of one kind ("quiz" or "card")
+    def items(self, kind):
+        with self.lock:
+            rows = self.db.execute("SELECT grade_level, topic, data FROM saved WHERE kind = ?", (kind,)).fetchall()
+        return [(grade_level, topic, json.loads(data)) for grade_level, topic, data in rows]
+
+    def _search(self, kind, grade_level, topic, text, limit, column=None):
+        query = match_query(text, column)
+        if not query:
+            return []
+        with self.lock:
+            return self.db.execute(
+                "SELECT question, answer, data FROM saved WHERE saved MATCH ? AND kind = ? AND grade_level = ? "
+                "ORDER BY topic != ?, bm25(saved) LIMIT ?",
+                (query, kind, grade_level, normalize_topic(topic), limit)
+            ).fetchall()
+
+    # The saved chat answer that best matches the question as (question it answered, answer), or None.
+    # Answers from the same sidebar topic come first, and only questions of the same kind count
+    # (see question_kind in scibot_semantic.py).
+    def answer(self, grade_level, topic, question):
+        for found, answer, _ in self._search("chat", grade_level, topic, question, 5, "question"):
+            if question_kind(question) == question_kind(found) and overlap(question, found) >= MIN_OVERLAP:
+                return found, answer
+        return None
+
+    # Saved quiz questions about the quiz topic, or an empty list if there aren't `count` of them
+    def questions(self, grade_level, topic, count):
+        rows = self._search("quiz", grade_level, topic, topic, count)
+        if len(rows) < count:
+            return []
+        return [Question(q["question"], tuple(q["options"]), q["correct"], q["explanation"]) for q in (json.loads(row[2]) for row in rows)]
+
+    def cards(self, grade_level, topic, count):
+        return [json.loads(row[2]) for row in self._search("card", grade_level, topic, topic, count)]
+
+
+FALLBACK_PATHS = {
+    "sqlite": FALLBACK_PATH,
+    "memory": ":memory:",
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_fallback_index():
+    index = FallbackIndex(FALLBACK_PATHS[FALLBACK_STORE])
+    index.add_bank(get_content_bank())
+    return index
+
+
+# One per server process, shared by the chat page and the background engine
+@st.cache_resource(show_spinner=False)
+def get_circuit_breaker():
+    return CircuitBreaker()
@@ -0,0 +1,129 @@
+import json
+import re
+from dataclasses import dataclass
+
+# Reading quiz and flashcard JSON from SciBot.
+#
+# Instead of one json.loads on the whole answer (which fails if the model adds a sentence
+# or gets cut off), we scan the text and pull out every complete question/card object.
+# A cut-off answer still gives us all the items before the cut.
+
+LETTERS = "ABCD"
+
+
+# One quiz question. Every open quiz keeps its questions in memory, so they use __slots__
+# (no dict per question).
+@dataclass(slots=True)
+class Question:
+    question: str
+    options: tuple
+    correct: str
+    explanation: str
+
+
+# Every complete object in the list stored under list_key ("questions" or "cards"). Quiz
+# and flashcard answers come back whole from the engine (they're shared, cached and
+# checked as a whole), so the text is scanned once, from the list to where it ends or
+# is cut off.
+def find_items(text, list_key):
+    items = []
+    match = re.search(r'"%s"\s*:\s*\[' % re.escape(list_key), text)
+    if not match:
+        return items
+
+    depth = 0
+    in_string = False
+    escaped = False
+    start = None
+    for pos in range(match.end(), len(text)):
+        ch = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            if depth == 0 and ch == "{":
+                start = pos
+            depth += 1
+        elif ch in "}]":
+            if depth == 0:
+                # End of the list
+                break
+            depth -= 1
+            if depth == 0 and start is not None:
+                try:
+                    items.append(json.loads(text[start:pos + 1]))
+                except ValueError:
+                    pass
+                start = None
+
+    return items
+
+
+def find_title(text):
+    match = re.search(r'"title"\s*:\s*("(?:[^"\\]|\\.)*")', text)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except ValueError:
+            pass
+    return None
+
+
+# Check a quiz question and tidy it up. Returns None if it can't be used.
+def clean_question(item):
+    if not isinstance(item, dict):
+        return None
+
+    question = item.get("question")
+    options = item.get("options")
+    correct = str(item.get("correct", "")).strip().upper()[:1]
+    explanation = item.get("explanation")
+
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(option, str) and option.strip() for option in options):
+        return None
+    if not correct or correct not in LETTERS:
+        return None
+
+    # Grading uses the first letter of the chosen option, so make sure every option has one
+    labelled = []
+    for letter, option in zip(LETTERS, options):
+        option = option.strip()
+        if not re.match(r"%s[).:]" % letter, option):
+            option = f"{letter}) {option}"
+        labelled.append(option)
+
+    return Question(question.strip(), tuple(labelled), correct, explanation.strip() if isinstance(explanation, str) else "")
+
+
+def clean_card(item):
+    if not isinstance(item, dict):
+        return None
+
+    front = item.get("front")
+    back = item.get("back")
+    if not isinstance(front, str) or not front.strip():
+        return None
+    if not isinstance(back, str) or not back.strip():
+        return None
+
+    return {"front": front.strip(), "back": back.strip()}
+
+
+# Returns (title, questions) with every usable question that could be read
+def parse_quiz(text):
+    questions = [q for q in map(clean_question, find_items(text, "questions")) if q]
+    return find_title(text), questions
+
+
+def parse_cards(text):
+    return [card for card in map(clean_card, find_items(text, "cards")) if card]
@@ -0,0 +1,374 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+import anthropic
+import streamlit as st
+
+from scibot_bank import ContentBank, BANK_PATH, get_content_bank, normalize_topic
+from scibot_client import MAX_TOKENS, MODEL
+from scibot_data import GRADE_MAPPING
+from scibot_json import Question, parse_quiz
+from scibot_prompts import quiz_system_prompt
+
+# Class quizzes: a teacher uploads a list of topics and grades, SciBot writes every quiz in
+# one Message Batch (half the price, and it doesn't use up the rate limit students need for
+# chat), and the finished quizzes go into a library the quiz page loads instantly.
+#
+#   python science_tutor/scibot_library.py quizzes.csv
+#   python science_tutor/scibot_library.py quizzes.csv --no-wait
+#   python science_tutor/scibot_library.py --resume msgbatch_01...
+#
+# The CSV has a header row with the columns topic, grade and (optionally) questions, e.g.
+#   topic,grade,questions
+#   Photosynthesis,3rd - 5th Grade,5
+#   Solar System,Middle School,10
+# Batches can take up to a day. With --no-wait (or from the teacher page in the app) the
+# batch is written down in the library, and the app imports it in the background when it's done.
+# A batch belongs to the API key that sent it, so the library remembers a fingerprint of
+# that key (never the key itself) and the app checks on it with the same key.
+LIBRARY_PATH = os.environ.get(
+    "SCIBOT_LIBRARY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_library.db")
+)
+# How often the app checks on batches that aren't done yet
+POLL_SECONDS = float(os.environ.get("SCIBOT_BATCH_POLL_SECONDS", "60"))
+# Same range as the slider on the quiz page
+MIN_QUESTIONS, MAX_QUESTIONS = 3, 10
+
+
+# "middle school" or "6th - 8th grade (middle school)" -> "6th - 8th Grade (Middle School)"
+def find_grade(text):
+    text = " ".join(text.casefold().split())
+    names = {grade: [" ".join(name.casefold().split()) for name in (grade, info["level"])] for grade, info in GRADE_MAPPING.items()}
+    for grade, forms in names.items():
+        if text in forms:
+            return grade
+    found = [grade for grade, forms in names.items() if text and any(text in form for form in forms)]
+    return found[0] if len(found) == 1 else None
+
+
+# Reads the teacher's CSV. Returns (plan, problems): one {"topic", "grade_level", "questions"}
+# per good row, and a message for every row that was skipped.
+def read_plan(lines):
+    plan, problems = [], []
+    reader = csv.DictReader(lines)
+    reader.fieldnames = [" ".join((name or "").casefold().split()) for name in reader.fieldnames or []]
+    if "topic" not in reader.fieldnames or "grade" not in reader.fieldnames:
+        return plan, ["The first row needs the column names topic, grade and questions."]
+    for row in reader:
+        line = reader.line_num
+        topic = " ".join((row.get("topic") or "").split())
+        grade_level = find_grade(row.get("grade") or "")
+        questions = (row.get("questions") or "").strip() or "5"
+        if not topic:
+            problems.append(f"Line {line}: no topic")
+        elif grade_level is None:
+            problems.append(f"Line {line}: can't tell which grade {row.get('grade')!r} is")
+        elif not questions.isdigit() or not MIN_QUESTIONS <= int(questions) <= MAX_QUESTIONS:
+            problems.append(f"Line {line}: questions must be a number from {MIN_QUESTIONS} to {MAX_QUESTIONS}")
+        else:
+            plan.append({"topic": topic, "grade_level": grade_level, "questions": int(questions)})
+    return plan, problems
+
+
+# Which API key sent a batch, without saving the key
+def key_id(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+# One batch request per quiz, with the same prompts as the quiz page. custom_id is the row in the plan.
+def plan_requests(plan):
+    requests = []
+    for n, row in enumerate(plan):
+        current_grade = GRADE_MAPPING[row["grade_level"]]
+        requests.append({
+            "custom_id": f"quiz-{n}",
+            "params": {
+                "model": MODEL,
+                "max_tokens": MAX_TOKENS,
+                "system": quiz_system_prompt(current_grade, row["questions"], row["topic"]),
+                "messages": [{"role": "user", "content": f"Create a {row['questions']}-question quiz about {row['topic']} for {current_grade['level']} level"}]
+            }
+        })
+    return requests
+
+
+class QuizLibrary:
+    def __init__(self, path=LIBRARY_PATH):
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS quizzes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    grade_level TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    num_questions INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    batch_id TEXT,
+                    added_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS quizzes_topic ON quizzes (grade_level, topic, num_questions);
+                CREATE TABLE IF NOT EXISTS batches (
+                    batch_id TEXT PRIMARY KEY,
+                    submitted_at REAL NOT NULL,
+                    plan TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    succeeded INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    quizzes INTEGER NOT NULL DEFAULT 0,
+                    key_id TEXT
+                );
+            """)
+            # Libraries made before batches remembered their key
+            if "key_id" not in [row[1] for row in self.db.execute("PRAGMA table_info(batches)")]:
+                self.db.execute("ALTER TABLE batches ADD COLUMN key_id TEXT")
+            self.db.commit()
+
+    # Returns False (and adds nothing) if the library already has this quiz
+    def add_quiz(self, grade_level, topic, title, questions, batch_id=None):
+        data = json.dumps([asdict(q) for q in questions])
+        with self.lock:
+            if self.db.execute(
+                "SELECT 1 FROM quizzes WHERE grade_level = ? AND topic = ? AND num_questions = ? AND data = ?",
+                (grade_level, normalize_topic(topic), len(questions), data)
+            ).fetchone():
+                return False
+            self.db.execute(
+                "INSERT INTO quizzes (grade_level, topic, title, num_questions, data, batch_id, added_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (grade_level, normalize_topic(topic), title, len(questions), data, batch_id, time.time())
+            )
+            self.db.commit()
+        return True
+
+    # A random class quiz with at least `num_questions` questions (cut down to that many), or None
+    def pick(self, grade_level, topic, num_questions):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT title, data FROM quizzes WHERE grade_level = ? AND topic = ? AND num_questions >= ? ORDER BY RANDOM() LIMIT 1",
+                (grade_level, normalize_topic(topic), num_questions)
+            ).fetchone()
+        if row is None:
+            return None
+        questions = [Question(q["question"], tuple(q["options"]), q["correct"], q["explanation"]) for q in json.loads(row[1])]
+        return {"title": row[0], "questions": questions[:num_questions]}
+
+    # Every quiz in the library as (grade_level, topic, title, questions as dicts)
+    def items(self):
+        with self.lock:
+            rows = self.db.execute("SELECT grade_level, topic, title, data FROM quizzes ORDER BY id").fetchall()
+        return [(grade_level, topic, title, json.loads(data)) for grade_level, topic, title, data in rows]
+
+    # (grade_level, topic, quizzes) for everything in the library
+    def summary(self):
+        with self.lock:
+            return self.db.execute(
+                "SELECT grade_level, topic, COUNT(*) FROM quizzes GROUP BY grade_level, topic ORDER BY grade_level, topic"
+            ).fetchall()
+
+    def add_batch(self, batch_id, plan, api_key_id=None):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, submitted_at, plan, status, key_id) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, time.time(), json.dumps(plan), "in_progress", api_key_id)
+            )
+            self.db.commit()
+
+    # (batch_id, plan, key_id) of every batch that hasn't been imported yet
+    def open_batches(self):
+        with self.lock:
+            rows = self.db.execute("SELECT batch_id, plan, key_id FROM batches WHERE status NOT IN ('imported', 'importing')").fetchall()
+        return [(batch_id, json.loads(plan), api_key_id) for batch_id, plan, api_key_id in rows]
+
+    def update_batch(self, batch_id, status, succeeded, failed):
+        with self.lock:
+            self.db.execute(
+                "UPDATE batches SET status = ?, succeeded = ?, failed = ? WHERE batch_id = ? AND status NOT IN ('imported', 'importing')",
+                (status, succeeded, failed, batch_id)
+            )
+            self.db.commit()
+
+    # True for the one caller (of all the server's workers) that gets to import a finished batch
+    def claim_batch(self, batch_id):
+        with self.lock:
+            claimed = self.db.execute(
+                "UPDATE batches SET status = 'importing' WHERE batch_id = ? AND status NOT IN ('imported', 'importing')", (batch_id,)
+            ).rowcount
+            self.db.commit()
+        return claimed == 1
+
+    # `quizzes` is None if the import failed and should be tried again
+    def finish_batch(self, batch_id, quizzes):
+        with self.lock:
+            if quizzes is None:
+                self.db.execute("UPDATE batches SET status = 'ended' WHERE batch_id = ?", (batch_id,))
+            else:
+                self.db.execute("UPDATE batches SET status = 'imported', quizzes = ? WHERE batch_id = ?", (quizzes, batch_id))
+            self.db.commit()
+
+    # The latest batches as (batch_id, submitted_at, status, requests, succeeded, failed, quizzes)
+    def batches(self, limit=20):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT batch_id, submitted_at, status, plan, succeeded, failed, quizzes FROM batches ORDER BY submitted_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [(batch_id, submitted_at, status, len(json.loads(plan)), succeeded, failed, quizzes)
+                for batch_id, submitted_at, status, plan, succeeded, failed, quizzes in rows]
+
+
+# Sends the whole plan as one batch and writes it down in the library. Returns the batch id.
+def submit_batch(client, library, plan):
+    batch = client.messages.batches.create(requests=plan_requests(plan))
+    library.add_batch(batch.id, plan, key_id(client.api_key))
+    return batch.id
+
+
+# Puts every quiz from a finished batch in the library (and its questions in the content
+# bank, so quizzes of other sizes can use them too). Returns how many quizzes were added.
+def import_batch(client, library, bank, batch_id, plan):
+    added = 0
+    for entry in client.messages.batches.results(batch_id):
+        if entry.result.type != "succeeded":
+            # Already counted as failed in the batch's row
+            continue
+        row = plan[int(entry.custom_id.split("-")[1])]
+        title, questions = parse_quiz(entry.result.message.content[0].text)
+        if questions:
+            library.add_quiz(row["grade_level"], row["topic"], title or f"{row['topic'].title()} Quiz", questions[:row["questions"]], batch_id)
+            bank.add_questions(row["grade_level"], row["topic"], questions)
+            added += 1
+    return added
+
+
+# Checks on unfinished batches in the background and imports them when they're done
+class BatchTracker:
+    def __init__(self, library, bank, poll_seconds=POLL_SECONDS):
+        self.library = library
+        self.bank = bank
+        self.poll_seconds = poll_seconds
+        # key_id -> client, for every API key this server has seen
+        self.clients = {}
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # Batches sent with this client's API key can be checked with it from now on
+    def watch(self, client):
+        with self.lock:
+            self.clients.setdefault(key_id(client.api_key), client)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="scibot-batches", daemon=True)
+                self.thread.start()
+
+    # Check every open batch once, each with the API key that sent it. A batch that can't be
+    # checked (its key isn't here, or the API said no) is tried again next time.
+    # Returns how many quizzes were imported.
+    def check(self):
+        imported = 0
+        with self.lock:
+            clients = dict(self.clients)
+        for batch_id, plan, api_key_id in self.library.open_batches():
+            # Batches from before the library remembered keys get whichever key is here first
+            client = clients.get(api_key_id) if api_key_id else next(iter(clients.values()), None)
+            if client is None:
+                continue
+            try:
+                imported += self._check_batch(client, batch_id, plan)
+            except Exception:
+                # The batch stays open and is checked again next time
+                pass
+        return imported
+
+    def _check_batch(self, client, batch_id, plan):
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        self.library.update_batch(batch_id, batch.processing_status, counts.succeeded,
+                                  counts.errored + counts.canceled + counts.expired)
+        if batch.processing_status != "ended" or not self.library.claim_batch(batch_id):
+            return 0
+        quizzes = None
+        try:
+            quizzes = import_batch(client, self.library, self.bank, batch_id, plan)
+        finally:
+            self.library.finish_batch(batch_id, quizzes)
+        return quizzes
+
+    def _loop(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                # Most likely the library is busy; try again next round
+                pass
+            time.sleep(self.poll_seconds)
+
+
+@st.cache_resource(show_spinner=False)
+def get_quiz_library():
+    return QuizLibrary()
+
+
+@st.cache_resource(show_spinner=False)
+def get_batch_tracker():
+    return BatchTracker(get_quiz_library(), get_content_bank())
+
+
+def main():
+    from scibot_warmup import wait_for_batch
+
+    parser = argparse.ArgumentParser(description="Make class quizzes from a CSV of topics and grades with one Message Batch.")
+    parser.add_argument("csv", nargs="?", help="CSV with the columns topic, grade and questions")
+    parser.add_argument("--library", default=LIBRARY_PATH, help="quiz library file")
+    parser.add_argument("--bank", default=BANK_PATH, help="content bank file")
+    parser.add_argument("--poll", type=float, default=30, help="seconds between batch status checks")
+    parser.add_argument("--no-wait", action="store_true", help="just send the batch; the app imports it when it's done")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="wait for and import an already submitted batch")
+    args = parser.parse_args()
+    if not args.csv and not args.resume:
+        parser.error("give a CSV file or --resume BATCH_ID")
+
+    client = anthropic.Anthropic()
+    library = QuizLibrary(args.library)
+
+    if args.resume:
+        batch_id = args.resume
+        plan = {open_id: plan for open_id, plan, _ in library.open_batches()}.get(batch_id)
+        if plan is None:
+            sys.exit(f"Batch {batch_id} isn't waiting to be imported in {args.library}")
+    else:
+        with open(args.csv, newline="", encoding="utf-8-sig") as f:
+            plan, problems = read_plan(f)
+        for problem in problems:
+            print(f"  skipped - {problem}")
+        if not plan:
+            sys.exit("No quizzes to make")
+        batch_id = submit_batch(client, library, plan)
+        print(f"Submitted batch {batch_id} with {len(plan)} quizzes")
+        if args.no_wait:
+            return
+
+    batch = wait_for_batch(client, batch_id, args.poll)
+    counts = batch.request_counts
+    library.update_batch(batch_id, batch.processing_status, counts.succeeded, counts.errored + counts.canceled + counts.expired)
+    if not library.claim_batch(batch_id):
+        sys.exit(f"Batch {batch_id} is already being imported")
+    quizzes = None
+    try:
+        quizzes = import_batch(client, library, ContentBank(args.bank), batch_id, plan)
+    finally:
+        library.finish_batch(batch_id, quizzes)
+    print(f"Added {quizzes} quizzes to {args.library}")
+
+
+if __name__ == "__main__":
+    main()
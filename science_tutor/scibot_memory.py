@@ -0,0 +1,60 @@
+import os
+from dataclasses import dataclass
+
+# Conversation memory for chat mode.
+#
+# SciBot gets the most recent turns word for word, as long as they fit in a token budget.
+# Older turns are folded into a short running summary (made in the background), so the
+# amount we send per question stays about the same no matter how long the chat gets.
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("SCIBOT_HISTORY_TOKENS", "1500"))
+# How many chat messages are shown before "Load older messages"
+CHAT_PAGE_SIZE = int(os.environ.get("SCIBOT_CHAT_PAGE_SIZE", "20"))
+
+
+# One chat message. A long chat is a lot of these, so they use __slots__ (no dict per message).
+@dataclass(slots=True)
+class Message:
+    role: str
+    content: str
+
+
+# Rough count that's good enough for budgeting (about 4 characters per token in English)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+# Find where the recent history starts: the oldest message (after the summarized ones)
+# that still fits in the budget. Always includes the newest message and starts on a
+# student message, since the API expects the conversation to start with the user.
+def history_start(messages, summarized, budget=HISTORY_TOKEN_BUDGET):
+    start = len(messages) - 1
+    used = estimate_tokens(messages[start].content) if messages else 0
+    while start > summarized:
+        cost = estimate_tokens(messages[start - 1].content)
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+
+    while start < len(messages) - 1 and messages[start].role != "user":
+        start += 1
+    return start
+
+
+# The recent part of the chat, as the dicts the API expects
+def recent_history(messages, summarized, budget=HISTORY_TOKEN_BUDGET):
+    start = history_start(messages, summarized, budget)
+    return [{"role": m.role, "content": m.content} for m in messages[start:]]
+
+
+# Prompt asking SciBot to fold some older messages into the running summary
+def summary_request(summary, messages):
+    transcript = "\n".join(
+        f"{'Student' if m.role == 'user' else 'SciBot'}: {m.content}" for m in messages
+    )
+    prompt = ""
+    if summary:
+        prompt += f"Summary so far:\n{summary}\n\n"
+    prompt += f"New part of the conversation:\n{transcript}\n\nWrite the updated summary."
+    return prompt
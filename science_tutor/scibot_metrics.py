@@ -0,0 +1,191 @@
+import atexit
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+# Per-call metrics: how long each SciBot call took, how many tokens it used and whether it worked.
+# Recent calls are kept in memory for the dashboard, and every call is appended to a log file.
+# Like saved progress (scibot_progress.py), the log lines go on a queue and a background
+# thread writes them, so recording a call never waits for the disk. When the log gets
+# bigger than SCIBOT_METRICS_MAX_MB it's renamed to scibot_metrics.jsonl.1 (the older ones
+# move up to .2, .3, ...) and a new one is started; SCIBOT_METRICS_BACKUPS old logs are kept.
+BUFFER_SIZE = int(os.environ.get("SCIBOT_METRICS_BUFFER", "5000"))
+LOG_PATH = os.environ.get(
+    "SCIBOT_METRICS_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_metrics.jsonl")
+)
+MAX_LOG_BYTES = int(float(os.environ.get("SCIBOT_METRICS_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get("SCIBOT_METRICS_BACKUPS", "3"))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class MetricsRecorder:
+    def __init__(self, log_path=LOG_PATH, buffer_size=BUFFER_SIZE, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.calls = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.lines = queue.Queue()
+        # Batches of calls that couldn't be written to the log (shown on the metrics page)
+        self.write_errors = 0
+
+        # Pick up where we left off after a restart (the last log may have just been rotated)
+        for path in [f"{log_path}.1", log_path] if log_path else []:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self.calls.append(json.loads(line))
+                        except ValueError:
+                            pass
+
+        if log_path:
+            self.writer = threading.Thread(target=self._write_loop, name="scibot-metrics", daemon=True)
+            self.writer.start()
+            atexit.register(self.flush)
+
+    # outcome is "ok", "cached", "shared" (got a classmate's answer to the same request), "fallback"
+    # (the API failed or was too slow, so a saved answer was shown) or "error";
+    # usage is the API's usage object (or None)
+    def record(self, mode, model, outcome, total, ttft=None, usage=None, error=None):
+        call = {
+            "time": time.time(),
+            "mode": mode,
+            "model": model,
+            "outcome": outcome,
+            "total": round(total, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "error": error,
+        }
+        with self.lock:
+            self.calls.append(call)
+        if self.log_path:
+            self.lines.put(json.dumps(call))
+
+    # Write everything that's waiting right now
+    def flush(self):
+        if self.log_path:
+            done = threading.Event()
+            self.lines.put(done)
+            done.wait(timeout=5)
+
+    def _write_loop(self):
+        while True:
+            batch = [self.lines.get()]
+            # Whatever else came in while the last batch was written goes in the same write
+            while True:
+                try:
+                    batch.append(self.lines.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = [line for line in batch if isinstance(line, str)]
+            try:
+                if lines:
+                    self._write(lines)
+            except OSError:
+                self.write_errors += 1
+
+            for line in batch:
+                if isinstance(line, threading.Event):
+                    line.set()
+
+    # Opened for every batch, so all the workers of a deploy (deploy/run_workers.py) write to
+    # the current log after one of them rotates it
+    def _write(self, lines):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            size = f.tell()
+        if self.max_bytes and size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.log_path}.{n}"):
+                os.replace(f"{self.log_path}.{n}", f"{self.log_path}.{n + 1}")
+        try:
+            if self.backups > 0:
+                os.replace(self.log_path, f"{self.log_path}.1")
+            else:
+                os.remove(self.log_path)
+        except FileNotFoundError:
+            # Another worker rotated it first
+            pass
+
+    def recent(self, seconds=None):
+        with self.lock:
+            calls = list(self.calls)
+        if seconds is None:
+            return calls
+        cutoff = time.time() - seconds
+        return [call for call in calls if call["time"] >= cutoff]
+
+
+# Latency percentiles and totals for a list of calls
+def summarize(calls):
+    api_calls = [call for call in calls if call["outcome"] not in ("cached", "shared")]
+    totals = [call["total"] for call in api_calls if call["outcome"] == "ok"]
+    ttfts = [call["ttft"] for call in api_calls if call["ttft"] is not None]
+    return {
+        "calls": len(calls),
+        "cached": sum(1 for call in calls if call["outcome"] == "cached"),
+        "shared": sum(1 for call in calls if call["outcome"] == "shared"),
+        "fallback": sum(1 for call in calls if call["outcome"] == "fallback"),
+        "errors": sum(1 for call in api_calls if call["outcome"] == "error"),
+        "p50": percentile(totals, 50),
+        "p95": percentile(totals, 95),
+        "p99": percentile(totals, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "input_tokens": sum(call["input_tokens"] for call in calls),
+        "output_tokens": sum(call["output_tokens"] for call in calls),
+        "cache_read_tokens": sum(call["cache_read_tokens"] for call in calls),
+        "cache_write_tokens": sum(call["cache_write_tokens"] for call in calls),
+    }
+
+
+# Calls and tokens per time bucket, for the charts
+def timeline(calls, bucket_seconds=60):
+    buckets = {}
+    for call in calls:
+        start = int(call["time"] // bucket_seconds * bucket_seconds)
+        bucket = buckets.setdefault(start, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "latency": []})
+        bucket["calls"] += 1
+        bucket["input_tokens"] += call["input_tokens"]
+        bucket["output_tokens"] += call["output_tokens"]
+        if call["outcome"] == "ok":
+            bucket["latency"].append(call["total"])
+
+    rows = []
+    for start in sorted(buckets):
+        bucket = buckets[start]
+        rows.append({
+            "time": time.strftime("%H:%M", time.localtime(start)),
+            "calls": bucket["calls"],
+            "input_tokens": bucket["input_tokens"],
+            "output_tokens": bucket["output_tokens"],
+            "p95_latency": percentile(bucket["latency"], 95) or 0,
+        })
+    return rows
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    return MetricsRecorder()
@@ -0,0 +1,259 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import streamlit as st
+
+from scibot_bank import BANK_PATH, ContentBank
+from scibot_fallback import FALLBACK_PATH, FallbackIndex
+from scibot_data import GRADE_MAPPING
+from scibot_json import clean_card, clean_question
+from scibot_library import LIBRARY_PATH, QuizLibrary
+
+# Quiz packs: one file with the quizzes and flashcards a SciBot server has, so another
+# server (or the same one next week) gets them by copying a file instead of asking the API
+# to write them all again.
+#
+#   python science_tutor/scibot_packs.py export class.scibotpack
+#   python science_tutor/scibot_packs.py list class.scibotpack
+#   python science_tutor/scibot_packs.py import class.scibotpack
+#
+# A pack has three kinds of entries: class quizzes from the library ("quiz"), and the other
+# quiz questions ("questions") and flashcards ("deck") SciBot has for each grade and topic.
+#
+# The file is a fixed header (magic bytes, format version, index size), then the index
+# (zlib-compressed JSON, one line per entry with its grade, topic, title, size and where it
+# is), then every entry compressed on its own. Opening a pack only reads the header and the
+# index; the file is memory-mapped, so opening one quiz decompresses just that quiz.
+PACKS_DIR = os.environ.get(
+    "SCIBOT_PACKS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "packs")
+)
+PACK_SUFFIX = ".scibotpack"
+
+MAGIC = b"SCIBOTPK"
+# Packs from a newer SciBot (with a higher version) can't be opened
+VERSION = 1
+HEADER = struct.Struct("<8sHI")
+KINDS = {"quiz": "Class quiz", "questions": "Quiz questions", "deck": "Flashcards"}
+# What every line of the index has to have
+ENTRY_FIELDS = {"kind": str, "grade_level": str, "topic": str, "title": str, "count": int, "offset": int, "size": int}
+
+
+class PackError(Exception):
+    pass
+
+
+def question_key(text):
+    return " ".join(text.casefold().split())
+
+
+# Everything a pack made right now would hold, as (kind, grade_level, topic, title, content)
+def pack_entries(library, bank, index):
+    entries = []
+    in_quizzes = set()
+    for grade_level, topic, title, questions in library.items():
+        entries.append(("quiz", grade_level, topic, title, {"title": title, "questions": questions}))
+        in_quizzes.update((grade_level, topic, question_key(q["question"])) for q in questions)
+
+    # The bank and the offline index have the same questions and cards a lot of the time
+    groups = {"questions": {}, "deck": {}}
+    for grade_level, topic, q in bank.items("questions") + index.items("quiz"):
+        if (grade_level, topic, question_key(q["question"])) not in in_quizzes:
+            groups["questions"].setdefault((grade_level, topic), {}).setdefault(question_key(q["question"]), q)
+    for grade_level, topic, card in bank.items("cards") + index.items("card"):
+        groups["deck"].setdefault((grade_level, topic), {}).setdefault(question_key(card["front"]), card)
+
+    for (grade_level, topic), questions in sorted(groups["questions"].items()):
+        entries.append(("questions", grade_level, topic, f"{topic.title()} Questions", {"questions": list(questions.values())}))
+    for (grade_level, topic), cards in sorted(groups["deck"].items()):
+        entries.append(("deck", grade_level, topic, f"{topic.title()} Flashcards", {"cards": list(cards.values())}))
+    return entries
+
+
+# Writes the entries to `path` as a pack. The file only shows up once it's complete, so a
+# server reading the packs folder never sees half a pack.
+def write_pack(path, entries):
+    index, records, offset = [], [], 0
+    for kind, grade_level, topic, title, content in entries:
+        record = zlib.compress(json.dumps(content, separators=(",", ":")).encode(), 9)
+        index.append({
+            "kind": kind, "grade_level": grade_level, "topic": topic, "title": title,
+            "count": len(content.get("questions", content.get("cards", []))), "offset": offset, "size": len(record),
+        })
+        records.append(record)
+        offset += len(record)
+    index = zlib.compress(json.dumps({"made_at": time.time(), "entries": index}, separators=(",", ":")).encode(), 9)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+        f.write(index)
+        f.writelines(records)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# Reads a pack's header and index from `data` (bytes, or the memory-mapped file). Returns
+# (when it was made, its entries, where the entries start). Packs can come from anywhere,
+# so every entry is checked, including that it lies inside the file.
+def read_index(data):
+    if not data:
+        raise PackError("The pack is empty")
+    try:
+        magic, version, index_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise PackError("This isn't a SciBot quiz pack")
+        if version > VERSION:
+            raise PackError(f"This pack was made by a newer SciBot (pack version {version})")
+        index = json.loads(zlib.decompress(data[HEADER.size:HEADER.size + index_size]))
+    except (struct.error, zlib.error, ValueError) as e:
+        raise PackError(f"The pack is damaged: {e}")
+
+    start = HEADER.size + index_size
+    entries = index.get("entries") if isinstance(index, dict) else None
+    if not isinstance(entries, list) or not isinstance(index.get("made_at"), (int, float)):
+        raise PackError("The pack is damaged: its list of contents can't be read")
+    for entry in entries:
+        if not isinstance(entry, dict) or not all(isinstance(entry.get(field), kind) for field, kind in ENTRY_FIELDS.items()):
+            raise PackError("The pack is damaged: an entry in its list of contents is incomplete")
+        if entry["offset"] < 0 or entry["size"] <= 0 or start + entry["offset"] + entry["size"] > len(data):
+            raise PackError(f"The pack is damaged: {entry['title']!r} is cut off")
+    return index["made_at"], entries, start
+
+
+class ContentPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise PackError("The pack is empty")
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # entries are {"kind", "grade_level", "topic", "title", "count", "offset", "size"}
+            self.made_at, self.entries, self.start = read_index(self.data)
+        except PackError:
+            self.data.close()
+            raise
+
+    def __len__(self):
+        return len(self.entries)
+
+    # The content of entry `n`: {"title", "questions"} for a class quiz, {"questions"} or {"cards"} otherwise
+    def open(self, n):
+        entry = self.entries[n]
+        start = self.start + entry["offset"]
+        try:
+            return json.loads(zlib.decompress(self.data[start:start + entry["size"]]))
+        except (zlib.error, ValueError) as e:
+            raise PackError(f"{entry['title']!r} in the pack is damaged: {e}")
+
+    # Entry `n`'s questions (as Questions) or cards that pass the same checks as the ones
+    # SciBot writes itself, and how many didn't
+    def items(self, n):
+        content = self.open(n)
+        key, clean = ("cards", clean_card) if self.entries[n]["kind"] == "deck" else ("questions", clean_question)
+        found = content.get(key) if isinstance(content, dict) else None
+        if not isinstance(found, list):
+            raise PackError(f"{self.entries[n]['title']!r} in the pack is damaged: it has no {key}")
+        items = [item for item in map(clean, found) if item]
+        return items, len(found) - len(items)
+
+    def close(self):
+        self.data.close()
+
+
+# Adds the pack's entries (all of them, or just the ones numbered in `only`) to this server.
+# Class quizzes go to the quiz library, and every question and card goes to the content bank
+# and the offline index. Returns how many class quizzes, questions and cards were new, and
+# how many questions and cards were skipped (broken, or for a grade SciBot doesn't have).
+def import_pack(pack, library, bank, index, only=None):
+    added = {"quiz": 0, "questions": 0, "cards": 0, "skipped": 0}
+    for n in range(len(pack)) if only is None else only:
+        entry = pack.entries[n]
+        if entry["kind"] not in KINDS:
+            continue
+        items, rejected = pack.items(n)
+        added["skipped"] += rejected
+        grade_level, topic = entry["grade_level"], entry["topic"]
+        if grade_level not in GRADE_MAPPING or not topic.strip():
+            added["skipped"] += len(items)
+            continue
+        if not items:
+            continue
+        if entry["kind"] == "deck":
+            added["cards"] += bank.add_cards(grade_level, topic, items)
+            index.add_cards(grade_level, topic, items)
+            continue
+        if entry["kind"] == "quiz":
+            added["quiz"] += library.add_quiz(grade_level, topic, entry["title"], items)
+        added["questions"] += bank.add_questions(grade_level, topic, items)
+        index.add_questions(grade_level, topic, items)
+    return added
+
+
+# The packs on this server, newest first
+def list_packs(folder=PACKS_DIR):
+    if not os.path.isdir(folder):
+        return []
+    paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(PACK_SUFFIX)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+# Where a new pack made now goes
+def new_pack_path(folder=PACKS_DIR):
+    return os.path.join(folder, time.strftime("scibot-%Y%m%d-%H%M%S") + PACK_SUFFIX)
+
+
+# Puts an uploaded pack in the packs folder, after checking its index. Returns its path.
+def save_pack(name, data, folder=PACKS_DIR):
+    name = os.path.basename(name)
+    if not name.endswith(PACK_SUFFIX):
+        name += PACK_SUFFIX
+    read_index(data)
+    path = os.path.join(folder, name)
+    os.makedirs(folder, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# One open pack per file version, shared by every session (only the index is in memory)
+@st.cache_resource(show_spinner=False, max_entries=20)
+def get_pack(path, modified):
+    return ContentPack(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share SciBot's quizzes and flashcards as one pack file.")
+    parser.add_argument("command", choices=["export", "import", "list"])
+    parser.add_argument("pack", help=f"pack file ({PACK_SUFFIX})")
+    parser.add_argument("--library", default=LIBRARY_PATH, help="quiz library file")
+    parser.add_argument("--bank", default=BANK_PATH, help="content bank file")
+    parser.add_argument("--saved", default=FALLBACK_PATH, help="offline answers file")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        entries = pack_entries(QuizLibrary(args.library), ContentBank(args.bank), FallbackIndex(args.saved))
+        write_pack(args.pack, entries)
+        print(f"Wrote {len(entries)} quizzes and decks to {args.pack} ({os.path.getsize(args.pack) / 1024:.0f} KB)")
+        return
+
+    pack = ContentPack(args.pack)
+    if args.command == "list":
+        print(f"Made {time.strftime('%Y-%m-%d %H:%M', time.localtime(pack.made_at))}, {len(pack)} entries")
+        for entry in pack.entries:
+            print(f"  {KINDS.get(entry['kind'], entry['kind']):<15} {entry['grade_level']:<36} {entry['title']} ({entry['count']})")
+    else:
+        added = import_pack(pack, QuizLibrary(args.library), ContentBank(args.bank), FallbackIndex(args.saved))
+        print(f"Added {added['quiz']} class quizzes, {added['questions']} questions and {added['cards']} flashcards")
+        if added["skipped"]:
+            print(f"Skipped {added['skipped']} questions and flashcards that were broken or for a grade SciBot doesn't have")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+
+import streamlit as st
+
+from scibot_cache import get_response_cache, make_key
+from scibot_coalesce import shared
+from scibot_engine import get_engine
+from scibot_metrics import get_metrics
+from scibot_scheduler import get_scheduler
+
+# Answers ready before the student asks. Students mostly click what's in front of them: the
+# example questions on an empty chat, or "🔄 Take Another Quiz" after a quiz. So while the
+# server has nothing else to do, SciBot writes those answers in the background and saves
+# them in the response cache, and the click is answered instantly.
+#
+# Prefetches go through the generation engine at the lowest priority, and only start when
+# nobody is waiting in line. Each session may start SCIBOT_PREFETCH_BUDGET of them (0 turns
+# prefetching off), answers someone already has in the cache are free, and a session's
+# prefetches are cancelled when the student switches to another page.
+PREFETCH_BUDGET = int(os.environ.get("SCIBOT_PREFETCH_BUDGET", "10"))
+
+
+class Prefetcher:
+    def __init__(self, engine, cache, scheduler, metrics, budget=PREFETCH_BUDGET):
+        self.engine = engine
+        self.cache = cache
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.budget = budget
+
+    # A new session's prefetch state: calls started so far, and job id -> (page, cache key) of
+    # the ones it started
+    @staticmethod
+    def new_state():
+        return {"spent": 0, "jobs": {}}
+
+    # Start the requests that aren't cached or already prefetching, as (prompt, system_prompt,
+    # choice, mode). `page` is the page they're for; `session` is the student (for taking
+    # turns in line). Only calls this session starts count against its budget.
+    def prefetch(self, state, page, api_key, session, requests):
+        if not api_key or self.scheduler.waiting():
+            return
+        started = {key for _, key in state["jobs"].values()}
+        for prompt, system_prompt, choice, mode in requests:
+            if state["spent"] >= self.budget:
+                return
+            key = make_key(system_prompt, prompt, choice["model"], choice["max_tokens"])
+            if not shared(mode) or key in started or self.cache.has(key):
+                continue
+            job_id = self.engine.submit(api_key, choice["model"], choice["max_tokens"], system_prompt, prompt, session, "prefetch")
+            if self.engine.joined(job_id):
+                # Someone is already asking for this, and they'll save the answer
+                self.engine.forget(job_id)
+                continue
+            state["spent"] += 1
+            state["jobs"][job_id] = (page, key)
+            started.add(key)
+            self.engine.get(job_id).add_done_callback(lambda future, job_id=job_id, key=key, mode=mode, model=choice["model"]: self._landed(job_id, key, mode, model, future))
+
+    # Cancel the prefetches for every page but `page`
+    def cancel(self, state, page=None):
+        for job_id, (job_page, _) in list(state["jobs"].items()):
+            if job_page != page:
+                self.engine.cancel(job_id)
+                del state["jobs"][job_id]
+
+    # Runs on the engine's thread when a prefetch is done
+    def _landed(self, job_id, key, mode, model, future):
+        self.engine.forget(job_id)
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            self.metrics.record("prefetch", model, "error", 0, error=type(e).__name__)
+            return
+        self.metrics.record("prefetch", model, "ok", result["latency"], usage=result["usage"])
+        self.cache.set(key, result["text"], mode)
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    return Prefetcher(get_engine(), get_response_cache(), get_scheduler(), get_metrics())
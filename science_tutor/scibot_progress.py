@@ -0,0 +1,195 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+# Saved student progress, so stats and achievements survive a refresh or a server restart.
+#
+# Reads are one primary-key lookup per student (done once per session and kept in
+# st.session_state). Writes go on a queue and a background thread saves them in batches,
+# so clicking around never waits for the disk.
+PROGRESS_STORE = os.environ.get("SCIBOT_PROGRESS_STORE", "sqlite")
+PROGRESS_PATH = os.environ.get(
+    "SCIBOT_PROGRESS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_progress.db")
+)
+# How long the writer waits to collect more changes before saving them together (seconds)
+FLUSH_SECONDS = float(os.environ.get("SCIBOT_PROGRESS_FLUSH_SECONDS", "1.0"))
+
+EMPTY_PROGRESS = {"questions_asked": 0, "quizzes_taken": 0, "score_total": 0.0}
+
+
+class SQLiteProgressStore:
+    def __init__(self, path=PROGRESS_PATH, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.changes = queue.Queue()
+        # Batches of changes that couldn't be saved (shown on the metrics page)
+        self.save_errors = 0
+
+        db = self._connect()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS students (
+                student_id TEXT PRIMARY KEY,
+                questions_asked INTEGER NOT NULL DEFAULT 0,
+                quizzes_taken INTEGER NOT NULL DEFAULT 0,
+                score_total REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS quiz_results (
+                student_id TEXT NOT NULL,
+                taken_at REAL NOT NULL,
+                title TEXT,
+                grade_level TEXT,
+                correct INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                score REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS quiz_results_student ON quiz_results (student_id, taken_at);
+        """)
+        db.close()
+
+        self.reader = self._connect(check_same_thread=False)
+        self.read_lock = threading.Lock()
+        self.writer = threading.Thread(target=self._write_loop, name="scibot-progress", daemon=True)
+        self.writer.start()
+        atexit.register(self.flush)
+
+    def load(self, student_id):
+        with self.read_lock:
+            row = self.reader.execute(
+                "SELECT questions_asked, quizzes_taken, score_total FROM students WHERE student_id = ?",
+                (student_id,)
+            ).fetchone()
+        if row is None:
+            return dict(EMPTY_PROGRESS)
+        return {"questions_asked": row[0], "quizzes_taken": row[1], "score_total": row[2]}
+
+    def history(self, student_id, limit=10):
+        with self.read_lock:
+            rows = self.reader.execute(
+                "SELECT taken_at, title, grade_level, correct, total, score FROM quiz_results "
+                "WHERE student_id = ? ORDER BY taken_at DESC LIMIT ?",
+                (student_id, limit)
+            ).fetchall()
+        return [
+            {"taken_at": row[0], "title": row[1], "grade_level": row[2], "correct": row[3], "total": row[4], "score": row[5]}
+            for row in rows
+        ]
+
+    def add_question(self, student_id):
+        self.changes.put(("question", student_id, None))
+
+    def add_quiz(self, student_id, title, grade_level, correct, total):
+        self.changes.put(("quiz", student_id, (time.time(), title, grade_level, correct, total, correct / total * 100)))
+
+    def reset(self, student_id):
+        self.changes.put(("reset", student_id, None))
+
+    # Save everything that's waiting right now
+    def flush(self):
+        done = threading.Event()
+        self.changes.put(("flush", None, done))
+        done.wait(timeout=5)
+
+    def _connect(self, check_same_thread=True):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=check_same_thread)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            batch = [self.changes.get()]
+            # Collect whatever else comes in during the flush window and save it in one transaction
+            deadline = time.time() + self.flush_seconds
+            while batch[-1][0] != "flush":
+                try:
+                    batch.append(self.changes.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+
+            try:
+                self._save(db, batch)
+            except sqlite3.Error:
+                self.save_errors += 1
+
+            for kind, _, data in batch:
+                if kind == "flush":
+                    data.set()
+
+    def _save(self, db, batch):
+        with db:
+            for kind, student_id, data in batch:
+                if kind == "flush":
+                    continue
+                db.execute("INSERT OR IGNORE INTO students (student_id) VALUES (?)", (student_id,))
+                if kind == "question":
+                    db.execute("UPDATE students SET questions_asked = questions_asked + 1 WHERE student_id = ?", (student_id,))
+                elif kind == "quiz":
+                    db.execute("INSERT INTO quiz_results VALUES (?, ?, ?, ?, ?, ?, ?)", (student_id,) + data)
+                    db.execute(
+                        "UPDATE students SET quizzes_taken = quizzes_taken + 1, score_total = score_total + ? WHERE student_id = ?",
+                        (data[-1], student_id)
+                    )
+                elif kind == "reset":
+                    db.execute("DELETE FROM quiz_results WHERE student_id = ?", (student_id,))
+                    db.execute(
+                        "UPDATE students SET questions_asked = 0, quizzes_taken = 0, score_total = 0 WHERE student_id = ?",
+                        (student_id,)
+                    )
+
+
+# Keeps progress only while the server runs (handy for trying things out)
+class MemoryProgressStore:
+    def __init__(self):
+        self.students = {}
+        self.results = {}
+        self.lock = threading.Lock()
+        self.save_errors = 0
+
+    def load(self, student_id):
+        with self.lock:
+            return dict(self.students.get(student_id, EMPTY_PROGRESS))
+
+    def history(self, student_id, limit=10):
+        with self.lock:
+            return list(reversed(self.results.get(student_id, [])))[:limit]
+
+    def add_question(self, student_id):
+        with self.lock:
+            progress = self.students.setdefault(student_id, dict(EMPTY_PROGRESS))
+            progress["questions_asked"] += 1
+
+    def add_quiz(self, student_id, title, grade_level, correct, total):
+        score = correct / total * 100
+        with self.lock:
+            progress = self.students.setdefault(student_id, dict(EMPTY_PROGRESS))
+            progress["quizzes_taken"] += 1
+            progress["score_total"] += score
+            self.results.setdefault(student_id, []).append({
+                "taken_at": time.time(), "title": title, "grade_level": grade_level,
+                "correct": correct, "total": total, "score": score
+            })
+
+    def reset(self, student_id):
+        with self.lock:
+            self.students.pop(student_id, None)
+            self.results.pop(student_id, None)
+
+    def flush(self):
+        pass
+
+
+PROGRESS_STORES = {
+    "sqlite": SQLiteProgressStore,
+    "memory": MemoryProgressStore,
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_progress_store():
+    return PROGRESS_STORES[PROGRESS_STORE]()
@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Keeps SciBot under Anthropic's rate limits.
+#
+# Anthropic limits both requests per minute and tokens per minute, so there are two token
+# buckets: every API call takes one "request" token and as many "tokens" tokens as it might
+# use. With one server process the buckets live in memory. When several workers run side by
+# side (see deploy/), set SCIBOT_RATE_LIMIT_DB to a shared file so they all draw from
+# the same buckets instead of each one running into 429 errors on its own.
+REQUESTS_PER_MINUTE = float(os.environ.get("SCIBOT_REQUESTS_PER_MINUTE", "50"))
+BURST = float(os.environ.get("SCIBOT_RATE_LIMIT_BURST", "10"))
+TOKENS_PER_MINUTE = float(os.environ.get("SCIBOT_TOKENS_PER_MINUTE", "40000"))
+TOKEN_BURST = float(os.environ.get("SCIBOT_TOKEN_BURST", str(TOKENS_PER_MINUTE)))
+SHARED_PATH = os.environ.get("SCIBOT_RATE_LIMIT_DB", "")
+
+
+class LocalTokenBucket:
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, burst=BURST):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    # Take `cost` tokens if they're there. Returns 0 on success, otherwise how many seconds to wait.
+    def try_acquire(self, cost=1):
+        cost = min(cost, self.capacity)
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0
+            return (cost - self.tokens) / self.rate
+
+    # Give back tokens that were taken but not used
+    def refund(self, amount):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class SharedTokenBucket:
+    def __init__(self, path, name="requests", per_minute=REQUESTS_PER_MINUTE, burst=BURST):
+        self.name = name
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def try_acquire(self, cost=1):
+        cost = min(cost, self.capacity)
+        with self.lock:
+            # BEGIN IMMEDIATE takes the write lock, so two workers can't spend the same tokens
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+                wait = 0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / self.rate
+                self.db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, tokens, now))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return wait
+
+    def refund(self, amount):
+        with self.lock:
+            self.db.execute(
+                "UPDATE buckets SET tokens = MIN(?, tokens + ?) WHERE name = ?", (self.capacity, amount, self.name)
+            )
+
+
+# Wait until the bucket lets us make a call
+def acquire(bucket, cost=1):
+    while True:
+        wait = bucket.try_acquire(cost)
+        if not wait:
+            return
+        time.sleep(wait)
+
+
+def make_bucket(name, per_minute, burst):
+    if SHARED_PATH:
+        return SharedTokenBucket(SHARED_PATH, name, per_minute, burst)
+    return LocalTokenBucket(per_minute, burst)
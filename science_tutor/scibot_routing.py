@@ -0,0 +1,73 @@
+import json
+import os
+
+from scibot_client import MAX_TOKENS, MODEL
+from scibot_memory import estimate_tokens
+
+# Picks the model and answer length for each request.
+#
+# Most questions from younger students, and all flashcards, are short and simple, so a
+# small fast model answers them quicker and for a fraction of the price. Detailed answers
+# and older grades still get the bigger model. If the small model's quiz or flashcards
+# come back broken, the retry goes to the bigger model (see escalate()).
+SMART_MODEL = MODEL
+FAST_MODEL = os.environ.get("SCIBOT_FAST_MODEL", "claude-haiku-4-5-20251001")
+MODEL_ALIASES = {"smart": SMART_MODEL, "fast": FAST_MODEL}
+
+YOUNGER_GRADES = ["Basic", "Kindergarten - 2nd Grade", "Elementary (3rd-5th Grade)"]
+
+# The first rule that matches wins. A rule matches when all of its conditions do:
+#   mode               - "chat", "quiz", "flashcards" or "summary"
+#   levels / styles    - current_grade['level'] / explanation style must be one of these
+#   max_prompt_tokens  - the request (system prompt + messages) is at most this long
+# "model" is "fast", "smart" or a model name. Replace the whole table with a JSON file
+# of rules in the same format via SCIBOT_ROUTES.
+DEFAULT_ROUTES = [
+    {"mode": "summary", "model": "fast", "max_tokens": 500},
+    {"mode": "flashcards", "model": "fast", "max_tokens": 1500},
+    {"mode": "quiz", "levels": YOUNGER_GRADES, "model": "fast", "max_tokens": 1200},
+    {"mode": "chat", "styles": ["Very Detailed"], "model": "smart", "max_tokens": MAX_TOKENS},
+    {"mode": "chat", "levels": YOUNGER_GRADES, "max_prompt_tokens": 2500, "model": "fast", "max_tokens": 800},
+    {"mode": "chat", "styles": ["Extra Simple"], "max_prompt_tokens": 2500, "model": "fast", "max_tokens": 800},
+    {"model": "smart", "max_tokens": MAX_TOKENS},
+]
+
+
+def load_routes():
+    path = os.environ.get("SCIBOT_ROUTES", "")
+    if not path:
+        return DEFAULT_ROUTES
+    with open(path) as f:
+        return json.load(f)
+
+
+ROUTES = load_routes()
+
+
+def matches(rule, mode, level, style, prompt_tokens):
+    return (
+        rule.get("mode", mode) == mode
+        and level in rule.get("levels", [level])
+        and style in rule.get("styles", [style])
+        and prompt_tokens <= rule.get("max_prompt_tokens", prompt_tokens)
+    )
+
+
+# Model and max_tokens for one request, as {"model": ..., "max_tokens": ...}
+def route(mode, current_grade, style, system, messages):
+    prompt_tokens = estimate_tokens(json.dumps(system)) + estimate_tokens(json.dumps(messages))
+    for rule in ROUTES:
+        if matches(rule, mode, current_grade["level"], style, prompt_tokens):
+            return {
+                "model": MODEL_ALIASES.get(rule["model"], rule["model"]),
+                "max_tokens": rule.get("max_tokens", MAX_TOKENS)
+            }
+    return {"model": SMART_MODEL, "max_tokens": MAX_TOKENS}
+
+
+# The bigger model to try when the answer from `choice` wasn't good enough,
+# or None if it already was the bigger model
+def escalate(choice):
+    if choice["model"] == SMART_MODEL:
+        return None
+    return {"model": SMART_MODEL, "max_tokens": max(choice["max_tokens"], MAX_TOKENS)}
@@ -0,0 +1,164 @@
+import concurrent.futures
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import anthropic
+import streamlit as st
+
+from scibot_memory import estimate_tokens
+from scibot_ratelimit import BURST, REQUESTS_PER_MINUTE, TOKEN_BURST, TOKENS_PER_MINUTE, acquire, make_bucket
+
+# One line for every API call the server makes, so a whole class pressing "Generate" at once
+# doesn't turn into a pile of 429 errors.
+#
+# Calls wait for a ticket. Tickets are handed out in priority order (a student waiting on a
+# chat answer goes before quizzes being written in the background), and within the same
+# priority students take turns: someone who queued ten quizzes gets one through, then
+# everyone else gets a turn, then their second, and so on (fair queuing by "virtual time").
+# A ticket is only handed out when the requests-per-minute and tokens-per-minute buckets
+# both have room. Prefetches (answers nobody asked for yet, see scibot_prefetch.py) go last.
+PRIORITIES = {"chat": 0, "flashcards": 1, "quiz": 2, "summary": 3, "prefetch": 4}
+
+# How many times a failed call is tried again (rate limits, overloaded API, network trouble)
+MAX_RETRIES = int(os.environ.get("SCIBOT_MAX_RETRIES", "3"))
+# Backoff without a retry-after header: random wait up to BASE * 2^attempt, capped at MAX
+BACKOFF_BASE = float(os.environ.get("SCIBOT_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.environ.get("SCIBOT_BACKOFF_MAX", "30"))
+
+
+class Ticket:
+    def __init__(self, session, mode, tokens):
+        self.session = session
+        self.mode = mode
+        self.tokens = tokens
+        self.key = None
+        # Done once it's this call's turn
+        self.granted = concurrent.futures.Future()
+
+
+class RequestScheduler:
+    def __init__(self, requests, tokens):
+        self.requests = requests
+        self.tokens = tokens
+        self.queue = []
+        self.finish = {}
+        self.virtual_time = 0
+        self.paused_until = 0
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._dispatch_loop, name="scibot-scheduler", daemon=True)
+        self.thread.start()
+
+    # Get in line. `tokens` is how many tokens the call might use (input plus max output).
+    def enqueue(self, session, mode, tokens):
+        ticket = Ticket(session, mode, tokens)
+        with self.condition:
+            # Each session's next call comes after its previous one in virtual time
+            tag = max(self.virtual_time, self.finish.get(session, 0)) + 1
+            self.finish[session] = tag
+            ticket.key = (PRIORITIES.get(mode, len(PRIORITIES)), tag, next(self.order))
+            heapq.heappush(self.queue, (ticket.key, ticket))
+            self.condition.notify()
+        return ticket
+
+    # Wait up to `timeout` seconds for the ticket's turn. True if it's our turn.
+    def wait(self, ticket, timeout=None):
+        done, _ = concurrent.futures.wait([ticket.granted], timeout=timeout)
+        return bool(done)
+
+    # 1 means next in line (or on the way out). 0 once the ticket has its turn.
+    def position(self, ticket):
+        if ticket.granted.done():
+            return 0
+        with self.condition:
+            return 1 + sum(1 for key, _ in self.queue if key < ticket.key)
+
+    def waiting(self):
+        with self.condition:
+            return len(self.queue)
+
+    # Give back the tokens a finished call didn't use (all of them if it failed before starting)
+    def settle(self, ticket, usage=None):
+        used = 0
+        if usage is not None:
+            used = usage.input_tokens + (usage.cache_creation_input_tokens or 0) + usage.output_tokens
+        if ticket.tokens > used:
+            self.tokens.refund(ticket.tokens - used)
+
+    # Done with a ticket, however the call ended (including a student leaving mid-call). A
+    # ticket still in line just leaves it; one that has its turn (or is getting it right now)
+    # gives back the tokens the call didn't use, once the grant lands.
+    def release(self, ticket, usage=None):
+        if not ticket.granted.cancel():
+            ticket.granted.add_done_callback(lambda _: self.settle(ticket, usage))
+
+    # Stop handing out tickets for a while (Anthropic told us to slow down)
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    # After a failed call: how long to wait before trying again, or None to give up.
+    # A 429 pauses everyone, since the other calls would only hit the same limit.
+    def retry_after_error(self, error, attempt):
+        delay = retry_delay(error, attempt)
+        if delay is not None and isinstance(error, anthropic.RateLimitError):
+            self.pause(delay)
+        return delay
+
+    def _dispatch_loop(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                key, ticket = heapq.heappop(self.queue)
+                self.virtual_time = max(self.virtual_time, key[1])
+                # Forget sessions that have nothing left in line
+                if len(self.finish) > 1000:
+                    self.finish = {session: tag for session, tag in self.finish.items() if tag > self.virtual_time}
+                paused = self.paused_until - time.time()
+
+            if paused > 0:
+                time.sleep(paused)
+            # A cancelled call doesn't need its turn anymore
+            if not ticket.granted.set_running_or_notify_cancel():
+                continue
+            acquire(self.requests)
+            acquire(self.tokens, ticket.tokens)
+            ticket.granted.set_result(True)
+
+
+# Rough token cost of a call, used for the tokens-per-minute bucket until the real usage is known
+def request_tokens(system, messages, max_tokens):
+    return estimate_tokens(json.dumps(system)) + estimate_tokens(json.dumps(messages)) + max_tokens
+
+
+# How long to wait before trying a failed call again, or None if it shouldn't be retried.
+# A retry-after header from Anthropic wins; otherwise exponential backoff with full jitter,
+# so a room full of students doesn't retry at the same instant.
+def retry_delay(error, attempt):
+    if attempt >= MAX_RETRIES:
+        return None
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code not in (408, 409, 429) and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return float(retry_after) + random.uniform(0, BACKOFF_BASE)
+        except (TypeError, ValueError):
+            pass
+    elif not isinstance(error, anthropic.APIConnectionError):
+        return None
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+@st.cache_resource(show_spinner=False)
+def get_scheduler():
+    return RequestScheduler(
+        make_bucket("requests", REQUESTS_PER_MINUTE, BURST),
+        make_bucket("tokens", TOKENS_PER_MINUTE, TOKEN_BURST)
+    )
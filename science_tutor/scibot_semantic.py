@@ -0,0 +1,191 @@
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+import streamlit as st
+
+from scibot_cache import MODE_TTLS
+
+# Reuses chat answers for questions that mean the same thing but aren't worded the same,
+# like "How do plants breathe?", "how do plants breath" and "how can plants breathe".
+#
+# Each first question is turned into a vector and compared (cosine similarity) with the
+# questions of the same kind already answered for the same grade, topic and style. Above
+# the threshold, the saved answer is used. The vectors are TF-IDF over word pieces (character 3-grams of
+# the words that carry meaning), which needs nothing but NumPy. If sentence-transformers
+# is installed, SCIBOT_EMBED_MODEL can name a small local model to use instead.
+#
+# benchmarks/bench_semantic.py measures precision/recall for different thresholds. The
+# default gives no wrong answers on its corpus, with room to spare (a wrong answer is worse
+# than asking the API again).
+SIMILARITY_THRESHOLD = float(os.environ.get("SCIBOT_SEMANTIC_THRESHOLD", "0.85"))
+PARTITION_ENTRIES = int(os.environ.get("SCIBOT_SEMANTIC_SIZE", "2000"))
+EMBED_MODEL = os.environ.get("SCIBOT_EMBED_MODEL", "")
+DIMENSIONS = 2 ** 12
+
+# Words that don't change what a question is about
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "can", "could", "would",
+    "will", "should", "what", "whats", "why", "how", "when", "where", "which", "who", "i", "me", "my",
+    "you", "your", "we", "our", "it", "its", "this", "that", "these", "those", "of", "to", "in", "on",
+    "at", "for", "and", "or", "so", "if", "about", "please", "tell", "explain", "scibot", "really",
+    "actually", "like", "just", "there", "they", "them", "their", "get", "make", "happen", "happens",
+}
+WORD = re.compile(r"[a-z0-9]+")
+# Questions only share answers with questions of the same kind, because the words that
+# tell the kinds apart are stopwords: "When did dinosaurs live?" isn't "Where did dinosaurs
+# live?", and "Is the sky blue?" isn't "Why is the sky blue?". What, why and how questions
+# are one kind ("what makes the sky blue" and "why is the sky blue" want the same answer).
+QUESTION_KINDS = {"when": "when", "where": "where", "who": "who", "whom": "who", "whose": "who", "which": "which"}
+YES_NO_WORDS = {"is", "are", "was", "were", "do", "does", "did", "can", "could", "will", "would", "should", "has", "have", "had"}
+FILLER_WORDS = {"so", "hey", "hi", "ok", "okay", "um", "please", "scibot"}
+
+
+# "when", "where", "who", "which", "yes/no" (starts like "is ...", "do ...", "can ...") or ""
+def question_kind(text):
+    words = [word for word in WORD.findall(text.casefold().replace("'", "")) if word not in FILLER_WORDS]
+    for word in words:
+        if word in QUESTION_KINDS:
+            return QUESTION_KINDS[word]
+    return "yes/no" if words and words[0] in YES_NO_WORDS else ""
+
+
+class NgramVectorizer:
+    weighted = True
+
+    def features(self, text):
+        # "don't" and "do not" should look the same, and keep the "not"
+        text = text.casefold().replace("n't", " not").replace("'", "")
+        words = [word for word in WORD.findall(text) if word not in STOPWORDS]
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def vectorize(self, text):
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        counts = {}
+        for feature in self.features(text):
+            # crc32 is the same in every process, unlike hash()
+            index = zlib.crc32(feature.encode()) % DIMENSIONS
+            counts[index] = counts.get(index, 0) + 1
+        for index, count in counts.items():
+            vector[index] = 1 + math.log(count)
+        return vector
+
+
+class ModelVectorizer:
+    weighted = False
+
+    def __init__(self, name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(name, device="cpu")
+
+    def vectorize(self, text):
+        return self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+# The model if SCIBOT_EMBED_MODEL names one and sentence-transformers is installed, word pieces otherwise
+def make_vectorizer():
+    if EMBED_MODEL:
+        try:
+            return ModelVectorizer(EMBED_MODEL)
+        except ImportError:
+            pass
+    return NgramVectorizer()
+
+
+# Questions and answers for one (grade, topic, style), in a fixed-size ring so the oldest
+# are replaced once it's full
+class VectorIndex:
+    def __init__(self, vectorizer, capacity=PARTITION_ENTRIES):
+        self.vectorizer = vectorizer
+        self.capacity = capacity
+        self.rows = None
+        self.entries = []
+        self.next_row = 0
+        self.doc_counts = None
+        self.normalized = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, vector, entry):
+        if self.rows is None:
+            self.rows = np.zeros((min(self.capacity, 64), len(vector)), dtype=np.float32)
+            self.doc_counts = np.zeros(len(vector), dtype=np.float32)
+        if len(self.entries) < self.capacity:
+            if len(self.entries) == len(self.rows):
+                grown = np.zeros((min(self.capacity, len(self.rows) * 2), self.rows.shape[1]), dtype=np.float32)
+                grown[:len(self.rows)] = self.rows
+                self.rows = grown
+            row = len(self.entries)
+            self.entries.append(entry)
+        else:
+            row = self.next_row
+            self.next_row = (self.next_row + 1) % self.capacity
+            self.doc_counts -= self.rows[row] > 0
+            self.entries[row] = entry
+        self.rows[row] = vector
+        self.doc_counts += vector > 0
+        self.normalized = None
+
+    # Best match as (similarity, entry), or (0, None) if the index is empty
+    def search(self, vector):
+        if not self.entries:
+            return 0.0, None
+        if self.normalized is None:
+            self.normalized = self._weigh(self.rows[:len(self.entries)])
+        query = self._weigh(vector[None, :])[0]
+        scores = self.normalized @ query
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.entries[best]
+
+    # TF-IDF weighting (for the word-piece vectors) and unit length, so a dot product is the cosine
+    def _weigh(self, rows):
+        if self.vectorizer.weighted:
+            idf = np.log((1 + len(self.entries)) / (1 + self.doc_counts)) + 1
+            rows = rows * idf
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        return rows / np.maximum(norms, 1e-9)
+
+
+class SemanticCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=MODE_TTLS["chat"]):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectorizer = make_vectorizer()
+        self.partitions = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, partition, question):
+        vector = self.vectorizer.vectorize(question)
+        with self.lock:
+            index = self.partitions.get((partition, question_kind(question)))
+            score, entry = index.search(vector) if index else (0.0, None)
+            if entry and score >= self.threshold and entry["expires_at"] > time.time():
+                self.stats["hits"] += 1
+                return entry["answer"]
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, partition, question, answer):
+        vector = self.vectorizer.vectorize(question)
+        entry = {"question": question, "answer": answer, "expires_at": time.time() + self.ttl}
+        partition = (partition, question_kind(question))
+        with self.lock:
+            index = self.partitions.get(partition)
+            if index is None:
+                index = self.partitions[partition] = VectorIndex(self.vectorizer)
+            index.add(vector, entry)
+
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache():
+    return SemanticCache()
@@ -0,0 +1,162 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from scibot_progress import PROGRESS_STORE
+
+# Keeps open tabs from filling up the server's memory.
+#
+# Streamlit keeps every tab's st.session_state in memory until the tab is closed, and at a
+# science fair hundreds of tabs sit open on a chat nobody is reading. So:
+#   - state only one page uses (the chat, the quiz, the flashcard deck) is "parked" in a
+#     small store while another page is open, and brought back when that page opens again
+#   - a tab nobody has touched for SCIBOT_IDLE_MINUTES gets all of that parked
+# Parked state is pickled and compressed, in SQLite (or in memory with
+# SCIBOT_PROGRESS_STORE=memory). Tabs that never come back are forgotten after
+# SCIBOT_PARKED_HOURS.
+SESSION_STORE = os.environ.get("SCIBOT_SESSION_STORE", PROGRESS_STORE)
+SESSION_PATH = os.environ.get(
+    "SCIBOT_SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scibot_sessions.db")
+)
+IDLE_SECONDS = float(os.environ.get("SCIBOT_IDLE_MINUTES", "15")) * 60
+PARKED_SECONDS = float(os.environ.get("SCIBOT_PARKED_HOURS", "24")) * 3600
+
+
+def pack(value):
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def unpack(data):
+    return pickle.loads(zlib.decompress(data))
+
+
+class SQLiteSessionStore:
+    def __init__(self, path=SESSION_PATH):
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS parked (
+                    session_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    parked_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, key)
+                )
+            """)
+            self.db.commit()
+
+    def put(self, session_id, key, value):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO parked VALUES (?, ?, ?, ?)", (session_id, key, pack(value), time.time()))
+            self.db.commit()
+
+    # The parked value (and forget it), or None if nothing was parked
+    def take(self, session_id, key):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM parked WHERE session_id = ? AND key = ?", (session_id, key)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("DELETE FROM parked WHERE session_id = ? AND key = ?", (session_id, key))
+            self.db.commit()
+        return unpack(row[0])
+
+    def expire(self, before):
+        with self.lock:
+            self.db.execute("DELETE FROM parked WHERE parked_at < ?", (before,))
+            self.db.commit()
+
+
+# Still takes parked state out of the sessions, just compressed and in this process
+class MemorySessionStore:
+    def __init__(self):
+        self.parked = {}
+        self.lock = threading.Lock()
+
+    def put(self, session_id, key, value):
+        with self.lock:
+            self.parked[(session_id, key)] = (pack(value), time.time())
+
+    def take(self, session_id, key):
+        with self.lock:
+            data, _ = self.parked.pop((session_id, key), (None, None))
+        return None if data is None else unpack(data)
+
+    def expire(self, before):
+        with self.lock:
+            self.parked = {key: value for key, value in self.parked.items() if value[1] >= before}
+
+
+SESSION_STORES = {
+    "sqlite": SQLiteSessionStore,
+    "memory": MemorySessionStore,
+}
+
+
+class SessionKeeper:
+    # `keys` is everything in st.session_state that may be parked
+    def __init__(self, store, keys, idle_seconds=IDLE_SECONDS):
+        self.store = store
+        self.keys = keys
+        self.idle_seconds = idle_seconds
+        # session id -> (last run, its session state), for sessions that have something in memory
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.reaper = threading.Thread(target=self._reap_loop, name="scibot-reaper", daemon=True)
+        self.reaper.start()
+
+    # Park `keys` of the current session (the pages that use them aren't open)
+    def park(self, keys):
+        session_id, state = self._touch()
+        self._park(session_id, state, keys)
+
+    # Bring back `keys` of the current session if they were parked, or start them from `defaults`
+    def restore(self, keys, defaults):
+        session_id, state = self._touch()
+        for key in keys:
+            if key not in state:
+                value = self.store.take(session_id, key)
+                state[key] = defaults[key] if value is None else value
+
+    def _touch(self):
+        ctx = get_script_run_ctx()
+        # Waits for the reaper if it's parking this session right now
+        with self.lock:
+            self.sessions[ctx.session_id] = (time.time(), ctx.session_state)
+        return ctx.session_id, ctx.session_state
+
+    def _park(self, session_id, state, keys):
+        for key in keys:
+            if key in state:
+                # Empty values come back from the defaults, no need to store them
+                if state[key]:
+                    self.store.put(session_id, key, state[key])
+                del state[key]
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(min(60, self.idle_seconds))
+            cutoff = time.time() - self.idle_seconds
+            with self.lock:
+                for session_id, (last_run, state) in list(self.sessions.items()):
+                    if last_run < cutoff:
+                        del self.sessions[session_id]
+                        try:
+                            self._park(session_id, state, self.keys)
+                        except Exception:
+                            # Whatever couldn't be stored stays in memory
+                            pass
+            self.store.expire(time.time() - PARKED_SECONDS)
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_keeper(keys):
+    return SessionKeeper(SESSION_STORES[SESSION_STORE](), keys)
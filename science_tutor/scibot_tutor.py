@@ -1,8 +1,34 @@
 import streamlit as st
 import anthropic
+import html
+import io
+import itertools
 import os
-import json
-import random
+import time
+import uuid
+import zlib
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from scibot_bank import get_content_bank, normalize_topic
+from scibot_cache import get_response_cache, make_key
+from scibot_client import CONNECT_TIMEOUT, REQUEST_TIMEOUT, get_client
+from scibot_coalesce import FlightFailed, get_single_flight, shared
+from scibot_decks import GRADES, card_key, due_in, get_deck_store
+from scibot_data import EXAMPLE_QUESTIONS, GRADE_MAPPING, MODES, PAGE_CSS, STYLES, TOPICS
+from scibot_engine import get_engine
+from scibot_fallback import FALLBACK_SECONDS, CircuitOpen, get_circuit_breaker, get_fallback_index, is_outage
+from scibot_json import parse_cards, parse_quiz
+from scibot_library import get_batch_tracker, get_quiz_library, read_plan, submit_batch
+from scibot_memory import CHAT_PAGE_SIZE, Message, history_start, recent_history, summary_request
+from scibot_metrics import get_metrics, summarize, timeline
+from scibot_packs import KINDS, PACK_SUFFIX, PackError, get_pack, import_pack, list_packs, new_pack_path, pack_entries, save_pack, write_pack
+from scibot_prefetch import get_prefetcher
+from scibot_progress import get_progress_store
+from scibot_prompts import QUIZ_FOCUSES, SUMMARY_SYSTEM_PROMPT, cache_history, chat_system_prompt, flashcard_system_prompt, quiz_system_prompt
+from scibot_routing import escalate, route
+from scibot_scheduler import get_scheduler, request_tokens
+from scibot_semantic import get_semantic_cache
+from scibot_session import get_session_keeper
 
 # Page configuration
 st.set_page_config(
@@ -12,58 +38,55 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 3rem;
-        color: #1E88E5;
-        text-align: center;
-        margin-bottom: 0;
-    }
-    .sub-header {
-        text-align: center;
-        color: #666;
-        margin-top: 0;
-    }
-    .stButton>button {
-        width: 100%;
-    }
-    .quiz-card {
-        background-color: #f0f8ff;
-        padding: 20px;
-        border-radius: 10px;
-        border: 2px solid #1E88E5;
-        margin: 10px 0;
-    }
-    .flashcard {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 30px;
-        border-radius: 15px;
-        text-align: center;
-        min-height: 200px;
-        cursor: pointer;
-        margin: 20px 0;
-    }
-    .correct-answer {
-        background-color: #d4edda;
-        border: 2px solid #28a745;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    .wrong-answer {
-        background-color: #f8d7da;
-        border: 2px solid #dc3545;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    </style>
-""", unsafe_allow_html=True)
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 # Title and description
 st.markdown('<h1 class="main-header">🤖 SciBot - Your AI Science Tutor</h1>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Learn science with quizzes, flashcards, and smart AI help!</p>', unsafe_allow_html=True)
 
+# Shared by every session (made once per server process)
+progress_store = get_progress_store()
+response_cache = get_response_cache()
+semantic_cache = get_semantic_cache()
+metrics = get_metrics()
+scheduler = get_scheduler()
+engine = get_engine()
+single_flight = get_single_flight()
+fallback_index = get_fallback_index()
+prefetcher = get_prefetcher()
+breaker = get_circuit_breaker()
+content_bank = get_content_bank()
+quiz_library = get_quiz_library()
+batch_tracker = get_batch_tracker()
+deck_store = get_deck_store()
+
+# State that only one page uses. It's parked outside the session while another page is
+# open, or when the tab sits idle (see scibot_session.py).
+PAGE_STATE = dict(zip(MODES, [["messages", "chat_summary", "chat_summarized", "chat_visible"], ["current_quiz", "quiz_result"], ["deck"], [], [], [], []]))
+session_keeper = get_session_keeper(tuple(key for keys in PAGE_STATE.values() for key in keys))
+
+# Everything a new session starts with
+def session_defaults():
+    return {
+        "messages": [],
+        "current_quiz": None,
+        "quiz_result": None,
+        "deck": None,
+        "show_flashcard_answer": False,
+        "card_shown_at": 0.0,
+        "answer_seconds": None,
+        "prompt_cache_tokens": {"read": 0, "write": 0, "uncached": 0},
+        "jobs": {},
+        "chat_summary": "",
+        "chat_summarized": 0,
+        "chat_visible": CHAT_PAGE_SIZE,
+        "prefetch": prefetcher.new_state(),
+    }
+
+# Set up in one go on the session's first run
+if "jobs" not in st.session_state:
+    st.session_state.update(session_defaults())
+
 # Sidebar for settings and modes
 with st.sidebar:
     st.header("⚙️ Settings")
@@ -71,7 +94,7 @@ with st.sidebar:
     # Mode selection
     mode = st.selectbox(
         "Choose Mode:",
-        ["💬 Chat with SciBot", "📝 Generate Quiz", "🎴 Flashcards", "📊 My Progress"]
+        MODES
     )
     
     st.markdown("---")
@@ -79,63 +102,22 @@ with st.sidebar:
     # Grade level selection (replaces difficulty)
     grade_level = st.selectbox(
         "Select Your Grade Level:",
-        [
-            "Not Sure / Basic",
-            "Kindergarten - 2nd Grade",
-            "3rd - 5th Grade", 
-            "6th - 8th Grade (Middle School)",
-            "9th - 10th Grade (High School)",
-            "11th - 12th Grade (Advanced)"
-        ],
+        list(GRADE_MAPPING),
         index=3  # Default to 6th-8th grade
     )
     
-    # Map grade level to difficulty description for AI
-    grade_mapping = {
-        "Not Sure / Basic": {
-            "level": "Basic",
-            "description": "Very simple explanations using everyday language. Like explaining to someone learning science for the first time.",
-            "vocab": "Use only basic vocabulary. Avoid technical terms unless you explain them in very simple words."
-        },
-        "Kindergarten - 2nd Grade": {
-            "level": "Kindergarten - 2nd Grade",
-            "description": "Very simple concepts with fun examples. Use short sentences and relate to things kids see every day.",
-            "vocab": "Use only simple words a young child would know. Compare to toys, animals, playground, food."
-        },
-        "3rd - 5th Grade": {
-            "level": "Elementary (3rd-5th Grade)",
-            "description": "Clear explanations with relatable examples. Introduce basic scientific terms but explain them.",
-            "vocab": "Use elementary-level vocabulary. You can use some science words but always explain what they mean."
-        },
-        "6th - 8th Grade (Middle School)": {
-            "level": "Middle School (6th-8th Grade)",
-            "description": "More detailed explanations with scientific vocabulary. Students can handle more complex concepts.",
-            "vocab": "Use middle school level vocabulary and standard scientific terms. Give examples from everyday life."
-        },
-        "9th - 10th Grade (High School)": {
-            "level": "High School (9th-10th Grade)",
-            "description": "Detailed scientific explanations with proper terminology. Include more complex concepts and relationships.",
-            "vocab": "Use high school level vocabulary. Include chemical formulas, equations, and scientific processes."
-        },
-        "11th - 12th Grade (Advanced)": {
-            "level": "Advanced High School (11th-12th Grade)",
-            "description": "In-depth scientific explanations. Can include advanced concepts, formulas, and theoretical understanding.",
-            "vocab": "Use advanced vocabulary. Include complex theories, mathematical relationships, and detailed mechanisms."
-        }
-    }
-    
-    current_grade = grade_mapping[grade_level]
+    current_grade = GRADE_MAPPING[grade_level]
     
     # Topic selection
     topic = st.selectbox(
         "Choose a Science Topic:",
-        ["General Science", "Biology", "Chemistry", "Physics", "Earth Science", "Space & Astronomy", "Human Body"]
+        TOPICS
     )
     
     # Explanation style
     style = st.radio(
         "Explanation Style:",
-        ["Normal", "Extra Simple", "Very Detailed"]
+        STYLES
     )
     
     st.markdown("---")
@@ -148,13 +130,23 @@ with st.sidebar:
     st.text(f"Topic: {topic}")
     st.text(f"Style: {style}")
     
-    # Stats
-    if "questions_answered" not in st.session_state:
-        st.session_state.questions_answered = 0
-    if "quizzes_taken" not in st.session_state:
-        st.session_state.quizzes_taken = 0
-    if "quiz_score" not in st.session_state:
-        st.session_state.quiz_score = 0
+    # Who's learning? Progress is saved under this name.
+    # It's kept in the page address, so refreshing the page keeps your progress.
+    if "student" not in st.query_params:
+        st.query_params["student"] = f"student-{uuid.uuid4().hex[:6]}"
+    student_id = st.text_input("🎒 Your name or student ID:", value=st.query_params["student"]).strip()
+    if not student_id:
+        student_id = st.query_params["student"]
+    elif student_id != st.query_params["student"]:
+        st.query_params["student"] = student_id
+    
+    # Stats (loaded once per student, then kept in the session)
+    if st.session_state.get("student_id") != student_id:
+        progress = progress_store.load(student_id)
+        st.session_state.student_id = student_id
+        st.session_state.questions_answered = progress["questions_asked"]
+        st.session_state.quizzes_taken = progress["quizzes_taken"]
+        st.session_state.quiz_score = progress["score_total"]
     
     st.markdown("---")
     st.markdown("### 📈 Your Stats")
@@ -163,6 +155,15 @@ with st.sidebar:
     if st.session_state.quizzes_taken > 0:
         avg_score = (st.session_state.quiz_score / st.session_state.quizzes_taken)
         st.metric("Average Quiz Score", f"{avg_score:.0f}%")
+    
+    # Shared answer cache (saves time and API credits when students ask the same thing)
+    # A semantic cache hit was a response cache miss first, so it's only counted as a hit
+    cache_stats = response_cache.stats
+    semantic_hits = semantic_cache.stats["hits"]
+    cache_hits = cache_stats["memory_hits"] + cache_stats["disk_hits"] + semantic_hits
+    st.caption(f"⚡ Saved answers used: {cache_hits} • New answers: {cache_stats['misses'] - semantic_hits}")
+    prompt_tokens = st.session_state.prompt_cache_tokens
+    st.caption(f"🧠 Prompt tokens reused: {prompt_tokens['read']} • cached: {prompt_tokens['write']} • new: {prompt_tokens['uncached']}")
 
 # API Key setup
 api_key = os.environ.get("ANTHROPIC_API_KEY", "")
@@ -172,108 +173,450 @@ if not api_key:
     if api_key:
         os.environ["ANTHROPIC_API_KEY"] = api_key
 
-# Initialize session states
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "current_quiz" not in st.session_state:
-    st.session_state.current_quiz = None
-if "quiz_answers" not in st.session_state:
-    st.session_state.quiz_answers = {}
-if "flashcards" not in st.session_state:
-    st.session_state.flashcards = []
-if "current_flashcard" not in st.session_state:
-    st.session_state.current_flashcard = 0
-if "show_flashcard_answer" not in st.session_state:
+# Class quizzes from a teacher's batch are imported in the background when they're done
+if api_key:
+    batch_tracker.watch(get_client(api_key))
+
+# Keep track of how many prompt tokens Anthropic reused from its prompt cache
+def record_usage(usage):
+    tokens = {
+        "read": usage.cache_read_input_tokens or 0,
+        "write": usage.cache_creation_input_tokens or 0,
+        "uncached": usage.input_tokens or 0
+    }
+    st.session_state.last_usage = tokens
+    for name, count in tokens.items():
+        st.session_state.prompt_cache_tokens[name] += count
+
+# Wait for our turn in the server-wide line of API calls, showing the student where they are
+def wait_for_turn(ticket):
+    if scheduler.wait(ticket, timeout=0.2):
+        return
+    notice = st.empty()
+    while not scheduler.wait(ticket, timeout=0.5):
+        notice.caption(f"⏳ Lots of students are asking right now - you're #{scheduler.position(ticket)} in line")
+    notice.empty()
+
+# A saved answer (question, answer) from the fallback index, shown when the API can't answer
+def saved_answer(saved):
+    return f"📴 *SciBot can't reach the internet right now, so here's what it said when someone asked \"{saved[0]}\":*\n\n{saved[1]}"
+
+# After a failed call: seconds to wait before trying again, or None to give up.
+# If the small model can't answer at all (and trying again won't help), switch `choice`
+# over to the bigger model and try that right away.
+def retry_or_escalate(error, attempt, choice):
+    delay = scheduler.retry_after_error(error, attempt)
+    bigger = escalate(choice) if delay is None else None
+    if bigger:
+        choice.update(bigger)
+        return 0
+    return delay
+
+# Where a chat answer is saved: a first question is shared with everyone who asks it;
+# follow-ups depend on the conversation
+def chat_key(system_prompt, messages, choice):
+    return make_key(system_prompt, messages[0]["content"] if len(messages) == 1 else messages, choice["model"], choice["max_tokens"])
+
+# Forget a job's saved answer (for example a quiz that couldn't be read)
+def forget_scibot_answer(job):
+    response_cache.delete(make_key(job["system_prompt"], job["prompt"], job["model"], job["max_tokens"]))
+
+# Start a quiz or flashcard generation in the background.
+# It keeps running even if the page reruns, so students can keep clicking around.
+# `choice` is the model and max_tokens to use (picked by the routing table if not given).
+def start_scibot_job(prompt, system_prompt, mode, choice=None):
+    if choice is None:
+        choice = route(mode, current_grade, style, system_prompt, [{"role": "user", "content": prompt}])
+    job = {"prompt": prompt, "system_prompt": system_prompt, "mode": mode, "id": None, "text": None,
+           "error": None, "started": time.perf_counter(), **choice}
+    
+    cached = response_cache.get(make_key(system_prompt, prompt, job["model"], job["max_tokens"])) if shared(mode) else None
+    if cached is not None:
+        metrics.record(mode, job["model"], "cached", time.perf_counter() - job["started"])
+        job["text"] = cached
+    else:
+        # The engine lets identical jobs from other students share one call
+        job["id"] = engine.submit(api_key, job["model"], job["max_tokens"], system_prompt, prompt, student_id, mode)
+        job["joined"] = engine.joined(job["id"])
+    
+    return job
+
+# See if a background job is finished (without waiting). Fills in job["text"] when it is,
+# or job["error"] (and an empty text) if the call failed.
+def check_scibot_job(job):
+    if job["text"] is not None:
+        return True
+    
+    future = engine.get(job["id"])
+    if future is None:
+        job["text"], job["error"] = "", "the request expired"
+        return True
+    if not future.done():
+        return False
+    
+    engine.forget(job["id"])
+    try:
+        result = future.result()
+        job["text"] = result["text"]
+        # Whoever started the call counts its tokens and saves the answer
+        if job.get("joined"):
+            metrics.record(job["mode"], job["model"], "shared", time.perf_counter() - job["started"])
+            return True
+        metrics.record(job["mode"], job["model"], "ok", result["latency"], usage=result["usage"])
+        record_usage(result["usage"])
+        if shared(job["mode"]):
+            response_cache.set(make_key(job["system_prompt"], job["prompt"], job["model"], job["max_tokens"]), job["text"], job["mode"])
+    except Exception as e:
+        metrics.record(job["mode"], job["model"], "error", time.perf_counter() - job["started"], error=type(e).__name__)
+        job["text"], job["error"] = "", str(e)
+    return True
+
+# Rerun just the current mode's fragment when we can. Streamlit only allows that during a
+# fragment rerun, so on a full run (like right after switching modes) the whole app reruns.
+# full_run is set while the page runs as part of a full run (see where it's called, at the end).
+def rerun_page():
+    st.rerun(scope="app" if st.session_state.get("full_run", True) else "fragment")
+
+# Wait a moment for any of the jobs to finish, then rerun the page to show it
+def wait_for_scibot_jobs(jobs, spinner_text):
+    futures = [engine.get(job["id"]) for job in jobs]
+    position = min(engine.position(job["id"]) for job in jobs)
+    if position:
+        spinner_text += f" (lots of students are busy - you're #{position} in line)"
+    with st.spinner(spinner_text):
+        wait([future for future in futures if future], timeout=1.0, return_when=FIRST_COMPLETED)
+    rerun_page()
+
+# Big quizzes are written in small parallel pieces (2-3 questions each), which is much faster
+QUIZ_CHUNK_SIZE = 3
+
+def split_quiz(num_questions):
+    num_chunks = -(-num_questions // QUIZ_CHUNK_SIZE)
+    sizes = [num_questions // num_chunks] * num_chunks
+    for i in range(num_questions % num_chunks):
+        sizes[i] += 1
+    return sizes
+
+# The prompt, system prompt and model choice for one piece of a quiz
+def quiz_chunk_request(size, focus, quiz_topic, retry=False, avoid=()):
+    system_prompt = quiz_system_prompt(current_grade, size, quiz_topic, focus)
+    
+    prompt = f"Create a {size}-question quiz about {quiz_topic} for {current_grade['level']} level"
+    if avoid:
+        prompt += "\nDon't repeat any of these questions:\n" + "\n".join(f"- {text}" for text in avoid)
+    
+    # A top-up after a broken piece goes to the bigger model
+    choice = route("quiz", current_grade, style, system_prompt, [{"role": "user", "content": prompt}])
+    if retry:
+        choice = escalate(choice) or choice
+    return prompt, system_prompt, choice
+
+# Each piece of a quiz gets its own focus so the pieces don't ask the same questions.
+# Returns (size, focus) for every piece.
+def quiz_chunks(num_questions):
+    return [(size, QUIZ_FOCUSES[chunk % len(QUIZ_FOCUSES)]) for chunk, size in enumerate(split_quiz(num_questions))]
+
+# Ask SciBot for one piece of a quiz in the background
+def start_quiz_chunk(size, focus, quiz_topic, quiz_size, retry=False, avoid=()):
+    prompt, system_prompt, choice = quiz_chunk_request(size, focus, quiz_topic, retry, avoid)
+    job = start_scibot_job(prompt, system_prompt, "quiz", choice)
+    job.update({"chunk_size": size, "focus": focus, "quiz_topic": quiz_topic, "quiz_size": quiz_size, "retry": retry})
+    return job
+
+# Add the questions from one finished piece of the quiz, skipping repeats.
+# If some questions were cut off or broken, ask again for just the missing ones (once).
+def add_quiz_chunk(job, quiz_jobs):
+    title, questions = parse_quiz(job["text"])
+    if len(questions) < job["chunk_size"]:
+        forget_scibot_answer(job)
+    fallback_index.add_questions(grade_level, job["quiz_topic"], questions)
+    
+    if questions and st.session_state.current_quiz is None:
+        st.session_state.current_quiz = {"title": title or "Science Quiz", "questions": []}
+    
+    quiz = st.session_state.current_quiz or {"questions": []}
+    seen = {" ".join(q.question.casefold().split()) for q in quiz["questions"]}
+    added = 0
+    for q in questions:
+        text = " ".join(q.question.casefold().split())
+        if text not in seen and len(quiz["questions"]) < job["quiz_size"]:
+            seen.add(text)
+            quiz["questions"].append(q)
+            added += 1
+    
+    missing = min(job["chunk_size"] - added, job["quiz_size"] - len(quiz["questions"]))
+    if missing > 0:
+        if job["retry"]:
+            st.session_state.quiz_chunk_failed = True
+        else:
+            avoid = [q.question for q in quiz["questions"]]
+            quiz_jobs.append(start_quiz_chunk(missing, job["focus"], job["quiz_topic"], job["quiz_size"], True, avoid))
+
+# Ask SciBot for flashcards in the background
+def start_flashcards(num_cards, flashcard_topic, retry=False, avoid=()):
+    system_prompt = flashcard_system_prompt(current_grade, num_cards, flashcard_topic)
+    
+    prompt = f"Create {num_cards} flashcards about {flashcard_topic} for {current_grade['level']} level"
+    if avoid:
+        prompt += "\nDon't repeat any of these cards:\n" + "\n".join(f"- {text}" for text in avoid)
+    
+    choice = route("flashcards", current_grade, style, system_prompt, [{"role": "user", "content": prompt}])
+    if retry:
+        choice = escalate(choice) or choice
+    
+    job = start_scibot_job(prompt, system_prompt, "flashcards", choice)
+    job.update({"num_cards": num_cards, "topic": flashcard_topic, "retry": retry})
+    return job
+
+# Open the student's saved deck for a topic, and only ask for cards if it has fewer than they want
+def open_deck(flashcard_topic, num_cards):
+    st.session_state.jobs.pop("flashcards", None)
+    st.session_state.deck = deck_store.load(student_id, grade_level, flashcard_topic)
     st.session_state.show_flashcard_answer = False
+    st.session_state.card_shown_at = time.time()
+    if len(st.session_state.deck) < num_cards:
+        top_up_deck(num_cards - len(st.session_state.deck))
+
+# Add new cards to the open deck: from the content bank if it has them, otherwise from SciBot
+def top_up_deck(count):
+    deck = st.session_state.deck
+    banked = [card for card in content_bank.sample_cards(grade_level, deck.topic, count) if card_key(card["front"]) not in deck.cards]
+    deck_store.add_cards(student_id, deck, deck.add(banked))
+    
+    missing = count - len(banked)
+    if missing > 0:
+        avoid = [card.front for card in deck.cards.values()]
+        st.session_state.jobs["flashcards"] = start_flashcards(missing, deck.topic, avoid=avoid)
 
-# Function to call Claude AI
-def call_scibot(prompt, system_prompt):
+# Add every good new card from a finished flashcard job to the deck, and ask once more if some were broken
+def add_flashcards(job):
+    cards = parse_cards(job["text"])
+    if len(cards) < job["num_cards"]:
+        forget_scibot_answer(job)
+    
+    deck = st.session_state.deck
+    offline = not cards and job["error"] is not None
+    if offline:
+        # SciBot couldn't be reached: use cards it wrote before on this topic, if there are any
+        cards = fallback_index.cards(grade_level, job["topic"], job["num_cards"])
+    else:
+        fallback_index.add_cards(grade_level, job["topic"], cards)
+    added = deck.add(cards)
+    deck_store.add_cards(student_id, deck, added)
+    if added and offline:
+        st.info("📴 SciBot can't reach the internet right now, so these are cards it wrote before.")
+    elif added and not job["retry"]:
+        st.success("✅ Flashcards ready! Flip each card, then tell SciBot how well you knew it!")
+    
+    missing = job["num_cards"] - len(added)
+    if missing > 0 and not job["retry"]:
+        avoid = [card.front for card in deck.cards.values()]
+        st.session_state.jobs["flashcards"] = start_flashcards(missing, job["topic"], True, avoid)
+    elif not deck:
+        st.error("Oops! SciBot had trouble creating flashcards. Try again!")
+
+# Stream SciBot's answer piece by piece so students see it right away.
+# messages is the conversation to send, ending with the student's new question.
+def stream_scibot(messages, system_prompt, mode="chat"):
     if not api_key:
-        return "Please enter your API key first!"
+        yield "Please enter your API key first!"
+        return
+    
+    start = time.perf_counter()
+    first_token = None
+    choice = route(mode, current_grade, style, system_prompt, messages)
+    share = shared(mode)
+    
+    cache_key = chat_key(system_prompt, messages, choice)
+    cached = response_cache.get(cache_key) if share else None
+    # The same first question asked in different words ("do plants breathe air?")
+    partition = (grade_level, topic, style, choice["model"])
+    question = messages[0]["content"] if len(messages) == 1 and mode == "chat" and share else None
+    if cached is not None and question is not None:
+        # Prefetched answers (scibot_prefetch.py) only went to the response cache, so keep
+        # this one for when the API is down too (answers already saved are skipped)
+        fallback_index.add_answer(grade_level, topic, question, cached)
+    if cached is None and question is not None:
+        cached = semantic_cache.get(partition, question)
+    if cached is not None:
+        st.session_state.last_response_timing = {"ttft": 0.0, "total": time.perf_counter() - start}
+        metrics.record(mode, choice["model"], "cached", time.perf_counter() - start)
+        yield cached
+        return
     
+    # Something to show if the API fails or is slow to start (see scibot_fallback.py)
+    saved = fallback_index.answer(grade_level, topic, messages[-1]["content"]) if mode == "chat" else None
+    
+    # If a classmate is asking exactly this right now, show their answer as it comes in
+    flight_key = cache_key
+    flight, leading = single_flight.join(flight_key) if share else (None, True)
+    answered = False
     try:
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2000,
-            system=system_prompt,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        if not leading:
+            try:
+                for text in flight.follow():
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield text
+                metrics.record(mode, choice["model"], "shared", time.perf_counter() - start, first_token)
+                return
+            except FlightFailed:
+                # Their call failed. If nothing is on the screen yet, just ask ourselves.
+                if first_token is not None:
+                    raise
+                flight = None
         
-        return message.content[0].text
+        client = get_client(api_key)
+        if saved is not None:
+            # Only wait FALLBACK_SECONDS for the first words when there's a saved answer to show instead
+            client = client.with_options(timeout=anthropic.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT, read=FALLBACK_SECONDS))
+        for attempt in itertools.count():
+            if not breaker.allow():
+                raise CircuitOpen("SciBot can't reach the internet right now. Try again in a minute!")
+            ticket = scheduler.enqueue(student_id, mode, request_tokens(system_prompt, messages, choice["max_tokens"]))
+            usage = None
+            try:
+                wait_for_turn(ticket)
+                with client.messages.stream(
+                    model=choice["model"],
+                    max_tokens=choice["max_tokens"],
+                    system=system_prompt,
+                    messages=cache_history(system_prompt, messages, choice["model"])
+                ) as stream:
+                    for text in stream.text_stream:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        if flight is not None:
+                            flight.publish(text)
+                        yield text
+                    
+                    usage = stream.get_final_message().usage
+                    metrics.record(mode, choice["model"], "ok", time.perf_counter() - start, first_token, usage)
+                    record_usage(usage)
+                    if share:
+                        response_cache.set(cache_key, stream.get_final_text(), mode)
+                    if question is not None:
+                        semantic_cache.set(partition, question, stream.get_final_text())
+                    if len(messages) == 1 and mode == "chat":
+                        fallback_index.add_answer(grade_level, topic, messages[0]["content"], stream.get_final_text())
+                    answered = True
+                breaker.success()
+                break
+            except Exception as e:
+                if is_outage(e):
+                    breaker.failure()
+                # Once words are on the screen we can't take them back, so only retry before that.
+                # With a saved answer ready, an outage goes straight to it instead.
+                retry = first_token is None and not (saved is not None and is_outage(e))
+                delay = retry_or_escalate(e, attempt, choice) if retry else None
+                if delay is None:
+                    raise
+                # A bigger model's answer is saved as that model's (classmates following this
+                # one still get it under the key they joined with)
+                cache_key = chat_key(system_prompt, messages, choice)
+                partition = (grade_level, topic, style, choice["model"])
+            finally:
+                # Also when st.write_stream closes this generator (a rerun, the Stop button)
+                scheduler.release(ticket, usage)
+            time.sleep(delay)
     except Exception as e:
-        return f"Oops! SciBot encountered an error: {str(e)}"
+        if saved is not None and first_token is None:
+            metrics.record(mode, choice["model"], "fallback", time.perf_counter() - start, error=type(e).__name__)
+            yield saved_answer(saved)
+        else:
+            metrics.record(mode, choice["model"], "error", time.perf_counter() - start, first_token, error=type(e).__name__)
+            yield f"Oops! SciBot encountered an error: {str(e)}"
+    finally:
+        # Let everyone following this answer know it's done (or that it failed, even if the
+        # student left the page halfway)
+        if leading and flight is not None:
+            single_flight.land(flight_key, flight, None if answered else FlightFailed("the answer didn't finish"))
+        # Remember how fast the answer showed up (time to first word and total)
+        st.session_state.last_response_timing = {
+            "ttft": first_token,
+            "total": time.perf_counter() - start
+        }
+
+# The prompt, system prompt, model choice and mode for a first chat question, the same as
+# stream_scibot() gets them from the chat page (for prefetching its answer)
+def chat_request(question):
+    system_prompt = chat_system_prompt(current_grade, topic, style)
+    choice = route("chat", current_grade, style, system_prompt, [{"role": "user", "content": question}])
+    return question, system_prompt, choice, "chat"
+
+# Fold chat messages that no longer fit in the history budget into the running summary
+# (in the background, so the student doesn't wait for it)
+def update_chat_summary():
+    messages = st.session_state.messages
+    start = history_start(messages, st.session_state.chat_summarized)
+    if start > st.session_state.chat_summarized and "summary" not in st.session_state.jobs:
+        prompt = summary_request(st.session_state.chat_summary, messages[st.session_state.chat_summarized:start])
+        job = start_scibot_job(prompt, SUMMARY_SYSTEM_PROMPT, "summary")
+        job["summarized"] = start
+        st.session_state.jobs["summary"] = job
+
+# Each mode is its own function. The quiz, flashcards, progress and metrics pages are
+# fragments, so clicking around inside them (flipping a card, picking an answer, waiting
+# for a quiz) reruns just that page instead of the whole app. Chat isn't a fragment:
+# every question changes the stats in the sidebar, so it needs the full rerun anyway.
 
 # MODE 1: CHAT WITH SCIBOT
-if mode == "💬 Chat with SciBot":
+def chat_mode():
+    session_keeper.restore(PAGE_STATE[mode], session_defaults())
     st.markdown("### 💬 Ask SciBot Anything!")
     
-    # Display chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    summary_job = st.session_state.jobs.get("summary")
+    if summary_job and check_scibot_job(summary_job):
+        del st.session_state.jobs["summary"]
+        if summary_job["error"] is None:
+            st.session_state.chat_summary = summary_job["text"]
+            st.session_state.chat_summarized = summary_job["summarized"]
+    
+    # Display chat history (only the latest messages, older ones on request)
+    hidden = len(st.session_state.messages) - st.session_state.chat_visible
+    if hidden > 0:
+        if st.button(f"⬆️ Load older messages ({hidden} more)"):
+            st.session_state.chat_visible += CHAT_PAGE_SIZE
+            st.rerun()
+    
+    for message in st.session_state.messages[-st.session_state.chat_visible:]:
+        with st.chat_message(message.role):
+            st.markdown(message.content)
     
-    # Chat input
-    if prompt := st.chat_input("Ask me a science question..."):
+    # Chat input (or an example question that was clicked)
+    typed = st.chat_input("Ask me a science question...")
+    if prompt := typed or st.session_state.pop("example_question", None):
         # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.messages.append(Message("user", prompt))
         st.session_state.questions_answered += 1
+        progress_store.add_question(student_id)
         
         with st.chat_message("user"):
             st.markdown(prompt)
         
         # Generate SciBot's response
         with st.chat_message("assistant", avatar="🤖"):
-            # Adjust system prompt based on style
-            style_instruction = ""
-            if style == "Extra Simple":
-                style_instruction = "Use VERY simple language. Explain like you're talking to someone younger. Use fun analogies and examples."
-            elif style == "Very Detailed":
-                style_instruction = "Provide detailed, comprehensive explanations with multiple examples and deeper context."
-            else:
-                style_instruction = "Use clear, conversational language appropriate for the grade level."
+            system_prompt = chat_system_prompt(current_grade, topic, style, st.session_state.chat_summary)
+            history = recent_history(st.session_state.messages, st.session_state.chat_summarized)
             
-            system_prompt = f"""You are SciBot, a friendly and enthusiastic AI science tutor! 
-
-Your personality:
-- Friendly and encouraging
-- Makes science fun and exciting
-- Uses examples students can relate to
-- Celebrates curiosity and learning
-- Sometimes uses emojis to be friendly
-
-CRITICAL - Grade Level Adjustment:
-Student Grade Level: {current_grade['level']}
-{current_grade['description']}
-{current_grade['vocab']}
-
-Topic focus: {topic}
-Explanation style: {style}
-{style_instruction}
-
-Instructions:
-- Always start responses with enthusiasm (like "Great question!" or "Ooh, that's interesting!")
-- Explain concepts clearly and accurately AT THE APPROPRIATE GRADE LEVEL
-- Adjust vocabulary and complexity to match {current_grade['level']}
-- Use real-world examples that students at this grade would understand
-- For younger grades: Use more analogies, simpler words, shorter explanations
-- For older grades: Can use more technical terms, complex concepts, detailed explanations
-- Encourage curiosity and ask if they want to know more
-- If a question is not about science, politely redirect: "I'm SciBot, your science tutor! I'm best at science questions. Want to ask about {topic}?"
-- Keep answers engaging but concise (2-4 paragraphs unless more detail is requested)
-- Sign off as "- SciBot 🤖" occasionally
-"""
+            response = st.write_stream(stream_scibot(history, system_prompt))
             
-            response = call_scibot(prompt, system_prompt)
-            st.markdown(response)
+            timing = st.session_state.get("last_response_timing")
+            if timing and timing["ttft"] is not None:
+                st.caption(f"⚡ First words in {timing['ttft']:.1f}s • Full answer in {timing['total']:.1f}s")
             
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.messages.append(Message("assistant", response))
+        
+        update_chat_summary()
     
     # Clear chat button
     if st.session_state.messages:
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
+            st.session_state.chat_summary = ""
+            st.session_state.chat_summarized = 0
+            st.session_state.chat_visible = CHAT_PAGE_SIZE
+            st.session_state.jobs.pop("summary", None)
             st.rerun()
     
     # Show example questions if no messages
@@ -281,37 +624,29 @@ Instructions:
         st.markdown("---")
         st.markdown("### 💡 Try asking SciBot:")
         
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown("**🧬 Biology**")
-            if st.button("How do plants breathe?"):
-                st.session_state.messages.append({"role": "user", "content": "How do plants breathe?"})
-                st.rerun()
-            if st.button("Why do we need sleep?"):
-                st.session_state.messages.append({"role": "user", "content": "Why do we need sleep?"})
-                st.rerun()
-        
-        with col2:
-            st.markdown("**⚗️ Chemistry**")
-            if st.button("What makes fireworks colorful?"):
-                st.session_state.messages.append({"role": "user", "content": "What makes fireworks colorful?"})
-                st.rerun()
-            if st.button("Why does ice float?"):
-                st.session_state.messages.append({"role": "user", "content": "Why does ice float on water?"})
-                st.rerun()
+        for column, (subject, examples) in zip(st.columns(len(EXAMPLE_QUESTIONS)), EXAMPLE_QUESTIONS.items()):
+            with column:
+                st.markdown(subject)
+                for label, question in examples:
+                    if st.button(label):
+                        # Asked on the next run, just like a typed question
+                        st.session_state.example_question = question
+                        st.rerun()
         
-        with col3:
-            st.markdown("**🌍 Physics**")
-            if st.button("How do planes fly?"):
-                st.session_state.messages.append({"role": "user", "content": "How do airplanes fly?"})
-                st.rerun()
-            if st.button("What is electricity?"):
-                st.session_state.messages.append({"role": "user", "content": "What is electricity?"})
-                st.rerun()
+        # Students usually click one of these, so get the answers ready while nothing else is going on
+        prefetcher.prefetch(st.session_state.prefetch, mode, api_key, student_id, [
+            chat_request(question) for examples in EXAMPLE_QUESTIONS.values() for _, question in examples
+        ])
+
+# Forget the answers picked on the last quiz
+def clear_quiz_answers():
+    for key in [key for key in st.session_state if str(key).startswith("q_")]:
+        del st.session_state[key]
 
 # MODE 2: GENERATE QUIZ
-elif mode == "📝 Generate Quiz":
+@st.fragment
+def quiz_mode():
+    session_keeper.restore(PAGE_STATE[mode], session_defaults())
     st.markdown("### 📝 Test Your Knowledge!")
     
     col1, col2 = st.columns([2, 1])
@@ -329,141 +664,151 @@ elif mode == "📝 Generate Quiz":
         elif not quiz_topic:
             st.warning("Please enter a topic for your quiz!")
         else:
-            with st.spinner("SciBot is creating your quiz..."):
-                system_prompt = f"""You are SciBot, creating a science quiz.
-
-CRITICAL - Grade Level Adjustment:
-Student Grade Level: {current_grade['level']}
-{current_grade['description']}
-{current_grade['vocab']}
-
-Create a quiz with EXACTLY {num_questions} multiple choice questions about: {quiz_topic}
-
-IMPORTANT: Adjust question difficulty and vocabulary to match {current_grade['level']}:
-- For younger grades: Use simpler concepts, everyday examples, basic vocabulary
-- For middle grades: Standard concepts with appropriate scientific terms
-- For older grades: More complex concepts, advanced vocabulary, detailed scenarios
-
-CRITICAL: Return ONLY valid JSON, nothing else. No markdown, no backticks, no explanations.
-
-Format:
-{{
-  "title": "Quiz Title (grade-appropriate)",
-  "questions": [
-    {{
-      "question": "Question text appropriate for {current_grade['level']}?",
-      "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-      "correct": "A",
-      "explanation": "Why this is correct (explained at {current_grade['level']} level)"
-    }}
-  ]
-}}
-
-Make questions engaging and educational at the appropriate level!"""
-                
-                prompt = f"Create a {num_questions}-question quiz about {quiz_topic} for {current_grade['level']} level"
-                
-                response = call_scibot(prompt, system_prompt)
-                
-                try:
-                    # Clean up response
-                    response = response.strip()
-                    if response.startswith("```"):
-                        response = response.split("```")[1]
-                        if response.startswith("json"):
-                            response = response[4:]
-                    response = response.strip()
-                    
-                    quiz_data = json.loads(response)
-                    st.session_state.current_quiz = quiz_data
-                    st.session_state.quiz_answers = {}
-                    st.success("✅ Quiz ready! Answer the questions below:")
-                except:
-                    st.error("Oops! SciBot had trouble creating the quiz. Try again!")
-    
-    # Display quiz if generated
+            st.session_state.current_quiz = None
+            st.session_state.quiz_result = None
+            clear_quiz_answers()
+            
+            # Quizzes the teacher made for the class come first, then popular topics from the
+            # content bank. Both are ready right away, no need to wait for SciBot.
+            class_quiz = quiz_library.pick(grade_level, quiz_topic, num_questions)
+            banked = None if class_quiz else content_bank.sample_questions(grade_level, quiz_topic, num_questions)
+            if class_quiz:
+                st.session_state.current_quiz = class_quiz
+                st.success("✅ Your class quiz is ready! Answer the questions below:")
+            elif banked:
+                st.session_state.current_quiz = {"title": f"{quiz_topic.strip().title()} Quiz", "questions": banked}
+                st.success("✅ Quiz ready! Answer the questions below:")
+            else:
+                st.session_state.jobs["quiz"] = [start_quiz_chunk(size, focus, quiz_topic, num_questions) for size, focus in quiz_chunks(num_questions)]
+    
+    # Add each piece of the quiz as soon as it's ready
+    quiz_jobs = st.session_state.jobs.get("quiz", [])
+    for job in [job for job in quiz_jobs if check_scibot_job(job)]:
+        quiz_jobs.remove(job)
+        add_quiz_chunk(job, quiz_jobs)
+    
+    if "quiz" in st.session_state.jobs and not quiz_jobs:
+        del st.session_state.jobs["quiz"]
+        offline = [] if st.session_state.current_quiz else fallback_index.questions(grade_level, quiz_topic, num_questions)
+        if st.session_state.current_quiz:
+            st.success("✅ Quiz ready! Answer the questions below:")
+        elif offline:
+            # SciBot couldn't write a new quiz, but it has written questions on this topic before
+            st.session_state.current_quiz = {"title": f"{quiz_topic.strip().title()} Quiz", "questions": offline}
+            st.info("📴 SciBot can't reach the internet right now, so this quiz is made from questions it wrote before.")
+        else:
+            st.error("Oops! SciBot had trouble creating the quiz. Try again!")
+        if st.session_state.pop("quiz_chunk_failed", False) and st.session_state.current_quiz and not offline:
+            st.info("Some questions got lost on the way, so your quiz is a little shorter.")
+    
+    # Display quiz if generated.
+    # The questions are in a form, so picking answers doesn't rerun anything; the whole
+    # quiz is graded in one go when it's submitted.
     if st.session_state.current_quiz:
         quiz = st.session_state.current_quiz
+        result = st.session_state.quiz_result
         st.markdown(f"## 📚 {quiz.get('title', 'Science Quiz')}")
         st.markdown(f"*Difficulty level: {current_grade['level']}*")
         st.markdown("---")
         
-        for i, q in enumerate(quiz.get('questions', [])):
-            st.markdown(f"### Question {i+1}")
-            st.markdown(f"**{q['question']}**")
-            
-            answer = st.radio(
-                "Choose your answer:",
-                q['options'],
-                key=f"q_{i}",
-                index=None
-            )
+        with st.form("quiz_form", border=False):
+            for i, q in enumerate(quiz.get('questions', [])):
+                st.markdown(f"### Question {i+1}")
+                st.markdown(f"**{q.question}**")
+                st.radio("Choose your answer:", q.options, key=f"q_{i}", index=None, disabled=result is not None)
+                st.markdown("---")
             
-            if answer:
-                st.session_state.quiz_answers[i] = answer[0]  # Store just the letter (A, B, C, D)
-            
-            st.markdown("---")
+            submitted = st.form_submit_button("📊 Submit Quiz", type="primary", disabled=bool(quiz_jobs) or result is not None)
         
-        # Submit quiz button
-        if st.button("📊 Submit Quiz", type="primary"):
-            if len(st.session_state.quiz_answers) < len(quiz['questions']):
+        if submitted:
+            # Just the letter (A, B, C, D) of each answer
+            answers = [(st.session_state.get(f"q_{i}") or " ")[0].strip() for i in range(len(quiz['questions']))]
+            if not all(answers):
                 st.warning("Please answer all questions before submitting!")
             else:
-                # Calculate score
-                correct = 0
+                correct = sum(answer == q.correct for answer, q in zip(answers, quiz['questions']))
                 total = len(quiz['questions'])
-                
-                st.markdown("## 🎯 Quiz Results")
-                
-                for i, q in enumerate(quiz['questions']):
-                    user_answer = st.session_state.quiz_answers.get(i, "")
-                    correct_answer = q['correct']
-                    
-                    if user_answer == correct_answer:
-                        correct += 1
-                        st.markdown(f"""
-                        <div class="correct-answer">
-                            <strong>Question {i+1}: ✅ Correct!</strong><br>
-                            {q['explanation']}
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                        <div class="wrong-answer">
-                            <strong>Question {i+1}: ❌ Incorrect</strong><br>
-                            You answered: {user_answer}<br>
-                            Correct answer: {correct_answer}<br>
-                            {q['explanation']}
-                        </div>
-                        """, unsafe_allow_html=True)
-                    st.markdown("")
-                
-                score_percent = (correct / total) * 100
-                st.markdown(f"### Final Score: {correct}/{total} ({score_percent:.0f}%)")
+                st.session_state.quiz_result = {"answers": answers, "correct": correct, "total": total, "new": True}
                 
                 # Update stats
                 st.session_state.quizzes_taken += 1
-                st.session_state.quiz_score += score_percent
+                st.session_state.quiz_score += correct / total * 100
+                progress_store.add_quiz(student_id, quiz.get('title', 'Science Quiz'), grade_level, correct, total)
                 
-                if score_percent == 100:
-                    st.balloons()
-                    st.success("🏆 Perfect score! You're a science superstar!")
-                elif score_percent >= 80:
-                    st.success("🌟 Great job! You really know your stuff!")
-                elif score_percent >= 60:
-                    st.info("👍 Good effort! Keep studying and you'll do even better!")
+                # Full rerun so the stats in the sidebar catch up
+                st.rerun()
+        
+        if result:
+            st.markdown("## 🎯 Quiz Results")
+            
+            for i, (user_answer, q) in enumerate(zip(result["answers"], quiz['questions'])):
+                if user_answer == q.correct:
+                    st.markdown(f"""
+                    <div class="correct-answer">
+                        <strong>Question {i+1}: ✅ Correct!</strong><br>
+                        {html.escape(q.explanation)}
+                    </div>
+                    """, unsafe_allow_html=True)
                 else:
-                    st.info("📚 Keep learning! SciBot is here to help you improve!")
-                
-                if st.button("🔄 Take Another Quiz"):
-                    st.session_state.current_quiz = None
-                    st.session_state.quiz_answers = {}
-                    st.rerun()
+                    st.markdown(f"""
+                    <div class="wrong-answer">
+                        <strong>Question {i+1}: ❌ Incorrect</strong><br>
+                        You answered: {html.escape(user_answer)}<br>
+                        Correct answer: {html.escape(q.correct)}<br>
+                        {html.escape(q.explanation)}
+                    </div>
+                    """, unsafe_allow_html=True)
+                st.markdown("")
+            
+            score_percent = (result["correct"] / result["total"]) * 100
+            st.markdown(f"### Final Score: {result['correct']}/{result['total']} ({score_percent:.0f}%)")
+            
+            # Balloons only right after submitting, not every time the page is drawn
+            just_submitted = result.pop("new", False)
+            if score_percent == 100:
+                if just_submitted:
+                    st.balloons()
+                st.success("🏆 Perfect score! You're a science superstar!")
+            elif score_percent >= 80:
+                st.success("🌟 Great job! You really know your stuff!")
+            elif score_percent >= 60:
+                st.info("👍 Good effort! Keep studying and you'll do even better!")
+            else:
+                st.info("📚 Keep learning! SciBot is here to help you improve!")
+            
+            # The next quiz on the same topic, without the questions from this one
+            avoid = [q.question for q in quiz["questions"]]
+            if st.button("🔄 Take Another Quiz"):
+                st.session_state.current_quiz = None
+                st.session_state.quiz_result = None
+                clear_quiz_answers()
+                if api_key and quiz_topic:
+                    st.session_state.jobs["quiz"] = [
+                        start_quiz_chunk(size, focus, quiz_topic, num_questions, avoid=avoid) for size, focus in quiz_chunks(num_questions)
+                    ]
+                rerun_page()
+            
+            # Most students take another one, so start writing it while they read their results
+            if quiz_topic:
+                prefetcher.prefetch(st.session_state.prefetch, mode, api_key, student_id, [
+                    (*quiz_chunk_request(size, focus, quiz_topic, avoid=avoid), "quiz") for size, focus in quiz_chunks(num_questions)
+                ])
+    
+    # Keep checking until every piece of the quiz has arrived
+    if quiz_jobs:
+        wait_for_scibot_jobs(quiz_jobs, "SciBot is creating your quiz...")
 
 # MODE 3: FLASHCARDS
-elif mode == "🎴 Flashcards":
+@st.fragment
+def flashcards_mode():
+    session_keeper.restore(PAGE_STATE[mode], session_defaults())
     st.markdown("### 🎴 Study with Flashcards!")
     
+    # Decks from earlier visits, most overdue first
+    decks = [deck for deck in deck_store.decks(student_id) if deck[0] == grade_level]
+    if decks:
+        st.caption("📚 Your decks: " + " • ".join(f"{topic.title()} ({due} to study)" for _, topic, _, due in decks[:5]))
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -473,123 +818,71 @@ elif mode == "🎴 Flashcards":
     with col2:
         num_cards = st.slider("Number of Cards:", 5, 15, 10)
     
-    if st.button("🎴 Generate Flashcards", type="primary"):
+    if st.button("🎴 Study Flashcards", type="primary"):
         if not api_key:
             st.warning("Please enter your API key first!")
         elif not flashcard_topic:
             st.warning("Please enter a topic for your flashcards!")
         else:
-            with st.spinner("SciBot is creating your flashcards..."):
-                system_prompt = f"""You are SciBot, creating educational flashcards.
-
-CRITICAL - Grade Level Adjustment:
-Student Grade Level: {current_grade['level']}
-{current_grade['description']}
-{current_grade['vocab']}
-
-Create EXACTLY {num_cards} flashcards about: {flashcard_topic}
-
-IMPORTANT: Adjust flashcard difficulty and vocabulary to match {current_grade['level']}:
-- For younger grades: Simple terms, basic definitions, everyday examples
-- For middle grades: Standard terms with clear explanations
-- For older grades: Technical terms, detailed definitions, complex concepts
-
-CRITICAL: Return ONLY valid JSON, nothing else. No markdown, no backticks.
-
-Format:
-{{
-  "cards": [
-    {{
-      "front": "Question or term (grade-appropriate)",
-      "back": "Answer or definition (2-3 sentences at {current_grade['level']} level)"
-    }}
-  ]
-}}
-
-Make them clear and educational at the appropriate level!"""
-                
-                prompt = f"Create {num_cards} flashcards about {flashcard_topic} for {current_grade['level']} level"
-                
-                response = call_scibot(prompt, system_prompt)
-                
-                try:
-                    # Clean response
-                    response = response.strip()
-                    if response.startswith("```"):
-                        response = response.split("```")[1]
-                        if response.startswith("json"):
-                            response = response[4:]
-                    response = response.strip()
-                    
-                    flashcard_data = json.loads(response)
-                    st.session_state.flashcards = flashcard_data.get('cards', [])
-                    st.session_state.current_flashcard = 0
-                    st.session_state.show_flashcard_answer = False
-                    st.success("✅ Flashcards ready! Click on cards to flip them!")
-                except:
-                    st.error("Oops! SciBot had trouble creating flashcards. Try again!")
-    
-    # Display flashcards
-    if st.session_state.flashcards:
-        total_cards = len(st.session_state.flashcards)
-        current = st.session_state.current_flashcard
-        card = st.session_state.flashcards[current]
-        
-        # Progress
-        st.progress((current + 1) / total_cards)
-        st.markdown(f"**Card {current + 1} of {total_cards}** • *Level: {current_grade['level']}*")
+            open_deck(flashcard_topic, num_cards)
+            if st.session_state.deck and "flashcards" not in st.session_state.jobs:
+                st.success("✅ Flashcards ready! Flip each card, then tell SciBot how well you knew it!")
+    
+    flashcard_job = st.session_state.jobs.get("flashcards")
+    if flashcard_job and check_scibot_job(flashcard_job):
+        del st.session_state.jobs["flashcards"]
+        add_flashcards(flashcard_job)
+    
+    # Display the card that's due next
+    deck = st.session_state.deck
+    if deck:
+        card = deck.current()
+        st.markdown(f"**{deck.topic.strip().title()}** • {deck.due_count()} to study • {len(deck)} cards in your deck • *Level: {current_grade['level']}*")
         
-        # Flashcard display
-        if st.session_state.show_flashcard_answer:
+        if card is None:
+            st.success(f"🎉 All done for now! Your next card is ready {due_in(deck.next_due())}.")
+            if st.button("➕ Add 5 New Cards") and "flashcards" not in st.session_state.jobs:
+                top_up_deck(5)
+                rerun_page()
+        elif st.session_state.show_flashcard_answer:
             st.markdown(f"""
             <div class="flashcard">
                 <h3>Answer:</h3>
-                <h2>{card['back']}</h2>
+                <h2>{html.escape(card.back)}</h2>
             </div>
             """, unsafe_allow_html=True)
+            
+            # The student grades themselves, and that decides when the card comes back
+            st.markdown("**How well did you know it?**")
+            for column, (grade, label) in zip(st.columns(4), zip(GRADES, ["😕 Forgot", "😬 Hard", "🙂 Good", "🤩 Easy"])):
+                with column:
+                    if st.button(label, key=f"grade_{grade}"):
+                        card = deck.review(grade)
+                        deck_store.record_review(student_id, deck, card, grade, st.session_state.answer_seconds)
+                        st.session_state.show_flashcard_answer = False
+                        st.session_state.card_shown_at = time.time()
+                        rerun_page()
         else:
             st.markdown(f"""
             <div class="flashcard">
                 <h3>Question:</h3>
-                <h2>{card['front']}</h2>
-                <p style="margin-top: 20px; font-size: 0.9em;">Click "Show Answer" to flip!</p>
+                <h2>{html.escape(card.front)}</h2>
+                <p style="margin-top: 20px; font-size: 0.9em;">Think of the answer, then click "Show Answer" to flip!</p>
             </div>
             """, unsafe_allow_html=True)
-        
-        # Flashcard controls
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("⬅️ Previous", disabled=(current == 0)):
-                st.session_state.current_flashcard -= 1
-                st.session_state.show_flashcard_answer = False
-                st.rerun()
-        
-        with col2:
-            if st.session_state.show_flashcard_answer:
-                if st.button("🔄 Show Question"):
-                    st.session_state.show_flashcard_answer = False
-                    st.rerun()
-            else:
-                if st.button("👁️ Show Answer"):
-                    st.session_state.show_flashcard_answer = True
-                    st.rerun()
-        
-        with col3:
-            if st.button("➡️ Next", disabled=(current == total_cards - 1)):
-                st.session_state.current_flashcard += 1
-                st.session_state.show_flashcard_answer = False
-                st.rerun()
-        
-        # Shuffle button
-        if st.button("🔀 Shuffle Cards"):
-            random.shuffle(st.session_state.flashcards)
-            st.session_state.current_flashcard = 0
-            st.session_state.show_flashcard_answer = False
-            st.rerun()
+            
+            if st.button("👁️ Show Answer"):
+                st.session_state.show_flashcard_answer = True
+                st.session_state.answer_seconds = time.time() - st.session_state.card_shown_at
+                rerun_page()
+    
+    # Keep checking until the flashcards have arrived
+    if "flashcards" in st.session_state.jobs:
+        wait_for_scibot_jobs([st.session_state.jobs["flashcards"]], "SciBot is creating your flashcards...")
 
 # MODE 4: MY PROGRESS
-elif mode == "📊 My Progress":
+@st.fragment
+def progress_mode():
     st.markdown("### 📊 Your Learning Progress")
     
     col1, col2, col3 = st.columns(3)
@@ -671,6 +964,15 @@ elif mode == "📊 My Progress":
     
     st.markdown("---")
     
+    # Recent quizzes
+    recent_quizzes = progress_store.history(student_id)
+    if recent_quizzes:
+        st.markdown("### 🗂️ Recent Quizzes")
+        for result in recent_quizzes:
+            st.markdown(f"- **{result['title']}** — {result['correct']}/{result['total']} ({result['score']:.0f}%)")
+        
+        st.markdown("---")
+    
     # Motivational message from SciBot
     st.markdown("### 💬 Message from SciBot")
     
@@ -693,9 +995,252 @@ elif mode == "📊 My Progress":
         st.session_state.questions_answered = 0
         st.session_state.quizzes_taken = 0
         st.session_state.quiz_score = 0
+        progress_store.reset(student_id)
         st.success("Progress reset! Time for a fresh start! 🚀")
         st.rerun()
 
+# Teacher pages ask for SCIBOT_ADMIN_PASSWORD (if it's set) before showing anything
+def check_admin_password(what):
+    admin_password = os.environ.get("SCIBOT_ADMIN_PASSWORD", "")
+    if admin_password and st.text_input("Admin password:", type="password") != admin_password:
+        st.info(f"Enter the admin password to {what}.")
+        st.stop()
+
+# MODE 5: CLASS QUIZZES (teachers make a whole set of quizzes in one batch)
+@st.fragment
+def class_quizzes_mode():
+    st.markdown("### 👩‍🏫 Class Quizzes")
+    check_admin_password("make class quizzes")
+    
+    st.markdown("Make quizzes for the whole class ahead of time. Upload a CSV file with the columns "
+                "**topic**, **grade** and **questions**, one row per quiz. SciBot writes them all in one "
+                "batch (half the price), and when it's done students get them instantly on the quiz page.")
+    st.code("topic,grade,questions\nPhotosynthesis,3rd - 5th Grade,5\nSolar System,Middle School,10", language="csv")
+    
+    upload = st.file_uploader("Quiz list (CSV):", type="csv")
+    if upload is not None:
+        plan, problems = read_plan(io.StringIO(upload.getvalue().decode("utf-8-sig")))
+        for problem in problems:
+            st.warning(f"Skipped - {problem}")
+        if plan:
+            st.dataframe(plan)
+            # Sending the same list again while its batch is still going would pay for it twice
+            pending = next((batch_id for batch_id, open_plan, _ in quiz_library.open_batches() if open_plan == plan), None)
+            if pending:
+                st.info(f"⏳ This quiz list is already being made as batch {pending}. The quizzes show up below when they're ready.")
+            if st.button(f"📦 Make {len(plan)} Quiz{'zes' if len(plan) != 1 else ''}", type="primary", disabled=pending is not None):
+                if not api_key:
+                    st.warning("Please enter your API key first!")
+                else:
+                    try:
+                        batch_id = submit_batch(get_client(api_key), quiz_library, plan)
+                        st.success(f"✅ Sent as batch {batch_id}! Batches usually finish within an hour "
+                                   "(at most a day). The quizzes show up below when they're ready.")
+                    except Exception as e:
+                        st.error(f"Oops! SciBot couldn't send the batch: {e}")
+    
+    batches = quiz_library.batches()
+    if batches:
+        st.markdown("#### Batches")
+        st.dataframe([
+            {"batch": batch_id, "sent": time.strftime("%Y-%m-%d %H:%M", time.localtime(submitted_at)),
+             "status": status, "quizzes asked for": requests, "done": succeeded, "failed": failed, "in library": quizzes}
+            for batch_id, submitted_at, status, requests, succeeded, failed, quizzes in batches
+        ])
+        if api_key and st.button("🔄 Check Now"):
+            with st.spinner("Checking on the batches..."):
+                try:
+                    imported = batch_tracker.check()
+                    st.success(f"✅ Added {imported} new quizzes to the library." if imported else "Nothing new yet.")
+                except Exception as e:
+                    st.error(f"Oops! SciBot couldn't check on the batches: {e}")
+    
+    library = quiz_library.summary()
+    st.markdown("#### Quiz library")
+    if library:
+        st.dataframe([{"grade": grade, "topic": topic.title(), "quizzes": count} for grade, topic, count in library])
+    else:
+        st.info("No class quizzes yet. Upload a quiz list to make some!")
+
+# What adding (part of) a pack did
+def show_pack_added(added):
+    st.success(f"✅ Added {added['quiz']} new class quizzes, {added['questions']} questions and {added['cards']} flashcards!")
+    if added["skipped"]:
+        st.warning(f"Skipped {added['skipped']} questions and flashcards that were broken or for a grade SciBot doesn't have.")
+
+# MODE 6: QUIZ PACKS (share quizzes and flashcards between SciBot servers)
+@st.fragment
+def packs_mode():
+    st.markdown("### 📚 Quiz Packs")
+    check_admin_password("share quiz packs")
+
+    st.markdown("A quiz pack is one file with the class quizzes, quiz questions and flashcards SciBot has. "
+                "Copy it to another SciBot (or upload it below) and add it there, and its students get all of "
+                "it right away, without waiting for SciBot to write it again.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📦 Make a Pack", type="primary"):
+            with st.spinner("Packing everything up..."):
+                entries = pack_entries(quiz_library, content_bank, fallback_index)
+                if entries:
+                    path = write_pack(new_pack_path(), entries)
+                    st.success(f"✅ Made {os.path.basename(path)}! It's in the list below.")
+                else:
+                    st.info("SciBot hasn't made any quizzes or flashcards to pack yet.")
+    with col2:
+        upload = st.file_uploader("Add a pack from another SciBot:", type=PACK_SUFFIX.lstrip("."))
+        if upload is not None and upload.file_id != st.session_state.get("saved_pack"):
+            try:
+                save_pack(upload.name, upload.getvalue())
+                st.session_state.saved_pack = upload.file_id
+            except PackError as e:
+                st.error(f"Oops! {e}")
+
+    packs = list_packs()
+    if not packs:
+        st.info("No quiz packs yet. Make one, or upload one from another SciBot!")
+        return
+
+    path = st.selectbox("Pack:", packs, format_func=os.path.basename)
+    try:
+        # Only the pack's list of contents is read here; a quiz is read when it's opened
+        pack = get_pack(path, os.path.getmtime(path))
+    except (OSError, PackError) as e:
+        st.error(f"Oops! SciBot couldn't open this pack: {e}")
+        return
+    counts = {kind: sum(1 for entry in pack.entries if entry["kind"] == kind) for kind in KINDS}
+    st.caption(f"Made {time.strftime('%Y-%m-%d %H:%M', time.localtime(pack.made_at))} • "
+               f"{counts['quiz']} class quizzes • {counts['questions']} question sets • {counts['deck']} flashcard decks • "
+               f"{os.path.getsize(path) / 1024:.0f} KB")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("➕ Add Everything to SciBot"):
+            with st.spinner("Adding the pack..."):
+                try:
+                    show_pack_added(import_pack(pack, quiz_library, content_bank, fallback_index))
+                except (PackError, KeyError, zlib.error) as e:
+                    st.error(f"Oops! SciBot couldn't add this pack: {e}")
+    with col2:
+        st.download_button("⬇️ Download Pack", data=lambda: open(path, "rb").read(),
+                           file_name=os.path.basename(path), mime="application/octet-stream")
+
+    search = st.text_input("Find a topic:", placeholder="e.g., Photosynthesis")
+    shown = [n for n, entry in enumerate(pack.entries)
+             if entry["kind"] in KINDS and normalize_topic(search) in normalize_topic(entry["topic"])]
+    table = st.dataframe(
+        [{"kind": KINDS[pack.entries[n]["kind"]], "grade": pack.entries[n]["grade_level"],
+          "title": pack.entries[n]["title"], "items": pack.entries[n]["count"]} for n in shown],
+        on_select="rerun", selection_mode="single-row", hide_index=True
+    )
+    if not table.selection.rows:
+        st.caption("Click a row to look inside.")
+        return
+
+    n = shown[table.selection.rows[0]]
+    entry = pack.entries[n]
+    try:
+        items, rejected = pack.items(n)
+    except (PackError, KeyError, zlib.error) as e:
+        st.error(f"Oops! SciBot couldn't open this one: {e}")
+        return
+    st.markdown(f"#### {entry['title']}")
+    if rejected:
+        st.warning(f"{rejected} of these are broken and won't be added.")
+    if entry["kind"] == "deck":
+        for card in items:
+            st.markdown(f"- **{card['front']}** — {card['back']}")
+    else:
+        for i, q in enumerate(items):
+            st.markdown(f"**{i + 1}. {q.question}**")
+            st.markdown("\n".join(f"- {'✅ ' if option[0] == q.correct else ''}{option}" for option in q.options))
+    if st.button("➕ Add This One to SciBot"):
+        try:
+            show_pack_added(import_pack(pack, quiz_library, content_bank, fallback_index, only=[n]))
+        except (PackError, KeyError, zlib.error) as e:
+            st.error(f"Oops! SciBot couldn't add this one: {e}")
+
+# MODE 7: SCIBOT METRICS (for teachers and whoever runs the server)
+@st.fragment
+def metrics_mode():
+    st.markdown("### 🛠️ SciBot Metrics")
+    check_admin_password("see the metrics")
+    
+    windows = {"Last 15 minutes": 15 * 60, "Last hour": 3600, "Last 24 hours": 24 * 3600, "Everything in memory": None}
+    window = st.selectbox("Time window:", list(windows), index=1)
+    calls = metrics.recent(windows[window])
+    
+    st.caption(f"🚦 Calls waiting in line right now: {scheduler.waiting()} • Background jobs running: {engine.in_flight()}")
+    if breaker.is_open:
+        st.warning(f"📴 The API keeps failing, so SciBot is answering from saved answers "
+                   f"(skipped {breaker.stats['skipped']} calls, opened {breaker.stats['opened']} times).")
+    if metrics.write_errors:
+        st.warning(f"💾 SciBot couldn't write {metrics.write_errors} batches of calls to the metrics log.")
+    if progress_store.save_errors:
+        st.warning(f"💾 SciBot couldn't save {progress_store.save_errors} batches of student progress.")
+    
+    if not calls:
+        st.info("No SciBot calls in this time window yet.")
+    else:
+        overall = summarize(calls)
+        minutes = max((calls[-1]["time"] - calls[0]["time"]) / 60, 1)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Calls", overall["calls"], f"{overall['calls'] / minutes:.1f} per minute", delta_color="off")
+        with col2:
+            st.metric("p50 / p95 latency", f"{overall['p50'] or 0:.1f}s / {overall['p95'] or 0:.1f}s")
+        with col3:
+            st.metric("Errors", overall["errors"])
+        with col4:
+            st.metric("Tokens (in / out)", f"{overall['input_tokens']} / {overall['output_tokens']}")
+        
+        st.markdown("#### By mode")
+        rows = []
+        for name in sorted({call["mode"] for call in calls}):
+            stats = summarize([call for call in calls if call["mode"] == name])
+            rows.append({
+                "mode": name,
+                "calls": stats["calls"],
+                "cached": stats["cached"],
+                "shared": stats["shared"],
+                "saved (offline)": stats["fallback"],
+                "errors": stats["errors"],
+                "p50 (s)": stats["p50"],
+                "p95 (s)": stats["p95"],
+                "p99 (s)": stats["p99"],
+                "first words p50 (s)": stats["ttft_p50"],
+                "input tokens": stats["input_tokens"],
+                "output tokens": stats["output_tokens"],
+                "cache read tokens": stats["cache_read_tokens"],
+                "cache write tokens": stats["cache_write_tokens"],
+            })
+        st.dataframe(rows)
+        
+        st.markdown("#### Over time (per minute)")
+        per_minute = timeline(calls)
+        st.line_chart(per_minute, x="time", y=["calls"])
+        st.line_chart(per_minute, x="time", y=["input_tokens", "output_tokens"])
+        st.line_chart(per_minute, x="time", y=["p95_latency"])
+        
+        errors = [call for call in calls if call["outcome"] == "error"]
+        if errors:
+            st.markdown("#### Recent errors")
+            st.dataframe(errors[-20:])
+
+# Prefetches for the page the student just left aren't needed anymore
+prefetcher.cancel(st.session_state.prefetch, mode)
+
+# Only the open page's state stays in memory
+session_keeper.park([key for page, keys in PAGE_STATE.items() if page != mode for key in keys])
+
+MODE_PAGES = dict(zip(MODES, [chat_mode, quiz_mode, flashcards_mode, progress_mode, class_quizzes_mode, packs_mode, metrics_mode]))
+# When the page's fragment reruns on its own, the script doesn't get here, so full_run stays False
+st.session_state.full_run = True
+MODE_PAGES[mode]()
+st.session_state.full_run = False
+
 # Footer
 st.markdown("---")
 st.markdown("""
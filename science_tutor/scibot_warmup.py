@@ -0,0 +1,109 @@
+import argparse
+import time
+
+import anthropic
+
+from scibot_bank import ContentBank, BANK_PATH
+from scibot_client import MAX_TOKENS, MODEL
+from scibot_data import GRADE_MAPPING, TOPICS
+from scibot_json import parse_cards, parse_quiz
+from scibot_prompts import QUIZ_FOCUSES, flashcard_system_prompt, quiz_system_prompt
+
+# Fill the content bank ahead of time with the Message Batches API (half the price of live calls).
+#
+#   python science_tutor/scibot_warmup.py
+#   python science_tutor/scibot_warmup.py --topics Photosynthesis "Solar System" --grades "3rd - 5th Grade"
+#
+# Needs ANTHROPIC_API_KEY. Batches can take a while; if the script is stopped, run it again
+# with the same options and --resume <batch id> to import the results.
+
+
+# One batch request per (kind, grade, topic, piece). The custom_id tells us where the result goes.
+def plan_requests(grades, topics, questions_per_request, cards_per_request):
+    requests = []
+    for g, grade_level in enumerate(grades):
+        current_grade = GRADE_MAPPING[grade_level]
+        for t, topic in enumerate(topics):
+            for f, focus in enumerate(QUIZ_FOCUSES):
+                requests.append({
+                    "custom_id": f"quiz-{g}-{t}-{f}",
+                    "params": {
+                        "model": MODEL,
+                        "max_tokens": MAX_TOKENS,
+                        "system": quiz_system_prompt(current_grade, questions_per_request, topic, focus),
+                        "messages": [{"role": "user", "content": f"Create a {questions_per_request}-question quiz about {topic} for {current_grade['level']} level"}]
+                    }
+                })
+            requests.append({
+                "custom_id": f"cards-{g}-{t}-0",
+                "params": {
+                    "model": MODEL,
+                    "max_tokens": MAX_TOKENS,
+                    "system": flashcard_system_prompt(current_grade, cards_per_request, topic),
+                    "messages": [{"role": "user", "content": f"Create {cards_per_request} flashcards about {topic} for {current_grade['level']} level"}]
+                }
+            })
+    return requests
+
+
+def wait_for_batch(client, batch_id, poll_seconds):
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  {batch.processing_status}: {counts.succeeded} done, {counts.processing} working, {counts.errored} failed")
+        if batch.processing_status == "ended":
+            return batch
+        time.sleep(poll_seconds)
+
+
+def import_results(client, batch_id, bank, grades, topics):
+    added = {"questions": 0, "cards": 0}
+    for entry in client.messages.batches.results(batch_id):
+        if entry.result.type != "succeeded":
+            print(f"  skipped {entry.custom_id}: {entry.result.type}")
+            continue
+
+        kind, g, t, _ = entry.custom_id.split("-")
+        grade_level, topic = grades[int(g)], topics[int(t)]
+        text = entry.result.message.content[0].text
+
+        if kind == "quiz":
+            _, questions = parse_quiz(text)
+            bank.add_questions(grade_level, topic, questions)
+            added["questions"] += len(questions)
+        else:
+            cards = parse_cards(text)
+            bank.add_cards(grade_level, topic, cards)
+            added["cards"] += len(cards)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate quiz questions and flashcards for SciBot's content bank.")
+    parser.add_argument("--topics", nargs="+", default=TOPICS, help="topics to generate (default: the sidebar topics)")
+    parser.add_argument("--grades", nargs="+", default=list(GRADE_MAPPING), choices=list(GRADE_MAPPING), help="grade levels (default: all)")
+    parser.add_argument("--questions", type=int, default=5, help="questions per request (one request per quiz focus)")
+    parser.add_argument("--cards", type=int, default=15, help="flashcards per topic and grade")
+    parser.add_argument("--bank", default=BANK_PATH, help="content bank file")
+    parser.add_argument("--poll", type=float, default=30, help="seconds between batch status checks")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="import an already submitted batch")
+    args = parser.parse_args()
+
+    client = anthropic.Anthropic()
+    bank = ContentBank(args.bank)
+
+    if args.resume:
+        batch_id = args.resume
+    else:
+        requests = plan_requests(args.grades, args.topics, args.questions, args.cards)
+        batch = client.messages.batches.create(requests=requests)
+        batch_id = batch.id
+        print(f"Submitted batch {batch_id} with {len(requests)} requests")
+
+    wait_for_batch(client, batch_id, args.poll)
+    added = import_results(client, batch_id, bank, args.grades, args.topics)
+    print(f"Added {added['questions']} questions and {added['cards']} flashcards to {args.bank}")
+
+
+if __name__ == "__main__":
+    main()